@@ -1,10 +1,6 @@
-import requests
-import json
 import logging
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
-from AI_agents.Gemeni.functions.functions import convert_to_list, query_gemini
-from AI_agents.OpenAI.custom_call import CustomCall
+from AI_agents.address_service import address_service
+from global_db.functions.key_vault import get_secret
 
 class AddressParser:
     def __init__(self, key_vault_url="https://kv-functions-python.vault.azure.net", secret_name="Gemeni-api-key"):
@@ -27,12 +23,7 @@ class AddressParser:
             bool: True if successful, False otherwise
         """
         try:
-            # Use DefaultAzureCredential for authentication
-            credential = DefaultAzureCredential()
-            # Create a SecretClient to interact with the Key Vault
-            client = SecretClient(vault_url=self.key_vault_url, credential=credential)
-            # Retrieve the secret value
-            self.api_key = client.get_secret(self.secret_name).value
+            self.api_key = get_secret(self.secret_name, self.key_vault_url)
             return True
         except Exception as e:
             logging.error(f"Failed to retrieve secret: {str(e)}")
@@ -73,35 +64,27 @@ class AddressParser:
 
     def parse_address(self, address):
         """
-        Parse an address string into structured components using Gemini API.
+        Parse an address string into structured components (through the shared address service,
+        which serves known addresses from its cache).
         
         Args:
             address (str): The address to parse
             
         Returns:
             list: Parsed address components [company, street, city, postal_code, country_code]
-                  or None if parsing failed
+                  (empty strings if parsing failed)
         """
-        if not self.api_key and not self.initialize_api_key():
-            logging.error("No API key available")
-            return ['', '', '', '', '']
-            
-        prompt = f"""Parse the following address into company name, street, city, postal code, and country. Return the result as a Python list with string elements only, without any additional text or code formatting. The country should be represented by its 2-letter abbreviation code. If any field is missing, represent it with an empty string. If city or postal code only those two fields not mentioned find the correct ones from data and add it please. if the country is united kingdom put GB instead of UK.
-        the array should be 5 items long, in the order of [company, street, city, postal_code, country_code]
-        output should be a python list with string quotes like this and values inside the quotes as python strings ["", "", "", "", ""]
-        [{address}]"""
+        return address_service().parse(address)
+
+    def parse_addresses(self, addresses):
+        """
+        Parse several addresses at once: repeats are parsed once and the unknown ones are sent
+        to the model together, in batches.
         
-        try:
-            call = CustomCall()
-            result = call.send_request("user", prompt)
-            parsed_address = convert_to_list(result)
-            return parsed_address
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Error making request: {e}")
-            return ['', '', '', '', '']
-        except json.JSONDecodeError as e:
-            logging.error(f"Error parsing response: {e}")
-            return ['', '', '', '', '']
-        except Exception as e:
-            logging.error(f"Unexpected error during address parsing: {e}")
-            return ['', '', '', '', '']
\ No newline at end of file
+        Args:
+            addresses (list): The addresses to parse
+            
+        Returns:
+            list: One [company, street, city, postal_code, country_code] list per address, in order
+        """
+        return address_service().normalise(addresses)
@@ -1,9 +1,12 @@
 import requests
 import json
 import logging
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
+from concurrent.futures import ThreadPoolExecutor
 from AI_agents.Gemeni.functions.functions import convert_to_list, query_gemini
+from global_db.functions.key_vault import get_secret
+
+MAX_PARALLEL_REQUESTS = 8
+
 
 class AddressDetector:
     def __init__(self, key_vault_url="https://kv-functions-python.vault.azure.net", secret_name="Gemeni-api-key"):
@@ -27,12 +30,7 @@ class AddressDetector:
             bool: True if successful, False otherwise
         """
         try:
-            # Use DefaultAzureCredential for authentication
-            credential = DefaultAzureCredential()
-            # Create a SecretClient to interact with the Key Vault
-            client = SecretClient(vault_url=self.key_vault_url, credential=credential)
-            # Retrieve the secret value
-            self.api_key = client.get_secret(self.secret_name).value
+            self.api_key = get_secret(self.secret_name, self.key_vault_url)
             return True
         except Exception as e:
             logging.error(f"Failed to retrieve secret: {str(e)}")
@@ -81,3 +79,22 @@ class AddressDetector:
             logging.error(f"Unexpected error during address parsing: {e}")
             return None
 
+    def parse_addresses(self, addresses, max_workers=MAX_PARALLEL_REQUESTS):
+        """
+        Screen several addresses concurrently, each distinct address once.
+        
+        Args:
+            addresses (list): The addresses to screen
+            max_workers (int): Maximum number of requests in flight
+            
+        Returns:
+            list: "Yes" / "No" (or None if screening failed) per address, in order
+        """
+        distinct = list(dict.fromkeys(addresses))
+        if len(distinct) <= 1 or max_workers <= 1:
+            verdicts = [self.parse_address(address) for address in distinct]
+        else:
+            with ThreadPoolExecutor(min(max_workers, len(distinct))) as pool:
+                verdicts = list(pool.map(self.parse_address, distinct))
+        by_address = dict(zip(distinct, verdicts))
+        return [by_address[address] for address in addresses]
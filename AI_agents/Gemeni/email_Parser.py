@@ -1,11 +1,10 @@
 import requests
 import json
 import logging
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
 from AI_agents.Gemeni.functions.functions import convert_to_list, query_gemini
 from bs4 import BeautifulSoup
 import re
+from global_db.functions.key_vault import get_secret
 
 class EmailParser:
     def __init__(self, key_vault_url="https://kv-functions-python.vault.azure.net", secret_name="Gemeni-api-key"):
@@ -28,12 +27,7 @@ class EmailParser:
             bool: True if successful, False otherwise
         """
         try:
-            # Use DefaultAzureCredential for authentication
-            credential = DefaultAzureCredential()
-            # Create a SecretClient to interact with the Key Vault
-            client = SecretClient(vault_url=self.key_vault_url, credential=credential)
-            # Retrieve the secret value
-            self.api_key = client.get_secret(self.secret_name).value
+            self.api_key = get_secret(self.secret_name, self.key_vault_url)
             return True
         except Exception as e:
             logging.error(f"Failed to retrieve secret: {str(e)}")
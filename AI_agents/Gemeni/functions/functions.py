@@ -1,5 +1,7 @@
 import ast
-import requests
+from AI_agents.clients import GEMINI, gemini_session, provider_limit
+
+GEMINI_MODEL = "gemini-1.5-flash"
 
 
 def convert_to_list(string_list):
@@ -11,7 +13,7 @@ def convert_to_list(string_list):
         return None  # Or return an empty list, depending on your needs
 
 def query_gemini(api_key, prompt):
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent?key={api_key}"
+    url = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:generateContent?key={api_key}"
     
     headers = {
         "Content-Type": "application/json"
@@ -23,6 +25,6 @@ def query_gemini(api_key, prompt):
         }]
     }
     
-    response = requests.post(url, headers=headers, json=data)
+    response = gemini_session().post(url, headers=headers, json=data, timeout=provider_limit(GEMINI, "timeout_seconds"))
     return response.json()
 
@@ -2,9 +2,9 @@ from io import BufferedReader
 import os
 import base64
 import logging
-from mistralai import Mistral
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
+from global_db.functions.key_vault import get_secret
+from AI_agents.clients import MISTRAL, registry
+from AI_agents.response_cache import cache_key, content_hash, response_cache
 
 class MistralDocumentQA:
     def __init__(self, key_vault_url="https://kv-functions-python.vault.azure.net", secret_name="MISTRAL-API-KEY", model="mistral-small-latest"):
@@ -12,13 +12,11 @@ class MistralDocumentQA:
         self.secret_name = secret_name
         self.model = model
         self.api_key = self._get_api_key_from_key_vault()
-        self.client = Mistral(api_key=self.api_key)
+        self.client = registry.mistral(self.api_key)
 
     def _get_api_key_from_key_vault(self):
         try:
-            credential = DefaultAzureCredential()
-            client = SecretClient(vault_url=self.key_vault_url, credential=credential)
-            api_key = client.get_secret(self.secret_name).value
+            api_key = get_secret(self.secret_name, self.key_vault_url)
             return api_key
         except Exception as e:
             logging.error(f"Failed to retrieve Mistral API key from Key Vault: {str(e)}")
@@ -53,7 +51,11 @@ class MistralDocumentQA:
         return signed_url.url
 
     def ask_document(self, base64_pdf: str, prompt: str, filename="uploaded_file.pdf"):
-        """Send a prompt and a base64-encoded PDF to the Mistral OCR model and get the answer."""
+        """Send a prompt and a base64-encoded PDF to the Mistral OCR model and get the answer (cached per PDF, prompt and model)."""
+        key = cache_key(MISTRAL, self.model, prompt, document_hash=content_hash(base64.b64decode(base64_pdf)))
+        return response_cache().get_or_call(key, lambda: self._ask(base64_pdf, prompt, filename))
+
+    def _ask(self, base64_pdf, prompt, filename):
         document_url = self.upload_base64_pdf(base64_pdf, filename=filename)
         messages = [
             {
@@ -1,9 +1,9 @@
 import time
 import json
 import logging
-from openai import OpenAI
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
+from global_db.functions.key_vault import get_secret
+from AI_agents.clients import OPENAI, registry
+from AI_agents.response_cache import cache_key, file_hash, response_cache
 
 # --- Configuration ---
 ASSISTANT_ID = "asst_kEakqjQ22hzMVcuhToFvgMqq"
@@ -21,10 +21,8 @@ class PDFInvoiceExtractor:
     def initialize_api_key(self):
         """Fetch API key from Azure Key Vault and initialize OpenAI client."""
         try:
-            credential = DefaultAzureCredential()
-            secret_client = SecretClient(vault_url=self.key_vault_url, credential=credential)
-            self.api_key = secret_client.get_secret(self.secret_name).value
-            self.client = OpenAI(api_key=self.api_key)
+            self.api_key = get_secret(self.secret_name, self.key_vault_url)
+            self.client = registry.openai(self.api_key)
             logging.info("✅ OpenAI client initialized")
             return True
         except Exception as e:
@@ -74,6 +72,12 @@ class PDFInvoiceExtractor:
     "- Return ONLY valid JSON with the full list of items."
 )
 
+        # --- Same PDF and instructions as an earlier run: reuse its answer ---
+        key = cache_key(OPENAI, self.assistant_id, instructions, document_hash=file_hash(pdf_path))
+        return response_cache().get_or_call(key, lambda: self._run_assistant(pdf_path, instructions, timeout))
+
+    def _run_assistant(self, pdf_path, instructions, timeout):
+        """Uploads the PDF, runs the assistant on it and returns the parsed JSON (None on failure)."""
         # --- Upload PDF ---
         with open(pdf_path, "rb") as f:
             uploaded_file = self.client.files.create(file=f, purpose="assistants")
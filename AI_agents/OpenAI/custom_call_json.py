@@ -1,8 +1,7 @@
-from openai import OpenAI
 import logging
 import json
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
+from global_db.functions.key_vault import get_secret
+from AI_agents.clients import registry
 
 class CustomCallJSON:
     """OpenAI client that enforces JSON output using response_format"""
@@ -16,10 +15,8 @@ class CustomCallJSON:
 
     def initialize_api_key(self):
         try:
-            credential = DefaultAzureCredential()
-            client = SecretClient(vault_url=self.key_vault_url, credential=credential)
-            self.api_key = client.get_secret(self.secret_name).value
-            self.client = OpenAI(api_key=self.api_key)
+            self.api_key = get_secret(self.secret_name, self.key_vault_url)
+            self.client = registry.openai(self.api_key)
             return True
         except Exception as e:
             logging.error(f"Failed to retrieve OpenAI API key: {str(e)}")
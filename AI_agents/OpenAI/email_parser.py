@@ -1,7 +1,6 @@
-from openai import OpenAI
 import logging
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
+from global_db.functions.key_vault import get_secret
+from AI_agents.clients import registry
 
 class EmailDataExtractor:
     def __init__(self, key_vault_url="https://kv-functions-python.vault.azure.net", secret_name="OPENAI-API-KEY"):
@@ -13,10 +12,8 @@ class EmailDataExtractor:
 
     def initialize_api_key(self):
         try:
-            credential = DefaultAzureCredential()
-            client = SecretClient(vault_url=self.key_vault_url, credential=credential)
-            self.api_key = client.get_secret(self.secret_name).value
-            self.client = OpenAI(api_key=self.api_key)  # init OpenAI client here
+            self.api_key = get_secret(self.secret_name, self.key_vault_url)
+            self.client = registry.openai(self.api_key)  # init OpenAI client here
             return True
         except Exception as e:
             logging.error(f"Failed to retrieve OpenAI API key: {str(e)}")
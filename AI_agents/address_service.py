@@ -0,0 +1,181 @@
+import json
+import logging
+import re
+import threading
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+
+from cachetools import LRUCache
+
+from AI_agents.Gemeni.functions.functions import convert_to_list
+from AI_agents.OpenAI.custom_call import MODEL, CustomCall
+from AI_agents.response_cache import cache_key, response_cache, ResponseCache
+
+# --- Address Normalisation ---
+# Invoices of one request usually share a handful of consignees, and the same consignees come back
+# request after request. Addresses are reduced to a canonical key (case, spacing and separators
+# ignored); known keys are served from memory, then from the persistent LLM cache, and only the
+# remaining ones are sent to the model, BATCH_SIZE addresses per prompt.
+BATCH_SIZE = 40
+MAX_PARALLEL_BATCHES = 4
+MEMO_SIZE = 4096
+ADDRESS_TTL_SECONDS = 90 * 24 * 3600  # Known consignees rarely move
+EMPTY_ADDRESS = ['', '', '', '', '']
+
+ADDRESS_RULES = """The country should be represented by its 2-letter abbreviation code. If any field is missing, represent it with an empty string. If city or postal code only those two fields not mentioned find the correct ones from data and add it please. if the country is united kingdom put GB instead of UK."""
+
+
+def canonical_address(address):
+    """Key under which spellings of the same address meet: NFKC, case-folded, separators and spacing collapsed."""
+    text = unicodedata.normalize("NFKC", str(address)).casefold()
+    text = re.sub(r"[\s,;|]+", " ", text)
+    return text.strip(" .")
+
+
+def _is_parsed(value):
+    return isinstance(value, list) and len(value) == 5 and all(isinstance(part, str) for part in value)
+
+
+def _single_prompt(address):
+    return f"""Parse the following address into company name, street, city, postal code, and country. Return the result as a Python list with string elements only, without any additional text or code formatting. {ADDRESS_RULES}
+        the array should be 5 items long, in the order of [company, street, city, postal_code, country_code]
+        output should be a python list with string quotes like this and values inside the quotes as python strings ["", "", "", "", ""]
+        [{address}]"""
+
+
+def _batch_prompt(addresses):
+    lines = "\n".join(f"{i}. {address}" for i, address in enumerate(addresses, start=1))
+    return f"""Parse each of the following numbered addresses into company name, street, city, postal code, and country. {ADDRESS_RULES}
+        For every address give a list of 5 strings in the order [company, street, city, postal_code, country_code].
+        Return only a JSON object mapping each address number to its list, like {{"1": ["", "", "", "", ""], "2": ["", "", "", "", ""]}}, without any additional text or code formatting.
+{lines}"""
+
+
+def _parse_batch_response(text, count):
+    """{index: parsed address} for the well-formed entries of a batch answer."""
+    if not text:
+        return {}
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    try:
+        answers = json.loads(match.group(0) if match else text)
+    except (ValueError, TypeError):
+        logging.warning("Address batch answer is not valid JSON, parsing its addresses one by one.")
+        return {}
+    parsed = {}
+    for i in range(count):
+        value = answers.get(str(i + 1)) if isinstance(answers, dict) else None
+        if _is_parsed(value):
+            parsed[i] = value
+    return parsed
+
+
+class AddressService:
+    """Normalises addresses to [company, street, city, postal_code, country_code] (all '' when unparseable)."""
+
+    def __init__(self, cache=None, llm=None, batch_size=BATCH_SIZE):
+        self.cache = cache
+        self.llm = llm
+        self.batch_size = batch_size
+        self._memo = LRUCache(maxsize=MEMO_SIZE)
+        self._lock = threading.Lock()
+        self.llm_calls = 0
+
+    def _llm(self):
+        if self.llm is None:
+            self.llm = CustomCall()
+        return self.llm
+
+    def _cache_key(self, canonical):
+        return cache_key("address", MODEL, canonical)
+
+    def _known(self, canonical):
+        with self._lock:
+            value = self._memo.get(canonical)
+        if value is None and self.cache is not None:
+            value = self.cache.lookup(self._cache_key(canonical))
+            if _is_parsed(value):
+                self._remember(canonical, value, persist=False)
+            else:
+                value = None
+        return value
+
+    def _remember(self, canonical, value, persist=True, seconds=0.0):
+        with self._lock:
+            self._memo[canonical] = value
+        if persist and self.cache is not None:
+            self.cache.store(self._cache_key(canonical), value, seconds)
+
+    def _count_llm_call(self):
+        with self._lock:
+            self.llm_calls += 1
+
+    def _parse_one(self, address):
+        try:
+            self._count_llm_call()
+            result = convert_to_list(self._llm().send_request("user", _single_prompt(address)))
+        except Exception as e:
+            logging.error(f"Unexpected error during address parsing: {e}")
+            return None
+        return result if _is_parsed(result) else None
+
+    def _parse_batch(self, addresses):
+        """Parsed addresses in order (None where the model gave nothing usable even one by one)."""
+        if len(addresses) == 1:
+            return [self._parse_one(addresses[0])]
+        try:
+            self._count_llm_call()
+            parsed = _parse_batch_response(self._llm().send_request("user", _batch_prompt(addresses)), len(addresses))
+        except Exception as e:
+            logging.error(f"Address batch request failed, parsing its {len(addresses)} addresses one by one. Error: {e}")
+            parsed = {}
+        return [parsed[i] if i in parsed else self._parse_one(address) for i, address in enumerate(addresses)]
+
+    def normalise(self, addresses):
+        """Parsed addresses, aligned with `addresses`. Each distinct address is looked up (or parsed) once."""
+        canonicals = [canonical_address(a) if a and str(a).strip() else None for a in addresses]
+        results = {}
+        pending = {}  # canonical -> the first spelling seen
+        for address, canonical in zip(addresses, canonicals):
+            if canonical is None or canonical in results or canonical in pending:
+                continue
+            known = self._known(canonical)
+            if known is not None:
+                results[canonical] = known
+            else:
+                pending[canonical] = str(address).strip()
+
+        if pending:
+            keys = list(pending)
+            batches = [keys[i:i + self.batch_size] for i in range(0, len(keys), self.batch_size)]
+            start = time.monotonic()
+            if len(batches) == 1:
+                answers = [self._parse_batch([pending[k] for k in batches[0]])]
+            else:
+                with ThreadPoolExecutor(min(MAX_PARALLEL_BATCHES, len(batches))) as pool:
+                    answers = list(pool.map(lambda batch: self._parse_batch([pending[k] for k in batch]), batches))
+            seconds = (time.monotonic() - start) / len(keys)
+            for batch, values in zip(batches, answers):
+                for canonical, value in zip(batch, values):
+                    if value is not None:
+                        self._remember(canonical, value, seconds=seconds)
+                    results[canonical] = value
+            logging.info(f"Addresses: {len(addresses)} requested, {len(keys)} sent to the model in {len(batches)} batch(es).")
+
+        return [list(results.get(canonical) or EMPTY_ADDRESS) for canonical in canonicals]
+
+    def parse(self, address):
+        return self.normalise([address])[0]
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def address_service():
+    """The process-wide AddressService, persisting known addresses in the LLM response cache's backend."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = AddressService(ResponseCache(response_cache().backend, ttl_seconds=ADDRESS_TTL_SECONDS))
+        return _service
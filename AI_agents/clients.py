@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import os
+import threading
+import weakref
+
+from global_db.functions.key_vault import KEY_VAULT_URL, get_secret
+
+# --- Shared LLM Clients ---
+# One long-lived client per provider and API key, so every agent and pipeline reuses the same
+# keep-alive HTTP pool instead of paying a TLS handshake per extraction. Sync clients are shared
+# by the whole process; async clients are shared per event loop (an httpx pool is bound to its loop).
+#
+# Limits are set per provider with environment variables, e.g. LLM_OPENAI_MAX_CONNECTIONS=20:
+#   LLM_<PROVIDER>_MAX_CONNECTIONS   requests in flight at once; further calls wait for a free connection
+#   LLM_<PROVIDER>_TIMEOUT_SECONDS   timeout of one request, and of the wait for a free connection
+#                                    (httpx pool timeout; a semaphore for the requests.Session)
+OPENAI = "openai"
+MISTRAL = "mistral"
+GEMINI = "gemini"
+
+SECRET_NAMES = {OPENAI: "OPENAI-API-KEY", MISTRAL: "MISTRAL-API-KEY", GEMINI: "Gemeni-api-key"}
+DEFAULT_LIMITS = {
+    OPENAI: {"max_connections": 20, "timeout_seconds": 120},
+    MISTRAL: {"max_connections": 10, "timeout_seconds": 120},
+    GEMINI: {"max_connections": 10, "timeout_seconds": 60},
+}
+KEEPALIVE_EXPIRY_SECONDS = 60
+OPENAI_MAX_RETRIES = 2
+
+
+def provider_limit(provider, name):
+    """A provider limit from LLM_<PROVIDER>_<NAME> in the environment, else its default."""
+    default = DEFAULT_LIMITS[provider][name]
+    value = os.environ.get(f"LLM_{provider.upper()}_{name.upper()}")
+    if value is None:
+        return default
+    try:
+        return type(default)(float(value))
+    except ValueError:
+        logging.warning(f"Ignoring invalid LLM_{provider.upper()}_{name.upper()}={value!r}, using {default}.")
+        return default
+
+
+def _httpx_limits(provider):
+    import httpx
+    max_connections = provider_limit(provider, "max_connections")
+    return httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections,
+                        keepalive_expiry=KEEPALIVE_EXPIRY_SECONDS)
+
+
+def _bounded_session(max_requests, wait_timeout):
+    """
+    A requests.Session allowing `max_requests` requests in flight. The requests' own timeout does not
+    cover the wait for a pooled connection, so that wait is bounded here: a request that cannot start
+    within `wait_timeout` seconds raises requests.exceptions.Timeout. (Not for stream=True responses,
+    which keep their connection after request() returns.)
+    """
+    import requests
+
+    class BoundedSession(requests.Session):
+        def __init__(self):
+            super().__init__()
+            self._slots = threading.BoundedSemaphore(max_requests)
+
+        def request(self, *args, **kwargs):
+            if not self._slots.acquire(timeout=wait_timeout):
+                raise requests.exceptions.Timeout(f"No free connection within {wait_timeout}s ({max_requests} requests in flight).")
+            try:
+                return super().request(*args, **kwargs)
+            finally:
+                self._slots.release()
+
+    return BoundedSession()
+
+
+class ClientRegistry:
+    """Creates each client once per (kind, api key) and hands out the same instance afterwards."""
+
+    def __init__(self):
+        self._clients = {}
+        self._async_clients = weakref.WeakKeyDictionary()  # event loop -> {key: client}
+        self._lock = threading.Lock()
+
+    def _get(self, key, create):
+        with self._lock:
+            if key not in self._clients:
+                self._clients[key] = create()
+            return self._clients[key]
+
+    def _get_async(self, key, create):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            clients = self._async_clients.setdefault(loop, {})
+            if key not in clients:
+                clients[key] = create()
+            return clients[key]
+
+    def openai(self, api_key):
+        def create():
+            import httpx
+            from openai import OpenAI
+            timeout = provider_limit(OPENAI, "timeout_seconds")
+            return OpenAI(api_key=api_key, timeout=timeout, max_retries=OPENAI_MAX_RETRIES,
+                          http_client=httpx.Client(limits=_httpx_limits(OPENAI), timeout=timeout))
+        return self._get(("openai", api_key), create)
+
+    def async_openai(self, api_key):
+        def create():
+            import httpx
+            from openai import AsyncOpenAI
+            timeout = provider_limit(OPENAI, "timeout_seconds")
+            return AsyncOpenAI(api_key=api_key, timeout=timeout, max_retries=OPENAI_MAX_RETRIES,
+                               http_client=httpx.AsyncClient(limits=_httpx_limits(OPENAI), timeout=timeout))
+        return self._get_async(("async_openai", api_key), create)
+
+    def mistral(self, api_key):
+        def create():
+            import httpx
+            from mistralai import Mistral
+            timeout = provider_limit(MISTRAL, "timeout_seconds")
+            return Mistral(api_key=api_key, timeout_ms=int(timeout * 1000),
+                           client=httpx.Client(limits=_httpx_limits(MISTRAL), timeout=timeout, follow_redirects=True))
+        return self._get(("mistral", api_key), create)
+
+    def http_session(self, provider):
+        """A requests.Session with a keep-alive pool sized for `provider` (for REST-only APIs such as Gemini)."""
+        def create():
+            from requests.adapters import HTTPAdapter
+            size = provider_limit(provider, "max_connections")
+            session = _bounded_session(size, provider_limit(provider, "timeout_seconds"))
+            session.mount("https://", HTTPAdapter(pool_connections=size, pool_maxsize=size))
+            return session
+        return self._get(("session", provider), create)
+
+
+registry = ClientRegistry()
+
+
+def openai_client(secret_name=SECRET_NAMES[OPENAI], key_vault_url=KEY_VAULT_URL):
+    """The shared OpenAI client."""
+    return registry.openai(get_secret(secret_name, key_vault_url))
+
+
+async def async_openai_client(secret_name=SECRET_NAMES[OPENAI], key_vault_url=KEY_VAULT_URL):
+    """The shared AsyncOpenAI client of the running event loop. Do not close it."""
+    api_key = await asyncio.to_thread(get_secret, secret_name, key_vault_url)
+    return registry.async_openai(api_key)
+
+
+def mistral_client(secret_name=SECRET_NAMES[MISTRAL], key_vault_url=KEY_VAULT_URL):
+    """The shared Mistral client."""
+    return registry.mistral(get_secret(secret_name, key_vault_url))
+
+
+def gemini_session():
+    """The shared requests.Session for Gemini REST calls."""
+    return registry.http_session(GEMINI)
@@ -0,0 +1,287 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+# --- LLM Response Cache ---
+# Extraction calls are resent often (Logic App retries, operators re-running a dossier). Responses
+# are cached under a content address: the hash of (provider, model, prompt, document, parameters),
+# so a replay of the same prompt on the same document is answered without calling the model.
+# Failed calls (None) are never cached.
+#
+# Configuration (environment):
+#   LLM_CACHE_BACKEND        "sqlite" (default, a file on the worker), "blob" (shared by all workers) or "off"
+#   LLM_CACHE_PATH           SQLite file (default: <tmp>/llm-response-cache.sqlite)
+#   LLM_CACHE_TTL_SECONDS    age after which an entry is ignored and replaced (default 7 days)
+#   LLM_CACHE_MAX_BYTES      total size kept; the least recently used entries are evicted beyond it
+#
+# Several ResponseCaches with different TTLs can share one backend (the address and MIL/GOV verdict
+# stores keep entries for months). Each entry therefore records its own expiry, set by the cache
+# that wrote it; only the size limit applies to the backend as a whole.
+CACHE_BACKEND_ENV = "LLM_CACHE_BACKEND"
+CACHE_PATH_ENV = "LLM_CACHE_PATH"
+CACHE_TTL_ENV = "LLM_CACHE_TTL_SECONDS"
+CACHE_MAX_BYTES_ENV = "LLM_CACHE_MAX_BYTES"
+CACHE_TTL_SECONDS = 7 * 24 * 3600
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+CACHE_FILE_NAME = "llm-response-cache.sqlite"
+
+BLOB_SECRET_NAME = "azure-storage-account-access-key2"
+BLOB_CONTAINER = "document-intelligence"
+BLOB_PREFIX = "llm-response-cache/"
+BLOB_PRUNE_EVERY_PUTS = 200
+BLOB_EXPIRES_KEY = "expires_at"  # Blob metadata: expiry of the entry, in epoch seconds
+
+
+def content_hash(data):
+    """sha256 hex digest of bytes or text (text is hashed as UTF-8)."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(path, chunk_size=1024 * 1024):
+    """sha256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(provider, model, prompt, document_hash=None, params=None):
+    """
+    Content address of one LLM call. `prompt` is any JSON-serialisable value (text, or a list of
+    messages); `document_hash` identifies an attached document; `params` holds the generation
+    parameters that change the answer (temperature, max_tokens, ...).
+    """
+    prompt_hash = content_hash(json.dumps(prompt, sort_keys=True, ensure_ascii=False))
+    address = json.dumps([provider, model, prompt_hash, document_hash, params or {}], sort_keys=True, default=str)
+    return content_hash(address)
+
+
+def _expires_at(metadata):
+    """Expiry recorded in a cache blob's metadata (never, for blobs written without one)."""
+    try:
+        return float((metadata or {})[BLOB_EXPIRES_KEY])
+    except (KeyError, ValueError):
+        return float("inf")
+
+
+class SQLiteBackend:
+    """
+    Entries in a local SQLite file. On write, entries past their own expiry are deleted, then those
+    beyond `max_bytes` (least recently used first).
+    """
+
+    def __init__(self, path, max_bytes=CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL, expires_at REAL NOT NULL DEFAULT 0)")
+        columns = {row[1] for row in self._connection.execute("PRAGMA table_info(responses)")}
+        if "expires_at" not in columns:
+            # Files written before entries had their own expiry: their entries expire at once
+            self._connection.execute("ALTER TABLE responses ADD COLUMN expires_at REAL NOT NULL DEFAULT 0")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS responses_expires ON responses (expires_at)")
+
+    def get(self, key, max_age):
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute("SELECT value, created_at, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > max_age or now >= row[2]:
+                return None
+            self._connection.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def put(self, key, value, max_age):
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            connection = self._connection
+            connection.execute("BEGIN")
+            try:
+                connection.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, size, created_at, accessed_at, expires_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, value, size, now, now, now + max_age))
+                connection.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+                total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+                if total > self.max_bytes:
+                    # Oldest-accessed first, until the rest fits
+                    connection.execute(
+                        "DELETE FROM responses WHERE key IN (SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY accessed_at DESC) AS kept "
+                        "FROM responses) WHERE kept > ?)", (self.max_bytes,))
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+
+
+class BlobBackend:
+    """
+    Entries as blobs under `prefix`, shared by every worker. Each blob records its expiry in its
+    metadata; an entry past it, or older than the reader's TTL, is ignored. Every BLOB_PRUNE_EVERY_PUTS
+    writes, expired entries and those beyond `max_bytes` (least recently written first) are deleted.
+    """
+
+    def __init__(self, container_client, prefix=BLOB_PREFIX, max_bytes=CACHE_MAX_BYTES):
+        self.container = container_client
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self._puts = 0
+        self._lock = threading.Lock()
+
+    def _blob_name(self, key):
+        return f"{self.prefix}{key[:2]}/{key}.json"
+
+    def get(self, key, max_age):
+        from azure.core.exceptions import ResourceNotFoundError
+        try:
+            downloader = self.container.get_blob_client(self._blob_name(key)).download_blob()
+        except ResourceNotFoundError:
+            return None
+        now = time.time()
+        if now - downloader.properties.last_modified.timestamp() > max_age or now >= _expires_at(downloader.properties.metadata):
+            return None
+        return downloader.readall().decode("utf-8")
+
+    def put(self, key, value, max_age):
+        from azure.storage.blob import ContentSettings
+        self.container.get_blob_client(self._blob_name(key)).upload_blob(
+            value.encode("utf-8"), overwrite=True, content_settings=ContentSettings(content_type="application/json"),
+            metadata={BLOB_EXPIRES_KEY: str(int(time.time() + max_age))})
+        with self._lock:
+            self._puts += 1
+            prune = self._puts % BLOB_PRUNE_EVERY_PUTS == 0
+        if prune:
+            self.prune()
+
+    def prune(self):
+        """
+        Deletes entries past their expiry, then the least recently written ones beyond `max_bytes`.
+        Entries written without an expiry are only ever evicted for size.
+        """
+        now = time.time()
+        kept, total = [], 0
+        for blob in self.container.list_blobs(name_starts_with=self.prefix, include=["metadata"]):
+            if now >= _expires_at(blob.metadata):
+                self.container.get_blob_client(blob.name).delete_blob()
+            else:
+                kept.append(blob)
+                total += blob.size
+        for blob in sorted(kept, key=lambda b: b.last_modified):
+            if total <= self.max_bytes:
+                break
+            self.container.get_blob_client(blob.name).delete_blob()
+            total -= blob.size
+
+
+class ResponseCache:
+    """
+    get_or_call() in front of a backend. Values must be JSON-serialisable. Backend failures are
+    logged and counted but never fail the call: the model is called instead.
+    """
+
+    def __init__(self, backend, ttl_seconds=CACHE_TTL_SECONDS):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.errors = 0
+        self.saved_seconds = 0.0  # Model time not spent thanks to hits (as measured on the original calls)
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def lookup(self, key):
+        """The cached value of `key`, or None (counted as a miss)."""
+        raw = None
+        if self.backend is not None:
+            try:
+                raw = self.backend.get(key, self.ttl_seconds)
+            except Exception as e:
+                self._count("errors")
+                logging.warning(f"LLM cache read failed, calling the model. Error: {e}")
+        if raw is None:
+            self._count("misses")
+            return None
+        entry = json.loads(raw)
+        self._count("hits")
+        self._count("saved_seconds", entry.get("seconds", 0.0))
+        logging.info(f"LLM cache hit {key[:12]} (saved {entry.get('seconds', 0.0):.1f}s)")
+        return entry["value"]
+
+    def store(self, key, value, seconds=0.0):
+        """Stores `value` (not None) under `key`; `seconds` is the model time it took."""
+        if value is None or self.backend is None:
+            return
+        try:
+            self.backend.put(key, json.dumps({"value": value, "seconds": seconds}, ensure_ascii=False), self.ttl_seconds)
+        except Exception as e:
+            self._count("errors")
+            logging.warning(f"LLM cache write failed. Error: {e}")
+
+    def get_or_call(self, key, call):
+        """Cached response of `key`, else call() (whose result is stored unless it is None)."""
+        value = self.lookup(key)
+        if value is not None:
+            return value
+        start = time.monotonic()
+        value = call()
+        self.store(key, value, time.monotonic() - start)
+        return value
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "errors": self.errors,
+                    "hit_rate": self.hits / lookups if lookups else 0.0, "saved_seconds": round(self.saved_seconds, 3)}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def _env_number(name, default):
+    try:
+        return type(default)(float(os.environ.get(name, default)))
+    except ValueError:
+        logging.warning(f"Ignoring invalid {name}={os.environ.get(name)!r}, using {default}.")
+        return default
+
+
+def _default_backend():
+    kind = os.environ.get(CACHE_BACKEND_ENV, "sqlite").lower()
+    max_bytes = _env_number(CACHE_MAX_BYTES_ENV, CACHE_MAX_BYTES)
+    if kind == "off":
+        return None
+    if kind == "blob":
+        from azure.storage.blob import BlobServiceClient
+        from global_db.functions.key_vault import get_secret
+        service = BlobServiceClient.from_connection_string(get_secret(BLOB_SECRET_NAME))
+        return BlobBackend(service.get_container_client(BLOB_CONTAINER), max_bytes=max_bytes)
+    path = os.environ.get(CACHE_PATH_ENV) or os.path.join(tempfile.gettempdir(), CACHE_FILE_NAME)
+    return SQLiteBackend(path, max_bytes=max_bytes)
+
+
+def response_cache():
+    """The process-wide ResponseCache (a cache without backend if the configured one cannot be opened)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            try:
+                backend = _default_backend()
+            except Exception as e:
+                logging.error(f"Failed to open the LLM response cache, caching disabled. Error: {e}")
+                backend = None
+            _cache = ResponseCache(backend, ttl_seconds=_env_number(CACHE_TTL_ENV, CACHE_TTL_SECONDS))
+        return _cache
@@ -4,8 +4,6 @@ import json
 import os
 import base64
 
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
 from azure.ai.formrecognizer import DocumentAnalysisClient
 from azure.core.credentials import AzureKeyCredential
 
@@ -15,6 +13,7 @@ from Crosby.helpers.functions import change_date_format, clean_customs_code, cle
 from ILS_NUMBER.get_ils_number import call_logic_app
 from global_db.countries.functions import get_abbreviation_by_country
 from global_db.functions.numbers.functions import normalize_numbers
+from global_db.functions.key_vault import get_secret
 
 def main(req: func.HttpRequest) -> func.HttpResponse:
     logging.info('Processing file upload request.')
@@ -45,12 +44,10 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
     # Key Vault and Form Recognizer setup
     key_vault_url = "https://kv-functions-python.vault.azure.net"
     secret_name = "azure-form-recognizer-key-2"
-    credential = DefaultAzureCredential()
-    client = SecretClient(vault_url=key_vault_url, credential=credential)
 
     # Retrieve the secret value
     try:
-        api_key = client.get_secret(secret_name).value
+        api_key = get_secret(secret_name, key_vault_url)
     except Exception as e:
         logging.error(f"Failed to retrieve secret: {str(e)}")
         return func.HttpResponse(
@@ -151,9 +148,7 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
         #switch the address country to abbr
         address = result_dict.get("Adrress", "")[0]
         parser = AddressParser()
-        address = parser.format_address_to_line_old_addresses(address)
-        parsed_result = parser.parse_address(address)
-        result_dict["Adrress"] = parsed_result
+        result_dict["Adrress"] = parser.format_address_to_line_old_addresses(address)  # parsed below, for all invoices at once
         #address["Country"] = get_abbreviation_by_country(address.get("Country", ""))    
             
         #update the numbers in the items
@@ -181,6 +176,10 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
             
         results.append(result_dict)  
         
+    parsed_addresses = AddressParser().parse_addresses([inv["Adrress"] for inv in results])
+    for inv, parsed_result in zip(results, parsed_addresses):
+        inv["Adrress"] = parsed_result
+
     results = combine_invoices_by_address(results)
     
     '''------------------Extract data from mail body-----------------------'''
@@ -4,16 +4,13 @@ import json
 import pandas as pd
 import io
 from azure.storage.blob import BlobServiceClient
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
 from DailyContainerCheck.functions.functions import is_valid_container_number, string_to_unique_array
+from global_db.functions.key_vault import get_secret
 
 # Key Vault Configuration
 key_vault_url = "https://kv-functions-python.vault.azure.net"
 secret_name = "azure-storage-account-access-key2"
-credential = DefaultAzureCredential()
-client = SecretClient(vault_url=key_vault_url, credential=credential)
-api_key = client.get_secret(secret_name).value
+api_key = get_secret(secret_name, key_vault_url)
 
 # Blob Storage Configuration
 CONNECTION_STRING = api_key
@@ -2,10 +2,14 @@
 Donna OpenAI API - Custom Call
 Basic text-to-text OpenAI API calls.
 """
-from openai import OpenAI
 import logging
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
+from global_db.functions.key_vault import get_secret
+from AI_agents.clients import OPENAI, registry
+from AI_agents.response_cache import cache_key, response_cache
+
+MODEL = "gpt-4o-2024-08-06"
+TEMPERATURE = 0
+MAX_TOKENS = 10000
 
 
 class CustomCall:
@@ -18,10 +22,8 @@ class CustomCall:
 
     def initialize_api_key(self):
         try:
-            credential = DefaultAzureCredential()
-            client = SecretClient(vault_url=self.key_vault_url, credential=credential)
-            self.api_key = client.get_secret(self.secret_name).value
-            self.client = OpenAI(api_key=self.api_key)
+            self.api_key = get_secret(self.secret_name, self.key_vault_url)
+            self.client = registry.openai(self.api_key)
             return True
         except Exception as e:
             logging.error(f"Failed to retrieve OpenAI API key: {str(e)}")
@@ -32,15 +34,20 @@ class CustomCall:
             logging.error("OpenAI API client is not initialized")
             return None
 
+        messages = [
+            {"role": "system", "content": role},
+            {"role": "user", "content": prompt_text}
+        ]
+        key = cache_key(OPENAI, MODEL, messages, params={"temperature": TEMPERATURE, "max_tokens": MAX_TOKENS})
+        return response_cache().get_or_call(key, lambda: self._complete(messages))
+
+    def _complete(self, messages):
         try:
             response = self.client.chat.completions.create(
-                model="gpt-4o-2024-08-06",
-                messages=[
-                    {"role": "system", "content": role},
-                    {"role": "user", "content": prompt_text}
-                ],
-                temperature=0,
-                max_tokens=10000
+                model=MODEL,
+                messages=messages,
+                temperature=TEMPERATURE,
+                max_tokens=MAX_TOKENS
             )
             return response.choices[0].message.content
         except Exception as e:
@@ -2,10 +2,9 @@
 Donna OpenAI API - Custom Call With Image
 OpenAI API calls with image input (vision).
 """
-from openai import OpenAI
 import logging
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
+from global_db.functions.key_vault import get_secret
+from AI_agents.clients import registry
 
 
 class CustomCallWithImage:
@@ -18,10 +17,8 @@ class CustomCallWithImage:
 
     def initialize_api_key(self):
         try:
-            credential = DefaultAzureCredential()
-            client = SecretClient(vault_url=self.key_vault_url, credential=credential)
-            self.api_key = client.get_secret(self.secret_name).value
-            self.client = OpenAI(api_key=self.api_key)
+            self.api_key = get_secret(self.secret_name, self.key_vault_url)
+            self.client = registry.openai(self.api_key)
             return True
         except Exception as e:
             logging.error(f"🔐 Failed to get API key: {str(e)}")
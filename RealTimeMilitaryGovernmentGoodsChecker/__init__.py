@@ -1,13 +1,28 @@
 import azure.functions as func
 import logging
 import json
+import threading
 from cachetools import TTLCache
 
 from AI_agents.Gemeni.adress_detector_mil_gov import AddressDetector
-from RealTimeMilitaryGovernmentGoodsChecker.functions.functions import transform_data
+from AI_agents.response_cache import ResponseCache, response_cache
+from RealTimeMilitaryGovernmentGoodsChecker.functions.functions import screen_consignees, transform_data
+
+# MIL/GOV verdicts per canonical consignee address: in memory for a day, persisted for 30 days
+verdict_cache = TTLCache(maxsize=2000, ttl=86400)  # Cache stores up to 2000 items for 1 day (86400 seconds)
+VERDICT_TTL_SECONDS = 30 * 24 * 3600
+_verdict_store = None
+_verdict_store_lock = threading.Lock()
+
+
+def verdict_store():
+    """Persistent verdicts, kept in the LLM response cache backend (each entry expires on its own 30-day TTL)."""
+    global _verdict_store
+    with _verdict_store_lock:
+        if _verdict_store is None:
+            _verdict_store = ResponseCache(response_cache().backend, ttl_seconds=VERDICT_TTL_SECONDS)
+        return _verdict_store
 
-# Initialize the TTLCache with a maximum size and time-to-live (TTL)
-error_cache = TTLCache(maxsize=2000, ttl=86400000)  # Cache stores up to 2000 items for 1 day (86400 seconds)
 
 def main(req: func.HttpRequest) -> func.HttpResponse:
     logging.info('Processing file upload request.')
@@ -35,10 +50,10 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
    
     detector = AddressDetector()
 
-    for result in data:
-        address = result.get("ADDRESS", "")[0]
-        parsed_result = detector.parse_address(address)
-        result["MIL/GOV"] = parsed_result.replace('\n', '')
+    # Identical consignees are screened once; known ones come from the caches
+    verdicts = screen_consignees([result.get("ADDRESS", "") for result in data], detector, verdict_cache, verdict_store())
+    for result, verdict in zip(data, verdicts):
+        result["MIL/GOV"] = verdict
     
     try:
         return func.HttpResponse(
@@ -1,3 +1,10 @@
+import logging
+import threading
+
+from AI_agents.address_service import canonical_address
+from AI_agents.Gemeni.functions.functions import GEMINI_MODEL
+from AI_agents.response_cache import cache_key
+
 def transform_data(rows):
     transformed_rows = []
     
@@ -19,4 +26,61 @@ def transform_data(rows):
         }
         transformed_rows.append(transformed_row)
     
-    return transformed_rows
\ No newline at end of file
+    return transformed_rows
+
+
+def normalize_verdict(verdict):
+    """The detector's answer as "Yes" / "No", or None for anything else (failures, refusals, explanations)."""
+    if verdict is None:
+        return None
+    text = verdict.replace('\n', '').strip().strip('"\'. ')
+    if text.lower() in ("yes", "no"):
+        return text.capitalize()
+    return None
+
+
+_memo_lock = threading.Lock()
+
+
+def screen_consignees(addresses, detector, memo, store=None):
+    """
+    MIL/GOV verdict of each address, aligned with `addresses`. Identical consignees (same canonical
+    address) are screened once; verdicts come from `memo` (an in-process TTLCache), then from `store`
+    (a persistent ResponseCache), and only the remaining addresses are sent to the detector, concurrently.
+    Failed screenings and answers other than "Yes"/"No" give "" and are not cached, so the next request retries them.
+    """
+    keys = [canonical_address(address) if address else "" for address in addresses]
+    verdicts = {"": ""}
+    missing = {}  # canonical address -> the first spelling seen
+    for address, key in zip(addresses, keys):
+        if key in verdicts or key in missing:
+            continue
+        with _memo_lock:
+            verdict = memo.get(key)
+        if verdict is None and store is not None:
+            verdict = normalize_verdict(store.lookup(cache_key("mil-gov", GEMINI_MODEL, key)))
+            if verdict is not None:
+                with _memo_lock:
+                    memo[key] = verdict
+        if verdict is None:
+            missing[key] = address
+        else:
+            verdicts[key] = verdict
+
+    if missing:
+        answers = detector.parse_addresses(list(missing.values()))
+        for key, answer in zip(missing, answers):
+            verdict = normalize_verdict(answer)
+            if verdict is None:
+                if answer is not None:
+                    logging.warning(f"Unexpected MIL/GOV answer for '{missing[key]}', not cached: {answer!r}")
+                verdicts[key] = ""
+                continue
+            verdicts[key] = verdict
+            with _memo_lock:
+                memo[key] = verdict
+            if store is not None:
+                store.store(cache_key("mil-gov", GEMINI_MODEL, key), verdict)
+    logging.info(f"MIL/GOV screening: {len(addresses)} rows, {len(set(keys) - {''})} distinct addresses, {len(missing)} sent to the model.")
+
+    return [verdicts[key] for key in keys]
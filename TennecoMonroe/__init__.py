@@ -92,12 +92,8 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
             # extract the file and put it on global for multiple files case
             first_page_data = json.loads(extract_text_from_first_page(uploaded_file_path, first_page_coords, first_page_key_map, useVatBackup=True))
             #logging.error(first_page_data)
-            #extract the the adress into company name, street, city ....
-            address = first_page_data.get("Address")
-            parser = AddressParser()
-            parsed_result = parser.parse_address(address)
+            #the adress is split into company name, street, city .... below, for all invoices at once
             #first_page_data["Address"] = get_address_structure(first_page_data["Address"])
-            first_page_data["Address"] = parsed_result
             #clean the VAT from other chars
             first_page_data["Vat"] = clean_VAT(first_page_data["Vat"])
             first_page_data["Customer NO"] = clean_data_from_texts_that_above_value(first_page_data["Customer NO"])
@@ -180,6 +176,11 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
 
     
     if multiple_invoices:
+        '''------------------- parse the addresses of all invoices at once --------------------------'''
+        parsed_addresses = AddressParser().parse_addresses([inv.get("Address") for inv in multiple_invoices])
+        for inv, parsed_result in zip(multiple_invoices, parsed_addresses):
+            inv["Address"] = parsed_result
+
         '''------------------- merging the data to be one object --------------------------'''
         merged_data = merge_pdf_data(multiple_invoices)
         
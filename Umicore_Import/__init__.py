@@ -3,11 +3,8 @@ import azure.functions as func
 import logging
 import json
 import base64
-from openai import AsyncOpenAI
 import fitz  # PyMuPDF
 from io import BytesIO
-from azure.identity.aio import DefaultAzureCredential
-from azure.keyvault.secrets.aio import SecretClient
 import asyncio
 import time
 import re
@@ -17,6 +14,7 @@ import uuid
 from ILS_NUMBER.get_ils_number import call_logic_app
 from Umicore_Import.helpers.functions import merge_into_items, split_cost_centers, transform_afschrijfgegevens, transform_inklaringsdocument
 from Umicore_Import.excel.create_excel import write_to_excel
+from AI_agents.clients import async_openai_client
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -44,39 +42,13 @@ def check_filename_pattern(filename):
 
 @asynccontextmanager
 async def get_openai_client():
-    """Context manager to safely create and close OpenAI client"""
-    client = None
-    credential = None
-    
+    """Context manager handing out the shared, pooled AsyncOpenAI client (it stays open for later requests)"""
     try:
-        # Create credential and secret client
-        credential = DefaultAzureCredential()
-        secret_client = SecretClient(vault_url=KEY_VAULT_URL, credential=credential)
-        
-        try:
-            # Get API key
-            secret = await secret_client.get_secret(OPENAI_SECRET_NAME)
-            api_key = secret.value
-            
-            # Create OpenAI client
-            client = AsyncOpenAI(api_key=api_key)
-            yield client
-            
-        finally:
-            # Close secret client
-            await secret_client.close()
-            
+        client = await async_openai_client(OPENAI_SECRET_NAME, KEY_VAULT_URL)
     except Exception as e:
         logger.error(f"Failed to initialize OpenAI client: {str(e)}")
         raise
-    finally:
-        # Ensure credential is closed
-        if credential:
-            await credential.close()
-        
-        # Ensure client is closed
-        if client:
-            await client.close()
+    yield client
 
 @asynccontextmanager
 async def open_pdf(pdf_content):
@@ -86,12 +86,10 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
         header_inv_data = extract_invoice_meta_and_shipping(first_page_text)
 
         address = header_inv_data.get("shipping_address", "")
+        address2 = header_inv_data.get("billing_address", "")
         parser = AddressParser()
-        parsed_result = parser.parse_address(address)
+        parsed_result, parsed_result2 = parser.parse_addresses([address, address2])
         header_inv_data["shipping_address"] = parsed_result
-        
-        address2 = header_inv_data.get("billing_address", "")
-        parsed_result2 = parser.parse_address(address2)
         header_inv_data["billing_address"] = parsed_result2
         
         # ----------------------------------------
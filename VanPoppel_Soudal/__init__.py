@@ -7,8 +7,6 @@ import os
 import base64
 import fitz
 
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
 from azure.ai.formrecognizer import DocumentAnalysisClient 
 from azure.core.credentials import AzureKeyCredential
 
@@ -23,6 +21,7 @@ from VanPoppel_Soudal.excel.create_sideExcel import extract_clean_excel_from_pdf
 from VanPoppel_Soudal.helpers.functions import clean_incoterm, clean_customs_code, merge_factuur_objects, safe_float_conversion, parse_numbers, parse_weights
 from VanPoppel_Soudal.excel.create_excel import write_to_excel
 from VanPoppel_Soudal.zip.create_zip import zip_excels
+from global_db.functions.key_vault import get_secret
 
 # --- Helper Function to Split PDF ---
 def split_pdf_by_pages(source_path: str, start_pages: list) -> list:
@@ -68,11 +67,9 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
         
     key_vault_url = "https://kv-functions-python.vault.azure.net"
     secret_name = "azure-form-recognizer-key-2" 
-    credential = DefaultAzureCredential()
-    secret_client = SecretClient(vault_url=key_vault_url, credential=credential)
 
     try:
-        api_key = secret_client.get_secret(secret_name).value
+        api_key = get_secret(secret_name, key_vault_url)
     except Exception as e:
         return func.HttpResponse(body=json.dumps({"error": "Failed to retrieve secret", "details": str(e)}), status_code=500, mimetype="application/json")
     
@@ -190,10 +187,6 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
                     customs_code = result_dict.get("Rex Number", "")
                     result_dict["Customs Code"] = clean_customs_code(customs_code)
                     
-                    address = result_dict.get("Address", "")
-                    parser = AddressParser()
-                    result_dict["Address"] = parser.parse_address(address)
-                    
                     result_dict["Total Gross"] = safe_float_conversion(parse_weights(result_dict.get("Total Gross", 0.0)))
                     result_dict["Total Net"] = safe_float_conversion(parse_weights(result_dict.get("Total Net", 0.0)))
 
@@ -394,6 +387,11 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
 
     if not factuur_results:
         return func.HttpResponse(body=json.dumps({"error": "No factuur files were successfully processed"}), status_code=400, mimetype="application/json")
+
+    # Parse the addresses of all invoice parts at once
+    parsed_addresses = AddressParser().parse_addresses([inv.get("Address", "") for inv in factuur_results])
+    for inv, parsed_address in zip(factuur_results, parsed_addresses):
+        inv["Address"] = parsed_address
     
     try:
         prompt = f"Extract the exit office code from the email body: '''{email_body}'''. The code is like BE212000. Return only the code or 'NOT Found', no text explanation no other text only code or 'NOT Found'."
@@ -5,8 +5,6 @@ import os
 import base64
 import zipfile
 
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
 from azure.ai.formrecognizer import DocumentAnalysisClient # Use this API key to call Azure Document Intelligence
 from azure.core.credentials import AzureKeyCredential
 
@@ -15,6 +13,7 @@ from bleckman.helpers.functions import cast_arrays_to_float, cast_arrays_to_int,
 from bleckman.service.extractors import extract_text_from_first_page, extract_text_from_first_page_arrs
 from bleckman.config.keywords import key_map, coordinates
 from bleckman.excel.excel import create_excel
+from global_db.functions.key_vault import get_secret
 
 def main(req: func.HttpRequest) -> func.HttpResponse:
     logging.info('Processing file upload request.')
@@ -43,15 +42,10 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
     key_vault_url = "https://kv-functions-python.vault.azure.net"
     secret_name = "azure-form-recognizer-key-2"  # The name of the secret you created
     
-    # Use DefaultAzureCredential for authentication
-    credential = DefaultAzureCredential()
-
-    # Create a SecretClient to interact with the Key Vault
-    client = SecretClient(vault_url=key_vault_url, credential=credential)
 
     # Retrieve the secret value
     try:
-        api_key = client.get_secret(secret_name).value
+        api_key = get_secret(secret_name, key_vault_url)
     except Exception as e:
         logging.error(f"---------------Failed to retrieve secret: {str(e)}")
         return func.HttpResponse(
@@ -0,0 +1,97 @@
+import time
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError, ResourceNotModifiedError
+
+# --- In-Memory Blob Container ---
+# Stand-in for azure.storage.blob.ContainerClient in the test scripts: the calls the stores and caches
+# make (conditional uploads and deletes, ranged and conditional downloads, metadata, prefix listings),
+# with the same exceptions. last_modified follows time.time(), so tests can move the clock.
+
+
+class _Blob:
+    def __init__(self, data, metadata):
+        self.data = data
+        self.etag = f'"{uuid.uuid4().hex}"'
+        self.metadata = dict(metadata or {})
+        self.last_modified = datetime.fromtimestamp(time.time(), timezone.utc)
+
+    def properties(self, name):
+        return SimpleNamespace(name=name, etag=self.etag, size=len(self.data), metadata=dict(self.metadata), last_modified=self.last_modified)
+
+
+class _Downloader:
+    def __init__(self, data, properties):
+        self._data = data
+        self.properties = properties
+
+    def readall(self):
+        return self._data
+
+
+def _check_condition(blob, etag, match_condition):
+    if match_condition == MatchConditions.IfNotModified and (blob is None or blob.etag != etag):
+        raise ResourceModifiedError("The condition specified using HTTP conditional header(s) is not met.")
+
+
+class FakeBlobClient:
+    def __init__(self, container, name):
+        self.container = container
+        self.blob_name = name
+
+    def _blob(self):
+        blob = self.container.blobs.get(self.blob_name)
+        if blob is None:
+            raise ResourceNotFoundError(f"The specified blob does not exist: {self.blob_name}")
+        return blob
+
+    def exists(self):
+        return self.blob_name in self.container.blobs
+
+    def get_blob_properties(self):
+        return self._blob().properties(self.blob_name)
+
+    def download_blob(self, offset=None, length=None, etag=None, match_condition=None):
+        blob = self._blob()
+        if match_condition == MatchConditions.IfModified and blob.etag == etag:
+            raise ResourceNotModifiedError("The condition specified using HTTP conditional header(s) is not met.")
+        data = blob.data
+        if offset is not None:
+            data = data[offset:offset + length if length is not None else None]
+        self.container.downloads += 1
+        return _Downloader(data, blob.properties(self.blob_name))
+
+    def upload_blob(self, data, overwrite=False, etag=None, match_condition=None, metadata=None, content_settings=None):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        current = self.container.blobs.get(self.blob_name)
+        if current is not None and not overwrite:
+            raise ResourceExistsError(f"The specified blob already exists: {self.blob_name}")
+        _check_condition(current, etag, match_condition)
+        blob = _Blob(bytes(data), metadata)
+        self.container.blobs[self.blob_name] = blob
+        return {"etag": blob.etag, "last_modified": blob.last_modified}
+
+    def delete_blob(self, etag=None, match_condition=None):
+        _check_condition(self._blob(), etag, match_condition)
+        del self.container.blobs[self.blob_name]
+
+
+class FakeContainerClient:
+    def __init__(self):
+        self.blobs = {}  # name -> _Blob
+        self.downloads = 0
+
+    def get_blob_client(self, blob):
+        return FakeBlobClient(self, blob)
+
+    def list_blobs(self, name_starts_with=None, include=None):
+        for name in sorted(self.blobs):
+            if name.startswith(name_starts_with or ""):
+                properties = self.blobs[name].properties(name)
+                if not include or "metadata" not in include:
+                    properties.metadata = None
+                yield properties
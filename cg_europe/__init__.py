@@ -5,8 +5,6 @@ import json
 import os
 import base64
 
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
 from azure.ai.formrecognizer import DocumentAnalysisClient
 from azure.core.credentials import AzureKeyCredential
 
@@ -18,6 +16,7 @@ from ILS_NUMBER.get_ils_number import call_logic_app
 from cg_europe.excel.createExcel import write_to_excel
 from cg_europe.helpers.functions import change_date_format, clean_number, extract_clean_email_body, clean_vat_number, clean_customs_code, clean_incoterm, combine_invoices_by_address, extract_ref, extract_text_from_pdf, extract_totals_info,  normalize_number, safe_float_conversion, safe_int_conversion
 from global_db.functions.numbers.functions import normalize_numbers
+from global_db.functions.key_vault import get_secret
 
 def main(req: func.HttpRequest) -> func.HttpResponse:
     logging.info('Processing file upload request.')
@@ -48,12 +47,10 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
     # Key Vault and Form Recognizer setup
     key_vault_url = "https://kv-functions-python.vault.azure.net"
     secret_name = "azure-form-recognizer-key-2"
-    credential = DefaultAzureCredential()
-    client = SecretClient(vault_url=key_vault_url, credential=credential)
 
     # Retrieve the secret value
     try:
-        api_key = client.get_secret(secret_name).value
+        api_key = get_secret(secret_name, key_vault_url)
     except Exception as e:
         logging.error(f"Failed to retrieve secret: {str(e)}")
         return func.HttpResponse(
@@ -66,6 +63,7 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
     client = DocumentAnalysisClient(endpoint=endpoint, credential=AzureKeyCredential(api_key))
     
     results = []
+    address_results = []  # Invoices whose address is parsed after the loop, in one batch
     
     for file_info in files:
         file_content_base64 = file_info.get('file')
@@ -179,9 +177,8 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
             if len( result_dict.get("Address", "")) > 0:
                 address = result_dict.get("Address", "")[0]
                 parser = AddressParser()
-                address = parser.format_address_to_line_old_addresses(address)
-                parsed_result = parser.parse_address(address)
-                result_dict["Address"] = parsed_result
+                result_dict["Address"] = parser.format_address_to_line_old_addresses(address)
+                address_results.append(result_dict)
 
             #update the type of Gross weight Total
             result_dict["Gross weight Total"] = safe_float_conversion(normalize_numbers(result_dict.get("Gross weight Total", 0.0)))
@@ -200,6 +197,10 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
     
             results.append(result_dict)  
     
+    parsed_addresses = AddressParser().parse_addresses([inv["Address"] for inv in address_results])
+    for inv, parsed_result in zip(address_results, parsed_addresses):
+        inv["Address"] = parsed_result
+
     results = combine_invoices_by_address(results)
     if "Total Net" not in results:
         for inv in results : 
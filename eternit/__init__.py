@@ -82,9 +82,7 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
             #switch the address country to abbr
             address = result.get("Adress", "")[0]
             parser = AddressParser()
-            address = parser.format_address_to_line_old_addresses(address)
-            parsed_result = parser.parse_address(address)
-            result["Adress"] = parsed_result
+            result["Adress"] = parser.format_address_to_line_old_addresses(address)  # parsed below, for all invoices at once
             #address["Country"] = get_abbreviation_by_country(address["Country"])
 
             #clean and split the total value
@@ -194,6 +192,10 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
 
             result["Net weight Total"] = TotalNetWeight
             resutls.append(result)
+
+        parsed_addresses = AddressParser().parse_addresses([inv["Adress"] for inv in resutls])
+        for inv, parsed_result in zip(resutls, parsed_addresses):
+            inv["Adress"] = parsed_result
             
         # Merge JSON objects
         merged_result = merge_json_objects(resutls)
@@ -81,14 +81,7 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
         header_inv_data = json.loads(extract_text_from_first_page(uploaded_file_path, header_inv_coords, header_inv_keys))
         #extract vat 
         header_inv_data["Vat"] = vat_validation(extract_vat_number(header_inv_data["Vat"]))
-        #extract the address
-
-        address = header_inv_data.get("Address")
-        
-
-        parser = AddressParser()
-        parsed_result = parser.parse_address(address)
-        header_inv_data["Address"] = parsed_result
+        #the address is parsed after the loop, for all invoices at once
 
         #extract the currency
         header_inv_data["Currency"] = get_currency_abbr(header_inv_data["Currency"])
@@ -135,6 +128,10 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
         combined_data.append(pdf_file_data)
         
     """Combine data in one object"""
+    parsed_addresses = AddressParser().parse_addresses([inv.get("Address") for inv in combined_data])
+    for inv, parsed_result in zip(combined_data, parsed_addresses):
+        inv["Address"] = parsed_result
+
     result = combine_invoices(combined_data)    
             
     '''Extract the body data''' 
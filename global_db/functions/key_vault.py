@@ -0,0 +1,197 @@
+import json
+import logging
+import os
+import threading
+import time
+
+# --- Shared Secrets ---
+# One process-wide provider serves every function and AI agent: a single DefaultAzureCredential,
+# one SecretClient per vault, and an in-memory cache. A cached secret is refreshed in the background
+# during the last REFRESH_MARGIN_SECONDS of its TTL, so requests read it from memory; only the
+# first read of a secret in a process (or a read after a failed refresh) waits for Key Vault.
+#
+# Local runs and tests can skip Key Vault: with SECRETS_BACKEND=local (or LOCAL_SECRETS_FILE set),
+# secrets come from environment variables (OPENAI-API-KEY -> SECRET_OPENAI_API_KEY) and from the
+# JSON file {"secret-name": "value"} named by LOCAL_SECRETS_FILE.
+KEY_VAULT_URL = "https://kv-functions-python.vault.azure.net"
+SECRET_TTL_SECONDS = 3600
+REFRESH_MARGIN_SECONDS = 300
+BACKEND_ENV = "SECRETS_BACKEND"
+SECRETS_FILE_ENV = "LOCAL_SECRETS_FILE"
+ENV_PREFIX = "SECRET_"
+
+_credential = None
+_credential_lock = threading.Lock()
+
+
+def shared_credential():
+    """The process-wide DefaultAzureCredential (created on first use)."""
+    global _credential
+    with _credential_lock:
+        if _credential is None:
+            from azure.identity import DefaultAzureCredential
+            _credential = DefaultAzureCredential()
+        return _credential
+
+
+class KeyVaultBackend:
+    """Reads secrets from one Azure Key Vault with the shared credential."""
+
+    def __init__(self, vault_url=KEY_VAULT_URL):
+        self.vault_url = vault_url
+        self._client = None
+
+    def get(self, name):
+        if self._client is None:
+            from azure.keyvault.secrets import SecretClient
+            self._client = SecretClient(vault_url=self.vault_url, credential=shared_credential())
+        return self._client.get_secret(name).value
+
+
+class LocalBackend:
+    """Reads secrets from environment variables, then from a JSON file. Raises KeyError for unknown secrets."""
+
+    def __init__(self, path=None):
+        self.path = path
+
+    @staticmethod
+    def env_name(name):
+        return ENV_PREFIX + name.upper().replace("-", "_")
+
+    def get(self, name):
+        value = os.environ.get(self.env_name(name))
+        if value is not None:
+            return value
+        if self.path:
+            with open(self.path) as f:
+                values = json.load(f)
+            if name in values:
+                return values[name]
+        raise KeyError(f"Secret '{name}' not found in ${self.env_name(name)}" + (f" or {self.path}" if self.path else "") + ".")
+
+
+class SecretProvider:
+    """
+    TTL cache in front of a secrets backend (anything with .get(name) -> value).
+
+    - A fresh secret is served from memory.
+    - In the last `refresh_margin` seconds of its TTL it is still served from memory while one
+      background thread fetches the new value.
+    - An expired (or never fetched) secret is fetched before returning. If that fails and an older
+      value exists, the older value is served and the failure logged; otherwise the error is raised.
+    """
+
+    def __init__(self, backend, ttl_seconds=SECRET_TTL_SECONDS, refresh_margin_seconds=REFRESH_MARGIN_SECONDS, clock=time.monotonic):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin_seconds = min(refresh_margin_seconds, ttl_seconds)
+        self.clock = clock
+        self._values = {}  # name -> (value, fetched_at)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._fetch_locks = {}
+
+    def get(self, name):
+        now = self.clock()
+        with self._lock:
+            cached = self._values.get(name)
+        if cached is not None:
+            value, fetched_at = cached
+            age = now - fetched_at
+            if age < self.ttl_seconds - self.refresh_margin_seconds:
+                return value
+            if age < self.ttl_seconds:
+                self._refresh_in_background(name)
+                return value
+        return self._fetch(name)
+
+    def _fetch_lock(self, name):
+        with self._lock:
+            return self._fetch_locks.setdefault(name, threading.Lock())
+
+    def _fetch(self, name):
+        # One fetch per secret at a time: concurrent cold reads wait for the first one
+        with self._fetch_lock(name):
+            with self._lock:
+                cached = self._values.get(name)
+            if cached is not None and self.clock() - cached[1] < self.ttl_seconds:
+                return cached[0]
+            try:
+                value = self.backend.get(name)
+            except Exception as e:
+                if cached is None:
+                    raise
+                logging.warning(f"Could not refresh secret '{name}', serving the cached value. Error: {e}")
+                return cached[0]
+            with self._lock:
+                self._values[name] = (value, self.clock())
+            return value
+
+    def _refresh_in_background(self, name):
+        with self._lock:
+            if name in self._refreshing:
+                return
+            self._refreshing.add(name)
+
+        def refresh():
+            try:
+                value = self.backend.get(name)
+                with self._lock:
+                    self._values[name] = (value, self.clock())
+            except Exception as e:
+                logging.warning(f"Background refresh of secret '{name}' failed. Error: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(name)
+
+        threading.Thread(target=refresh, name=f"secret-refresh-{name}", daemon=True).start()
+
+    def prefetch(self, names):
+        """Fetches several secrets concurrently (e.g. at cold start). Returns the names that failed."""
+        failed = []
+
+        def load(name):
+            try:
+                self.get(name)
+            except Exception as e:
+                logging.error(f"Failed to prefetch secret '{name}': {e}")
+                failed.append(name)
+
+        threads = [threading.Thread(target=load, args=(name,), daemon=True) for name in names]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return failed
+
+    def invalidate(self, name=None):
+        """Forgets one cached secret (all of them if `name` is None); the next read fetches it again."""
+        with self._lock:
+            if name is None:
+                self._values.clear()
+            else:
+                self._values.pop(name, None)
+
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def _default_backend(vault_url):
+    local_file = os.environ.get(SECRETS_FILE_ENV)
+    if os.environ.get(BACKEND_ENV, "").lower() == "local" or local_file:
+        return LocalBackend(local_file)
+    return KeyVaultBackend(vault_url)
+
+
+def secret_provider(vault_url=KEY_VAULT_URL):
+    """The process-wide SecretProvider of a vault."""
+    with _providers_lock:
+        if vault_url not in _providers:
+            _providers[vault_url] = SecretProvider(_default_backend(vault_url))
+        return _providers[vault_url]
+
+
+def get_secret(name, vault_url=KEY_VAULT_URL):
+    """Value of a secret, from the shared cache (fetched from the vault on first use)."""
+    return secret_provider(vault_url).get(name)
@@ -3,14 +3,15 @@ from datetime import datetime, timedelta
 import azure.functions as func
 import logging
 import json
+import numpy as np
 import pandas as pd
-import io
 from azure.storage.blob import BlobServiceClient
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
 # Make sure this import path is correct for your project structure
 from performance.dms_functions import count_dms_import_files_created, get_dms_import_summary
 from performance.functions.functions import calculate_single_user_metrics_fast, count_user_file_creations_last_10_days, calculate_all_users_monthly_metrics
+from global_db.functions.key_vault import get_secret
+from performanceV2.history import DmsHistory
+from performanceV2.preprocessing import CODE_COLUMNS
 
 # --- Configuration ---
 KEY_VAULT_URL = "https://kv-functions-python.vault.azure.net"
@@ -18,9 +19,7 @@ SECRET_NAME = "azure-storage-account-access-key2"
 
 # --- Azure Services Initialization ---
 try:
-    credential = DefaultAzureCredential()
-    kv_client = SecretClient(vault_url=KEY_VAULT_URL, credential=credential)
-    connection_string = kv_client.get_secret(SECRET_NAME).value
+    connection_string = get_secret(SECRET_NAME, KEY_VAULT_URL)
     blob_service_client = BlobServiceClient.from_connection_string(connection_string)
 except Exception as e:
     logging.critical(f"Failed to initialize Azure services: {e}")
@@ -29,35 +28,38 @@ except Exception as e:
 
 # --- Blob Storage Constants ---
 CONTAINER_NAME = "document-intelligence"
-PARQUET_BLOB_PATH = "logs/all_data.parquet"
+# The DMS history lives in the partitioned event store (logs/history/) shared with V2, see performanceV2/history.py.
+# The old single blob (logs/all_data.parquet) was imported into it and is no longer written.
 SUMMARY_BLOB_PATH = "Dashboard/cache/users_summary.json"
 MONTHLY_SUMMARY_BLOB_PATH = "Dashboard/cache/monthly_report_cache.json"
 # --- NEW: Path for individual user performance caches ---
 USER_CACHE_PATH_PREFIX = "Dashboard/cache/users/"
 
+dms_history = DmsHistory(blob_service_client.get_container_client(CONTAINER_NAME)) if blob_service_client else None
+
 
 # --- Helper Functions ---
 def load_parquet_from_blob():
-    """Loads the main Parquet file from blob storage into a pandas DataFrame."""
-    if not blob_service_client: raise ConnectionError("Blob service not initialized.")
-    try:
-        blob_client = blob_service_client.get_blob_client(CONTAINER_NAME, PARQUET_BLOB_PATH)
-        if not blob_client.exists():
-             logging.warning("Parquet file not found at specified path.")
-             return pd.DataFrame()
-        return pd.read_parquet(io.BytesIO(blob_client.download_blob().readall()))
-    except Exception as e:
-        logging.error(f"Could not load Parquet file. Error: {e}")
-        return pd.DataFrame()
+    """Loads the full DMS history from the shared event store, in the dtypes of the old single-blob file."""
+    if not dms_history: raise ConnectionError("Blob service not initialized.")
+    return as_legacy_frame(dms_history.read())
 
-def save_parquet_to_blob(df):
-    """Saves a pandas DataFrame to a Parquet file in blob storage."""
-    if not blob_service_client: raise ConnectionError("Blob service not initialized.")
-    blob_client = blob_service_client.get_blob_client(CONTAINER_NAME, PARQUET_BLOB_PATH)
-    buffer = io.BytesIO()
-    df.to_parquet(buffer, index=False)
-    blob_client.upload_blob(buffer.getvalue(), overwrite=True)
-    logging.info(f"Successfully saved Parquet to {PARQUET_BLOB_PATH}")
+
+def as_legacy_frame(df):
+    """
+    The store keeps the history typed (categorical codes, missing codes as "", nullable integer IDs).
+    The reports here were written against the raw rows, so codes go back to plain strings with
+    missing values as NaN (reported as "NAN") and DECLARATIONID to int64, or float64 when some are missing.
+    """
+    df = df.copy()
+    for col in CODE_COLUMNS:
+        if col in df.columns:
+            codes = df[col].astype(object)
+            df[col] = codes.where(codes != "", np.nan)
+    if "DECLARATIONID" in df.columns:
+        ids = df["DECLARATIONID"]
+        df["DECLARATIONID"] = ids.astype("float64") if ids.isna().any() else ids.astype("int64")
+    return df
 
 
 def save_json_to_blob(data, blob_path):
@@ -86,9 +88,8 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
             if new_df.empty:
                 return func.HttpResponse(json.dumps({"error": "No data provided in request body."}), status_code=400, mimetype="application/json")
             
-            existing_df = load_parquet_from_blob()
-            combined_df = pd.concat([existing_df, new_df], ignore_index=True)
-            save_parquet_to_blob(combined_df)
+            if not dms_history: raise ConnectionError("Blob service not initialized.")
+            dms_history.append(new_df)
             return func.HttpResponse(json.dumps({"status": "success", "message": "Data stored successfully."}), status_code=200, mimetype="application/json")
 
         # --- NEW: Endpoint to refresh ALL individual user caches ---
@@ -0,0 +1,613 @@
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import azure.functions as func
+import logging
+import json
+import pandas as pd
+import io
+import hashlib
+import gzip
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceNotFoundError, ResourceNotModifiedError
+from azure.storage.blob import BlobServiceClient, ContentSettings
+# Make sure this import path is correct for your project structure
+from performanceV2.dms_analytics import DmsAnalytics
+from performanceV2.parallel import parallel_users_metrics_batch, parallel_file_creations_last_10_days, parallel_monthly_metrics
+from performanceV2.functions.file_lifecycle import get_file_lifecycle_from_store
+from performanceV2.functions.debug_monthly_count import debug_count_files_by_month, debug_total_files_for_user
+from performanceV2.common import TARGET_USERS
+from performanceV2.history import DmsHistory
+from performanceV2.blob_cache import BlobCache
+from performanceV2.jobs import JobStore, LocalJobQueue, NullJobContext, StorageQueueJobQueue
+from performanceV2.working_days import WorkingDayCalendar
+from performanceV2.cache_encoding import encode_json, is_gzip_blob, accepts_gzip, split_user_metrics
+from global_db.functions.key_vault import get_secret
+
+# --- Configuration ---
+KEY_VAULT_URL = "https://kv-functions-python.vault.azure.net"
+SECRET_NAME = "azure-storage-account-access-key2"
+
+# --- Azure Services Initialization ---
+try:
+    connection_string = get_secret(SECRET_NAME, KEY_VAULT_URL)
+    blob_service_client = BlobServiceClient.from_connection_string(connection_string)
+except Exception as e:
+    logging.critical(f"Failed to initialize Azure services: {e}")
+    connection_string = None 
+    blob_service_client = None
+
+# --- Blob Storage Constants ---
+CONTAINER_NAME = "document-intelligence"
+# The DMS history (logs/history/) and its declaration summary (logs/summary/) are shared with V1, see history.py.
+# The legacy single blob (logs/all_data.parquet) is imported into the event store on first use and no longer written.
+JOBS_PREFIX = "logs/jobs/"
+SUMMARY_BLOB_PATH = "Dashboard/cache/users_summaryV2.json"
+MONTHLY_SUMMARY_BLOB_PATH = "Dashboard/cache/monthly_report_cacheV2.json"
+# --- NEW: Path for individual user performance caches ---
+USER_CACHE_PATH_PREFIX = "Dashboard/cache/usersV2/"
+# Each user cache is stored whole and split in two: the dashboard can load the summary and fetch
+# the per-day file ID lists only when it drills down (GET ?user=X&view=summary|ids)
+USER_CACHE_VIEWS = {"full": ".json", "summary": ".summary.json", "ids": ".ids.json"}
+CACHE_COMPACT_ENCODING = False  # True: minified + gzip cache blobs (see cache_encoding.py). Only once no reader takes the blobs straight from storage
+CACHE_UPLOAD_WORKERS = 8
+
+# --- In-process cache (shared by the requests of a warm worker) ---
+FRAME_CACHE_TTL_SECONDS = 300
+FRAME_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# --- Read windows (days of history each report needs) ---
+# Reports look at declarations touched inside their window but classify them on their full history:
+# the earlier activity of those declarations is loaded too, from the months the declaration index lists.
+SUMMARY_WINDOW_DAYS = 90
+MONTHLY_WINDOW_DAYS = 30
+
+# --- Out-of-core processing ---
+# Full-history passes (summary rebuilds, DMS analytics) stream the history in DECLARATIONID chunks of
+# about HISTORY_CHUNK_ROWS rows instead of loading it whole, so their peak memory does not grow with it.
+CHUNKED_HISTORY_READS = True
+HISTORY_CHUNK_ROWS = 500_000
+
+# --- Parallel reports ---
+# Worker processes the report jobs split their users across (see parallel.py). 0 or 1 computes them
+# in-process, which suits the single core of the Consumption plan; on Premium/Dedicated plans set
+# it to the instance's core count.
+REPORT_WORKERS = 0
+
+# --- Background jobs ---
+# Refresh jobs are handed to the performanceV2Jobs function through the "performance-jobs" storage
+# queue (the `jobs` output binding), so they do not depend on the HTTP worker that accepted them
+# staying alive. False runs them on a thread of that worker instead (LocalJobQueue), e.g. for local runs.
+QUEUE_JOBS_TO_WORKER = True
+
+# --- Working days ---
+# Public holidays left out of working days in the reports, e.g. ("BE", "MA"). Islamic holidays are
+# lunar: add their announced dates to EXTRA_HOLIDAYS ("YYYY-MM-DD").
+HOLIDAY_COUNTRIES = ()
+EXTRA_HOLIDAYS = ()
+
+# --- Ad-hoc queries (GET /performanceV2/query) ---
+QUERY_DEFAULT_DAYS = 30
+QUERY_MAX_DAYS = 366
+QUERY_CACHE_MAX_AGE_SECONDS = 60  # Browsers may reuse a query response this long before revalidating
+
+frame_cache = BlobCache(ttl_seconds=FRAME_CACHE_TTL_SECONDS, max_bytes=FRAME_CACHE_MAX_BYTES)
+dms_history = DmsHistory(blob_service_client.get_container_client(CONTAINER_NAME), cache=frame_cache, chunk_rows=HISTORY_CHUNK_ROWS if CHUNKED_HISTORY_READS else None) if blob_service_client else None
+history_store = dms_history.events if dms_history else None
+summary_store = dms_history.summary if dms_history else None
+work_calendar = WorkingDayCalendar(HOLIDAY_COUNTRIES, EXTRA_HOLIDAYS)
+job_store = JobStore(blob_service_client.get_container_client(CONTAINER_NAME), LocalJobQueue(), JOBS_PREFIX) if blob_service_client else None
+
+
+# --- Helper Functions ---
+def load_parquet_from_blob(columns=None, days_back=None, where=None):
+    """Loads the DMS history from the partitioned event store (see DmsHistory.read)."""
+    if not dms_history: raise ConnectionError("Blob service not initialized.")
+    return dms_history.read(columns=columns, days_back=days_back, where=where)
+
+def append_rows_to_store(new_df):
+    """Appends new raw history rows to the event store and updates the declaration summary."""
+    if not dms_history: raise ConnectionError("Blob service not initialized.")
+    return dms_history.append(new_df)
+
+def summarize_history(job=None):
+    """
+    DeclarationSummary of the whole history. With CHUNKED_HISTORY_READS only one declaration chunk
+    is in memory at a time; `job` (a JobContext) gets the chunk progress.
+    """
+    if not dms_history: raise ConnectionError("Blob service not initialized.")
+    return dms_history.summarize(job)
+
+def load_summary(days_back=None):
+    """
+    Loads the declaration summary the reports are computed from. `days_back` limits it to the months of
+    that window, plus the full history of the declarations active in them.
+    """
+    if not summary_store: raise ConnectionError("Blob service not initialized.")
+    try:
+        if not summary_store.exists():
+            summary_store.rebuild(summarize_history())
+        since = datetime.now() - timedelta(days=days_back) if days_back is not None else None
+        return summary_store.load(since=since, declaration_months=history_store.declaration_months)
+    except Exception as e:
+        logging.error(f"Could not load declaration summary. Error: {e}")
+        return None
+
+
+def load_rollup(start=None, end=None):
+    """Loads the rollup cube (user/team/day/hour/company/type counters) of the months overlapping [start, end)."""
+    if not summary_store: raise ConnectionError("Blob service not initialized.")
+    if not summary_store.exists():
+        summary_store.rebuild(summarize_history())
+    return summary_store.load_rollup(start=start, end=end)
+
+def query_rollup(start, end, group_by, filters):
+    """
+    Answers an ad-hoc query from the rollup cube. Responses are cached per query while the activity
+    months of the window are unchanged. Returns (payload, etag); the ETag changes with the data.
+    """
+    if not summary_store: raise ConnectionError("Blob service not initialized.")
+    if not summary_store.exists():
+        summary_store.rebuild(summarize_history())
+    version = summary_store.rollup_version(start, end)
+    key = ("query", start.isoformat(), end.isoformat(), tuple(group_by), tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in filters.items())))
+
+    def build():
+        rollup = summary_store.load_rollup(start=start, end=end)
+        rows = rollup.query(group_by=group_by, start=start, end=end, **filters)
+        totals = rollup.query(group_by=(), start=start, end=end, **filters)
+        return {
+            "from": start.strftime("%Y-%m-%d"),
+            "to": (end - timedelta(days=1)).strftime("%Y-%m-%d"),
+            "filters": filters,
+            "group_by": list(group_by),
+            "totals": totals.iloc[0].to_dict(),
+            "rows": rows.to_dict(orient="records"),
+        }
+
+    payload = frame_cache.memoize(key, version, build)
+    etag = hashlib.sha1(repr((key, version)).encode()).hexdigest()
+    return payload, f'"{etag}"'
+
+def load_dms_analytics():
+    """
+    DMS_IMPORT analytics over the whole history, built once per history version and shared by every
+    window and request until new rows are appended. Returns None if the history cannot be read.
+    """
+    if not history_store: raise ConnectionError("Blob service not initialized.")
+    cols_needed = ['USERCODE', 'HISTORY_STATUS', 'HISTORYDATETIME', 'DECLARATIONID', 'USERCREATE', 'ACTIVECOMPANY', 'TYPEDECLARATIONSSW']
+    try:
+        if CHUNKED_HISTORY_READS:
+            build = lambda: DmsAnalytics.from_chunks(history_store.iter_declaration_chunks(columns=cols_needed, where={"TYPEDECLARATIONSSW": "DMS_IMPORT"}, chunk_rows=HISTORY_CHUNK_ROWS))
+        else:
+            build = lambda: DmsAnalytics.from_history(history_store.read(columns=cols_needed, where={"TYPEDECLARATIONSSW": "DMS_IMPORT"}))
+        return frame_cache.memoize(("dms-analytics",), history_store.version(), build)
+    except Exception as e:
+        logging.error(f"Could not load DMS import analytics. Error: {e}")
+        return None
+
+
+def save_json_to_blob(data, blob_path, compact=CACHE_COMPACT_ENCODING):
+    """Saves a dictionary as a JSON file in blob storage (minified and gzip-compressed when `compact`)."""
+    if not blob_service_client: raise ConnectionError("Blob service not initialized.")
+    blob_client = blob_service_client.get_blob_client(CONTAINER_NAME, blob_path)
+    payload, content_type, metadata = encode_json(data, compact)
+    blob_client.upload_blob(payload, overwrite=True, content_settings=ContentSettings(content_type=content_type), metadata=metadata)
+    logging.info(f"Successfully saved JSON to {blob_path} ({len(payload)} bytes)")
+
+def serve_json_blob(req, blob_path, not_found_error):
+    """
+    Streams a cache blob written by save_json_to_blob. The blob ETag is sent along; a request whose
+    If-None-Match still matches gets a 304 without the blob being downloaded. Compressed blobs are
+    forwarded as is to clients accepting gzip and decompressed for the others; a decompressed body
+    is a different representation, so it gets the weak form of the ETag (W/"...").
+    """
+    blob_client = blob_service_client.get_blob_client(CONTAINER_NAME, blob_path)
+    if_none_match = req.headers.get('If-None-Match')
+    try:
+        if if_none_match and ',' not in if_none_match and if_none_match.strip() != '*':
+            blob_etag = if_none_match.strip().removeprefix('W/')
+            downloader = blob_client.download_blob(etag=blob_etag, match_condition=MatchConditions.IfModified)
+        else:
+            downloader = blob_client.download_blob()
+    except ResourceNotModifiedError:
+        return func.HttpResponse(status_code=304, headers={"ETag": if_none_match.strip(), "Cache-Control": "private, no-cache"})
+    except ResourceNotFoundError:
+        return func.HttpResponse(json.dumps({"error": not_found_error}), status_code=404, mimetype="application/json")
+
+    body = downloader.readall()
+    headers = {"ETag": downloader.properties.etag, "Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
+    if is_gzip_blob(downloader.properties.metadata):
+        if accepts_gzip(req.headers.get('Accept-Encoding')):
+            headers["Content-Encoding"] = "gzip"
+        else:
+            body = gzip.decompress(body)
+            headers["ETag"] = f"W/{downloader.properties.etag}"
+    return func.HttpResponse(body=body, status_code=200, mimetype="application/json", headers=headers)
+
+
+# --- Refresh tasks (run as background jobs, see performanceV2/jobs.py) ---
+def refresh_users_task(job):
+    """Refreshes ALL individual user caches. This is the slow, heavy-lifting task."""
+    logging.info("Starting full cache refresh for all individual users.")
+    
+    # --- ADDED: List of specific users to generate caches for ---
+    target_users = TARGET_USERS
+    
+    job.stage("load-summary")
+    summary = load_summary()
+    if summary is None or summary.empty:
+        return {"status": "skipped", "message": "Source data is empty."}
+    
+    # --- MODIFIED: Filter the users from the dataframe to only include target users ---
+    all_users_in_df = summary.activity['USERCODE'].dropna().unique()
+    # Case-insensitive comparison to be safe
+    target_users_upper = [tu.upper() for tu in target_users]
+    users_to_process = [user for user in all_users_in_df if user.upper() in target_users_upper]
+
+    logging.info(f"Found {len(users_to_process)} target users to process out of {len(all_users_in_df)} unique users in the data.")
+
+    # One pass over the summary computes every user's metrics
+    job.stage("compute-metrics", total=len(users_to_process))
+    all_metrics = parallel_users_metrics_batch(summary, users_to_process, work_calendar, workers=REPORT_WORKERS)
+
+    def cache_user(user):
+        try:
+            metrics = all_metrics[user.upper()]
+            summary_doc, file_ids = split_user_metrics(metrics)
+            for view, doc in (("full", metrics), ("summary", summary_doc), ("ids", file_ids)):
+                save_json_to_blob(doc, f"{USER_CACHE_PATH_PREFIX}{user}{USER_CACHE_VIEWS[view]}")
+            logging.info(f"Successfully cached data for user: {user}")
+            return True
+        except Exception as e:
+            logging.error(f"Failed to process and cache data for user {user}: {e}")
+            return False
+
+    job.stage("upload-caches", total=len(users_to_process))
+    processed_count = 0
+    with ThreadPoolExecutor(max_workers=CACHE_UPLOAD_WORKERS) as pool:
+        for done, ok in enumerate(pool.map(cache_user, users_to_process), start=1):
+            processed_count += ok
+            job.progress(done)
+    
+    return {"status": "success", "message": f"Cache refreshed for {processed_count}/{len(users_to_process)} target users."}
+
+def refresh_monthly_task(job):
+    """Refreshes the monthly report cache."""
+    logging.info("Monthly report cache refresh process started.")
+    job.stage("load-summary")
+    summary = load_summary(days_back=MONTHLY_WINDOW_DAYS)
+    if summary is None or summary.empty:
+        return {"status": "skipped", "message": "No data available."}
+    
+    job.stage("compute-metrics")
+    metrics = parallel_monthly_metrics(summary, work_calendar, workers=REPORT_WORKERS)
+    job.stage("upload-cache")
+    save_json_to_blob(metrics, MONTHLY_SUMMARY_BLOB_PATH)
+    return {"status": "success", "message": "Monthly report cache refreshed."}
+
+def refresh_summary_cache_task(job):
+    """Refreshes the 10-day summary cache."""
+    logging.info("10-day summary cache refresh started.")
+    job.stage("load-summary")
+    summary = load_summary(days_back=SUMMARY_WINDOW_DAYS)
+    if summary is None or summary.empty:
+        return {"status": "skipped", "message": "No data available."}
+
+    job.stage("compute-metrics")
+    metrics = parallel_file_creations_last_10_days(summary, work_calendar, workers=REPORT_WORKERS)
+    job.stage("upload-cache")
+    save_json_to_blob(metrics, SUMMARY_BLOB_PATH)
+    return {"status": "success", "message": "10-day summary cache refreshed."}
+
+def rebuild_declaration_summary_task(job):
+    """Rebuilds the declaration summary from the full history."""
+    logging.info("Declaration summary rebuild started.")
+    job.stage("summarize-history")
+    summary = summarize_history(job)
+    if summary.empty:
+        return {"status": "skipped", "message": "No data available."}
+
+    job.stage("write-summary")
+    summary = summary_store.rebuild(summary)
+    return {"status": "success", "message": f"Declaration summary rebuilt ({len(summary.activity)} activity rows)."}
+
+REFRESH_TASKS = {
+    "refresh-users": refresh_users_task,
+    "refresh-monthly": refresh_monthly_task,
+    "refresh": refresh_summary_cache_task,
+    "refresh-summary": rebuild_declaration_summary_task,
+}
+
+
+# --- Main Function App ---
+def main(req: func.HttpRequest, jobs: func.Out[str] = None) -> func.HttpResponse:
+    if not connection_string:
+        return func.HttpResponse(json.dumps({"error": "Backend service not configured."}), status_code=503, mimetype="application/json")
+
+    try:
+        method = req.method
+        action = req.route_params.get('action')
+        user_param = req.params.get('user')
+        all_users_param = req.params.get('all_users', 'false').lower() == 'true'
+
+        # --- Endpoint to add new raw data ---
+        if method == "POST" and not action:
+            body = req.get_json()
+            new_df = pd.DataFrame(body.get("data", {}).get("Table1", []))
+            if new_df.empty:
+                return func.HttpResponse(json.dumps({"error": "No data provided in request body."}), status_code=400, mimetype="application/json")
+            
+            append_rows_to_store(new_df)
+            return func.HttpResponse(json.dumps({"status": "success", "message": "Data stored successfully."}), status_code=200, mimetype="application/json")
+
+        # --- Refresh endpoints: queued as background jobs (add ?wait=true to run inline) ---
+        elif method == "POST" and action in REFRESH_TASKS:
+            task = REFRESH_TASKS[action]
+            if req.params.get('wait', 'false').lower() == 'true':
+                result = task(NullJobContext())
+                return func.HttpResponse(json.dumps(result), status_code=200, mimetype="application/json")
+
+            queue = StorageQueueJobQueue(jobs) if QUEUE_JOBS_TO_WORKER and jobs is not None else None
+            job, created = job_store.submit(action, task, queue=queue)
+            return func.HttpResponse(json.dumps({
+                "status": job["status"],
+                "job_id": job["id"],
+                "coalesced": not created,
+                "status_url": f"/api/performanceV2/jobs/{job['id']}"
+            }), status_code=202, mimetype="application/json")
+
+        # --- Job status ---
+        elif method == "GET" and action == "jobs":
+            job_id = req.route_params.get('job_id') or req.params.get('id')
+            if not job_id:
+                return func.HttpResponse(json.dumps({"error": "Missing job id. Use /performanceV2/jobs/{id}"}), status_code=400, mimetype="application/json")
+            job = job_store.get(job_id)
+            if job is None:
+                return func.HttpResponse(json.dumps({"error": f"Job '{job_id}' not found."}), status_code=404, mimetype="application/json")
+            return func.HttpResponse(json.dumps(job, default=str), status_code=200, mimetype="application/json")
+
+        # --- Ad-hoc queries over the rollup cube ---
+        # ?from=YYYY-MM-DD&to=YYYY-MM-DD (inclusive, default: last 30 days), optional comma-separated
+        # team/company/user/type filters and group_by (user, team, day, hour, company, type; default user)
+        # MUST come BEFORE the user GET handler, which would otherwise catch ?user=
+        elif method == "GET" and action == "query":
+            try:
+                end = pd.Timestamp(req.params['to']).normalize() + timedelta(days=1) if req.params.get('to') else pd.Timestamp(datetime.now().date()) + timedelta(days=1)
+                start = pd.Timestamp(req.params['from']).normalize() if req.params.get('from') else end - timedelta(days=QUERY_DEFAULT_DAYS)
+            except ValueError:
+                return func.HttpResponse(json.dumps({"error": "Invalid 'from' or 'to' date. Use YYYY-MM-DD."}), status_code=400, mimetype="application/json")
+            if start >= end or (end - start).days > QUERY_MAX_DAYS:
+                return func.HttpResponse(json.dumps({"error": f"'from' must be on or before 'to', at most {QUERY_MAX_DAYS} days apart."}), status_code=400, mimetype="application/json")
+
+            split = lambda name: [v.strip() for v in req.params[name].split(',') if v.strip()] if req.params.get(name) else None
+            filters = {k: v for k, v in {"users": split('user'), "companies": split('company'), "types": split('type')}.items() if v}
+            if req.params.get('team'):
+                filters["team"] = req.params['team'].strip().lower()
+            group_by = split('group_by') or ["user"]
+
+            try:
+                payload, etag = query_rollup(start, end, group_by, filters)
+            except ValueError as e:
+                return func.HttpResponse(json.dumps({"error": str(e)}), status_code=400, mimetype="application/json")
+
+            headers = {"ETag": etag, "Cache-Control": f"private, max-age={QUERY_CACHE_MAX_AGE_SECONDS}"}
+            if req.headers.get('If-None-Match') == etag:
+                return func.HttpResponse(status_code=304, headers=headers)
+            return func.HttpResponse(json.dumps(payload, default=str), status_code=200, mimetype="application/json", headers=headers)
+
+        # --- DEBUG MONTHLY COUNT ENDPOINT ---
+        # MUST come BEFORE the general user GET handler to avoid being caught by it
+        elif method == "GET" and action == "debug-monthly-count":
+            username = req.params.get('user')
+            month_year = req.params.get('month')  # Format: "11/2024"
+            
+            if not username or not month_year:
+                return func.HttpResponse(
+                    json.dumps({"error": "Missing 'user' or 'month' parameter. Use format: ?user=USERNAME&month=11/2024"}), 
+                    status_code=400, 
+                    mimetype="application/json"
+                )
+            
+            try:
+                month, year = month_year.split('/')
+                month = int(month)
+                year = int(year)
+            except (ValueError, AttributeError):
+                return func.HttpResponse(
+                    json.dumps({"error": "Invalid month format. Use MM/YYYY (e.g., 11/2024)"}), 
+                    status_code=400, 
+                    mimetype="application/json"
+                )
+            
+            logging.info(f"Debug monthly count for {username} in {month}/{year}")
+            cols_needed = ['DECLARATIONID', 'USERCODE', 'HISTORY_STATUS', 'HISTORYDATETIME']
+            # Only the user's own actions are inspected
+            df = load_parquet_from_blob(columns=cols_needed, where={"USERCODE": username.strip().upper()})
+            
+            if df.empty:
+                # No rows for this user: the debug report says so instead of failing
+                df = pd.DataFrame(columns=cols_needed)
+            
+            result = debug_count_files_by_month(df, username, month, year)
+            
+            return func.HttpResponse(
+                json.dumps(result, default=str),
+                status_code=200, 
+                mimetype="application/json"
+            )
+
+        # --- DEBUG TOTAL FILES ENDPOINT ---
+        elif method == "GET" and action == "debug-total-files":
+            username = req.params.get('user')
+            
+            if not username:
+                return func.HttpResponse(
+                    json.dumps({"error": "Missing 'user' parameter. Use format: ?user=USERNAME"}), 
+                    status_code=400, 
+                    mimetype="application/json"
+                )
+            
+            logging.info(f"Debug total files for {username}")
+            cols_needed = ['DECLARATIONID', 'USERCODE', 'HISTORY_STATUS', 'HISTORYDATETIME']
+            df = load_parquet_from_blob(columns=cols_needed, where={"USERCODE": username.strip().upper()})
+            
+            if df.empty:
+                # No rows for this user: the debug report says so instead of failing
+                df = pd.DataFrame(columns=cols_needed)
+            
+            result = debug_total_files_for_user(df, username)
+            
+            return func.HttpResponse(
+                json.dumps(result, default=str),
+                status_code=200, 
+                mimetype="application/json"
+            )
+
+        # --- MODIFIED: GET for single user (Now reads from cache) ---
+        # This is the endpoint your frontend calls. It is now extremely fast.
+        # ?view=summary leaves out the per-day file ID lists, ?view=ids returns only those
+        elif method == "GET" and user_param:
+            view = req.params.get('view', 'full')
+            if view not in USER_CACHE_VIEWS:
+                return func.HttpResponse(json.dumps({"error": f"Invalid 'view'. Use one of: {', '.join(USER_CACHE_VIEWS)}."}), status_code=400, mimetype="application/json")
+            user_blob_path = f"{USER_CACHE_PATH_PREFIX}{user_param}{USER_CACHE_VIEWS[view]}"
+            logging.info(f"Request for cached user data from '{user_blob_path}'.")
+            try:
+                return serve_json_blob(req, user_blob_path, f"Cache for user '{user_param}' not found. Please trigger a user cache refresh.")
+            except Exception as e:
+                logging.error(f"Could not read cache file for {user_param}: {e}")
+                return func.HttpResponse(json.dumps({"error": f"Could not read cache file: {e}"}), status_code=500, mimetype="application/json")
+
+        # --- GET all_users reads from its own cache ---
+        elif method == "GET" and all_users_param:
+            logging.info(f"Request for cached monthly report from '{MONTHLY_SUMMARY_BLOB_PATH}'.")
+            try:
+                return serve_json_blob(req, MONTHLY_SUMMARY_BLOB_PATH, "Monthly report cache not found. Please trigger a refresh.")
+            except Exception as e:
+                return func.HttpResponse(json.dumps({"error": f"Could not read monthly cache file: {e}"}), status_code=500, mimetype="application/json")
+
+        # --- GET for 10-day summary cache ---
+        elif method == "GET" and not action:
+            try:
+                return serve_json_blob(req, SUMMARY_BLOB_PATH, "Cache file not found. Please trigger a refresh.")
+            except Exception as e:
+                return func.HttpResponse(json.dumps({"error": f"Could not read cache file: {e}"}), status_code=500, mimetype="application/json")
+        
+        elif method == "PUT":
+            logging.info("DMS import analysis request started.")
+            
+            # Get the days parameter from query string, default to 30
+            try:
+                days_back = int(req.params.get('days', 30))
+            except ValueError:
+                return func.HttpResponse(
+                    json.dumps({
+                        "status": "error", 
+                        "message": "Invalid 'days' parameter. Must be a valid integer."
+                    }), 
+                    status_code=400, 
+                    mimetype="application/json"
+                )
+
+            # Breakdown and summary share one per-file classification of the window
+            analytics = load_dms_analytics()
+            if analytics is None or analytics.empty:
+                return func.HttpResponse(
+                    json.dumps({
+                        "status": "error", 
+                        "message": "No data available for analysis."
+                    }), 
+                    status_code=400, 
+                    mimetype="application/json"
+                )
+            
+            try:
+                # Run the DMS import analysis
+                result = analytics.breakdown(days_back)
+                summary = analytics.summary(days_back)
+                
+                logging.info(f"DMS import analysis completed. Found {result['total_dms_import_files']} files.")
+                
+                return func.HttpResponse(
+                    json.dumps({
+                        "status": "success", 
+                        "message": "DMS import analysis completed.", 
+                        "data": result,
+                        "summary": summary
+                    }), 
+                    status_code=200, 
+                    mimetype="application/json"
+                )
+                
+            except Exception as e:
+                logging.error(f"Error during DMS import analysis: {e}")
+                return func.HttpResponse(
+                    json.dumps({
+                        "status": "error", 
+                        "message": f"Analysis failed: {str(e)}"
+                    }), 
+                    status_code=500, 
+                    mimetype="application/json"
+                )
+        
+        # --- FILE LIFECYCLE ENDPOINT ---
+        elif method == "GET" and action == "file-lifecycle":
+            declaration_id = req.params.get('id')
+            if not declaration_id:
+                return func.HttpResponse(
+                    json.dumps({"error": "Missing 'id' parameter"}), 
+                    status_code=400, 
+                    mimetype="application/json"
+                )
+            
+            logging.info(f"File lifecycle request for ID: {declaration_id}")
+            if not history_store: raise ConnectionError("Blob service not initialized.")
+            cols_needed = ['DECLARATIONID', 'USERCODE', 'HISTORY_STATUS', 'HISTORYDATETIME', 'ACTIVECOMPANY', 'TYPEDECLARATIONSSW']
+            result = get_file_lifecycle_from_store(history_store, declaration_id, columns=cols_needed)
+            
+            if not result["found"] and result["total_ids_in_system"] == 0:
+                return func.HttpResponse(
+                    json.dumps({"error": "No data available"}), 
+                    status_code=500, 
+                    mimetype="application/json"
+                )
+            
+            return func.HttpResponse(
+                json.dumps(result, default=str),
+                status_code=200, 
+                mimetype="application/json"
+            )
+        
+        # --- DEBUG ENDPOINT ---
+        elif method == "GET" and action == "debug-data":
+            logging.info("Debug data request.")
+            cols_needed = ['USERCODE', 'HISTORY_STATUS', 'HISTORYDATETIME', 'DECLARATIONID', 'USERCREATE', 'ACTIVECOMPANY', 'TYPEDECLARATIONSSW']
+            df = load_parquet_from_blob(columns=cols_needed)
+            
+            if df.empty:
+                return func.HttpResponse(json.dumps({"message": "Dataframe is empty"}), status_code=200, mimetype="application/json")
+            
+            # Convert first 20 rows to dict
+            sample = df.head(50).to_dict(orient='records')
+            
+            # Also get unique statuses
+            statuses = df['HISTORY_STATUS'].unique().tolist()
+            
+            return func.HttpResponse(
+                json.dumps({
+                    "column_types": str(df.dtypes),
+                    "unique_statuses": statuses,
+                    "sample_data": sample,
+                    "frame_cache": frame_cache.stats()
+                }, default=str), # default=str to handle datetime objects
+                status_code=200, 
+                mimetype="application/json"
+            )
+
+        else:
+            return func.HttpResponse(json.dumps({"error": "Endpoint not found or method not allowed."}), status_code=404, mimetype="application/json")
+
+    except Exception as e:
+        logging.error(f"An unexpected error occurred: {e}")
+        return func.HttpResponse(json.dumps({"error": "An internal server error occurred."}), status_code=500, mimetype="application/json")
@@ -0,0 +1,186 @@
+"""
+Benchmarks of the performanceV2 reports on synthetic history.
+
+    python -m performanceV2.benchmark --sizes 10k 1M --output benchmark_results/
+    python -m performanceV2.benchmark --sizes 10k --compare benchmark_results/<earlier run>.json
+
+Each case is timed (best of --repeat runs) and memory-profiled (tracemalloc peak, separate run).
+Results are written as JSON; --compare prints the ratios against an earlier result file and exits
+with status 1 when a case got slower than --threshold.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from performanceV2.declaration_summary import DeclarationSummary
+from performanceV2.dms_analytics import DmsAnalytics
+from performanceV2.dms_functions import count_dms_import_files_created, get_dms_import_summary
+from performanceV2.functions.file_lifecycle import get_file_lifecycle
+from performanceV2.common import TARGET_USERS
+from performanceV2.functions.functions import calculate_all_users_monthly_metrics, calculate_single_user_metrics_fast, calculate_users_metrics_batch, count_user_file_creations_last_10_days
+from performanceV2.parallel import parallel_file_creations_last_10_days, parallel_monthly_metrics, parallel_users_metrics_batch
+from performanceV2.preprocessing import normalize_history
+from performanceV2.synthetic_history import generate_history_rows
+
+DEFAULT_SIZES = ["10k", "1M", "10M"]
+BENCHMARK_USER = "FADWA.ERRAZIKI"
+REGRESSION_THRESHOLD = 1.25  # A case this many times slower than the baseline is reported as a regression
+
+
+def parse_size(text):
+    """'10k' -> 10000, '1M' -> 1000000."""
+    text = str(text).strip().lower()
+    factor = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text[:-1] if factor > 1 else text) * factor)
+
+
+def benchmark_cases(df, summary, workers=0):
+    """
+    (name, callable) pairs. "raw/..." cases run on the normalised history, as the functions would be
+    called on a loaded frame; "summary/..." cases run on the DeclarationSummary the endpoints load;
+    "parallel/..." cases (with `workers` > 1) split the summary reports across worker processes.
+    """
+    declaration_id = int(df["DECLARATIONID"].iloc[len(df) // 2])
+    cases = [
+        ("raw/count_user_file_creations_last_10_days", lambda: count_user_file_creations_last_10_days(df)),
+        ("raw/calculate_single_user_metrics_fast", lambda: calculate_single_user_metrics_fast(df, BENCHMARK_USER)),
+        ("raw/calculate_all_users_monthly_metrics", lambda: calculate_all_users_monthly_metrics(df)),
+        ("raw/count_dms_import_files_created", lambda: count_dms_import_files_created(df, 30)),
+        ("raw/get_dms_import_summary", lambda: get_dms_import_summary(df, 30)),
+        ("raw/get_file_lifecycle", lambda: get_file_lifecycle(df, declaration_id)),
+        ("summary/build", lambda: DeclarationSummary.from_history(df)),
+        ("summary/count_user_file_creations_last_10_days", lambda: count_user_file_creations_last_10_days(summary)),
+        ("summary/calculate_single_user_metrics_fast", lambda: calculate_single_user_metrics_fast(summary, BENCHMARK_USER)),
+        ("summary/calculate_all_users_monthly_metrics", lambda: calculate_all_users_monthly_metrics(summary)),
+        ("summary/calculate_users_metrics_batch", lambda: calculate_users_metrics_batch(summary, TARGET_USERS)),
+        ("dms/analytics_build", lambda: DmsAnalytics.from_history(df)),
+    ]
+    if workers > 1:
+        cases += [
+            (f"parallel/count_user_file_creations_last_10_days/{workers}", lambda: parallel_file_creations_last_10_days(summary, workers=workers)),
+            (f"parallel/calculate_all_users_monthly_metrics/{workers}", lambda: parallel_monthly_metrics(summary, workers=workers)),
+            (f"parallel/calculate_users_metrics_batch/{workers}", lambda: parallel_users_metrics_batch(summary, TARGET_USERS, workers=workers)),
+        ]
+    return cases
+
+
+def measure(func, repeat):
+    """(best wall time in seconds, tracemalloc peak in bytes) of `func`."""
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(times), peak
+
+
+def run(sizes, repeat=3, cases=None, seed=0, workers=0):
+    """Runs every benchmark case at every size. Returns the result document."""
+    results = []
+    for size in sizes:
+        rows = parse_size(size)
+        started = time.perf_counter()
+        df = normalize_history(generate_history_rows(rows, seed=seed, as_strings=False))
+        generated = time.perf_counter() - started
+        summary = DeclarationSummary.from_history(df)
+        print(f"--- {size}: {len(df):,} rows ({generated:.1f}s to generate), summary {len(summary.activity):,} rows ---")
+
+        for name, func in benchmark_cases(df, summary, workers):
+            if cases and not any(c in name for c in cases):
+                continue
+            seconds, peak = measure(func, repeat)
+            results.append({"size": size, "rows": len(df), "case": name, "seconds": round(seconds, 6), "peak_bytes": int(peak)})
+            print(f"{name:<55} {seconds:>10.3f}s {peak / 2**20:>10.1f} MiB")
+        del df, summary
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "environment": environment(),
+        "repeat": repeat,
+        "seed": seed,
+        "workers": workers,
+        "results": results,
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(current, baseline, threshold=REGRESSION_THRESHOLD):
+    """Prints current vs baseline per (size, case). Returns the cases slower than `threshold` times the baseline."""
+    before = {(r["size"], r["case"]): r for r in baseline["results"]}
+    regressions = []
+    print(f"\n--- Compared with {baseline.get('environment', {}).get('commit')} ({baseline.get('created_at')}) ---")
+    for r in current["results"]:
+        old = before.get((r["size"], r["case"]))
+        if old is None:
+            continue
+        ratio = r["seconds"] / old["seconds"] if old["seconds"] else float("inf")
+        memory = r["peak_bytes"] / old["peak_bytes"] if old["peak_bytes"] else float("inf")
+        flag = "  REGRESSION" if ratio > threshold else ""
+        print(f"{r['size']:>5} {r['case']:<55} time x{ratio:>6.2f}  memory x{memory:>6.2f}{flag}")
+        if flag:
+            regressions.append(r)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the performanceV2 reports on synthetic history.")
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES, help="History sizes in rows, e.g. 10k 1M 10M")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case (the best is kept)")
+    parser.add_argument("--cases", nargs="*", help="Only run cases whose name contains one of these")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=0, help="Also time the parallel reports with this many worker processes")
+    parser.add_argument("--output", default="benchmark_results", help="Directory the result JSON is written to")
+    parser.add_argument("--compare", help="Earlier result JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    result = run(args.sizes, repeat=args.repeat, cases=args.cases, seed=args.seed, workers=args.workers)
+
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f"benchmark-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nResults written to {path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(result, json.load(f), args.threshold)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
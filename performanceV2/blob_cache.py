@@ -0,0 +1,157 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceNotModifiedError
+
+CACHE_TTL_SECONDS = 300  # Entries younger than this are served without asking blob storage
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+
+def _json_scalar(value):
+    """Scalars report payloads carry besides plain JSON types (numpy numbers, timestamps)."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON-able")
+
+
+def _sizeof(value, raw_size=None):
+    """
+    Bytes a cached value counts for: frames and objects with `nbytes` report their own, values parsed
+    from a blob count its size, and other JSON-able values the length of their JSON. None when unknown.
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    if raw_size:
+        return raw_size
+    try:
+        return len(json.dumps(value, default=_json_scalar))
+    except (TypeError, ValueError):
+        return None
+
+
+class _Entry:
+    __slots__ = ("value", "etag", "size", "checked_at")
+
+    def __init__(self, value, etag, size):
+        self.value, self.etag, self.size = value, etag, size
+        self.checked_at = time.monotonic()
+
+
+class BlobCache:
+    """
+    In-process LRU cache of values parsed from blobs, shared by every request on a warm worker.
+
+    - fetch(): mutable blobs. Within the TTL the cached value is returned as is; after it, a
+      conditional download (If-None-Match on the cached ETag) either confirms the entry or replaces it.
+    - memoize(): values derived from other blobs, valid as long as `version` (an ETag) is unchanged.
+    - get_or_load(): values of blobs that never change once written (history delta files).
+
+    The total size of cached values (see _sizeof) is kept under `max_bytes` by evicting the least recently used.
+    Cached values are shared: callers must not modify them in place.
+    """
+
+    def __init__(self, ttl_seconds=CACHE_TTL_SECONDS, max_bytes=CACHE_MAX_BYTES):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.revalidations = 0
+
+    # --- Internals ---
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _put(self, key, entry):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.size
+            if entry.size is None or entry.size > self.max_bytes:
+                return  # Values of unknown size are not cached: they could not be held to max_bytes
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+
+    # --- Public API ---
+
+    def fetch(self, blob_client, parse, variant=None):
+        """
+        Returns (parse(blob bytes), etag) for `blob_client`, revalidating with a conditional request
+        once the entry is older than the TTL. Missing blobs raise ResourceNotFoundError as usual.
+        """
+        key = ("blob", blob_client.blob_name, variant)
+        entry = self._get(key)
+        if entry is not None and time.monotonic() - entry.checked_at < self.ttl_seconds:
+            self.hits += 1
+            return entry.value, entry.etag
+
+        if entry is not None:
+            try:
+                downloader = blob_client.download_blob(etag=entry.etag, match_condition=MatchConditions.IfModified)
+            except ResourceNotModifiedError:
+                self.revalidations += 1
+                entry.checked_at = time.monotonic()
+                return entry.value, entry.etag
+        else:
+            downloader = blob_client.download_blob()
+
+        self.misses += 1
+        data = downloader.readall()
+        value, etag = parse(data), downloader.properties.etag
+        self._put(key, _Entry(value, etag, _sizeof(value, len(data))))
+        return value, etag
+
+    def memoize(self, key, version, build):
+        """Returns build(), reusing the cached result while `version` is unchanged."""
+        entry = self._get(("memo", key))
+        if entry is not None and entry.etag == version:
+            self.hits += 1
+            return entry.value
+        self.misses += 1
+        value = build()
+        self._put(("memo", key), _Entry(value, version, _sizeof(value)))
+        return value
+
+    def get_or_load(self, key, load):
+        """Returns load(), cached forever (until evicted). Only for content that never changes."""
+        entry = self._get(("immutable", key))
+        if entry is not None:
+            self.hits += 1
+            return entry.value
+        self.misses += 1
+        value = load()
+        self._put(("immutable", key), _Entry(value, None, _sizeof(value)))
+        return value
+
+    def discard(self, blob_name):
+        """Drops every cached variant of one blob, e.g. after this worker overwrote it."""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == "blob" and k[1] == blob_name]:
+                self._bytes -= self._entries.pop(key).size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            entries, size = len(self._entries), self._bytes
+        return {"entries": entries, "bytes": size, "max_bytes": self.max_bytes, "hits": self.hits, "misses": self.misses, "revalidations": self.revalidations}
@@ -0,0 +1,48 @@
+import gzip
+import json
+
+# --- Cache Blob Encoding ---
+# Compact cache blobs are minified JSON, gzip-compressed, stored as application/gzip with
+# ENCODING_METADATA_KEY=gzip in their blob metadata. The blob's Content-Encoding is left unset on
+# purpose: the storage SDK would otherwise decompress them on download, and the GET endpoints
+# forward the compressed bytes as they are to clients that accept gzip.
+ENCODING_METADATA_KEY = "json_encoding"
+GZIP_LEVEL = 6
+
+# Per-day file ID lists of the user caches: most of their size, and only needed for drill-downs
+FILE_ID_KEYS = ["manual_file_ids", "automatic_file_ids", "modification_file_ids", "sending_file_ids"]
+
+
+def encode_json(data, compact=True):
+    """Returns (payload bytes, content type, blob metadata) for a cache document."""
+    if not compact:
+        return json.dumps(data, indent=2).encode(), "application/json", {}
+    payload = gzip.compress(json.dumps(data, separators=(",", ":")).encode(), compresslevel=GZIP_LEVEL, mtime=0)
+    return payload, "application/gzip", {ENCODING_METADATA_KEY: "gzip"}
+
+
+def is_gzip_blob(metadata):
+    return (metadata or {}).get(ENCODING_METADATA_KEY) == "gzip"
+
+
+def accepts_gzip(accept_encoding):
+    """Whether an Accept-Encoding header value allows a gzip response."""
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "").lower() not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+def split_user_metrics(metrics):
+    """
+    Splits a per-user cache document into (summary, file_ids): the same document without the
+    per-day FILE_ID_KEYS lists, and those lists keyed by date.
+    """
+    summary = dict(metrics)
+    summary["daily_metrics"] = [{k: v for k, v in day.items() if k not in FILE_ID_KEYS} for day in metrics.get("daily_metrics", [])]
+    file_ids = {
+        "user": metrics.get("user"),
+        "daily_file_ids": {day["date"]: {k: day[k] for k in FILE_ID_KEYS if k in day} for day in metrics.get("daily_metrics", [])},
+    }
+    return summary, file_ids
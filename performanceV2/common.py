@@ -1,4 +1,5 @@
 from typing import List, Set, Tuple
+import pandas as pd
 
 # --- Constants ---
 
@@ -15,6 +16,9 @@ EXPORT_USERS = [
     'BATCHPROC'
 ]
 
+# Users per team (a user may belong to several)
+TEAMS = {"import": IMPORT_USERS, "export": EXPORT_USERS}
+
 # Combined list of all target users for reports
 TARGET_USERS = list(dict.fromkeys(IMPORT_USERS + EXPORT_USERS)) # Unique list for individual processing
 
@@ -24,6 +28,10 @@ SYSTEM_USERS = {"BATCHPROC", "ADMIN", "SYSTEM", "BATCH_PROC"} # Unified system u
 
 # --- Helper Functions ---
 
+def window_start(days):
+    """Start of a "last `days` days" report window: now minus `days`, floored to the hour the summaries are kept at."""
+    return (pd.Timestamp.now() - pd.Timedelta(days=days)).floor("h")
+
 def classify_file_activity(global_history: List[str], user_history: List[str] = None, group_df=None, target_user: str = None) -> Tuple[bool, bool]:
     """
     Determines if a file activity is 'Automatic' or 'Manual'.
@@ -99,3 +107,29 @@ def classify_file_activity(global_history: List[str], user_history: List[str] =
     is_manual = has_manual_trigger and not is_automatic
     
     return is_manual, is_automatic
+
+
+def classify_user_declarations(classes, pairs):
+    """
+    Applies classify_file_activity to many (user, declaration) pairs with a join.
+
+    Args:
+        classes: Output of declaration_summary.classify_activity.
+        pairs: DataFrame indexed by (USERCODE, DECLARATIONID) with a boolean 'user_manual' column
+               (the user's own history contains a MANUAL_STATUSES entry).
+
+    Returns:
+        `pairs` joined with `classes`, plus boolean 'is_manual' and 'is_automatic' columns.
+    """
+    facts = pairs.join(classes, on="DECLARATIONID", how="left")
+    user = facts.index.get_level_values("USERCODE")
+
+    # Files opened by a system user: credit goes to the responsible human, or to BATCHPROC if no human touched it
+    system_credit = (
+        (user.isin(SYSTEM_USERS) & ~facts["has_human"] & (user == 'BATCHPROC')) |
+        (~user.isin(SYSTEM_USERS) & facts["has_human"] & (facts["responsible_human"].astype(object) == user.astype(object)))
+    )
+
+    facts["is_automatic"] = facts["has_interface"].where(~facts["first_is_system"], system_credit)
+    facts["is_manual"] = ~facts["first_is_system"] & facts["user_manual"] & ~facts["has_interface"]
+    return facts
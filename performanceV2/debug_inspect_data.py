@@ -1,43 +1,38 @@
 
 import logging
-import io
 import pandas as pd
 from azure.storage.blob import BlobServiceClient
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
+from performanceV2.event_store import PartitionedEventStore
+from global_db.functions.key_vault import get_secret
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
-# --- Configuration (Copied from __init__.py) ---
+# --- Configuration (Copied from app.py) ---
 KEY_VAULT_URL = "https://kv-functions-python.vault.azure.net"
 SECRET_NAME = "azure-storage-account-access-key2"
 CONTAINER_NAME = "document-intelligence"
 PARQUET_BLOB_PATH = "logs/all_data.parquet"
+HISTORY_PREFIX = "logs/history/"
 
 def inspect_data():
     print("--- Initializing Azure Services ---")
     try:
-        credential = DefaultAzureCredential()
-        kv_client = SecretClient(vault_url=KEY_VAULT_URL, credential=credential)
-        connection_string = kv_client.get_secret(SECRET_NAME).value
+        connection_string = get_secret(SECRET_NAME, KEY_VAULT_URL)
         blob_service_client = BlobServiceClient.from_connection_string(connection_string)
         print("Successfully connected to KeyVault and Blob Service.")
     except Exception as e:
         print(f"CRITICAL: Failed to initialize Azure services: {e}")
         return
 
-    print(f"--- Downloading {PARQUET_BLOB_PATH} ---")
+    print(f"--- Downloading history from {HISTORY_PREFIX} ---")
     try:
-        blob_client = blob_service_client.get_blob_client(CONTAINER_NAME, PARQUET_BLOB_PATH)
-        if not blob_client.exists():
-             print("Parquet file not found at specified path.")
+        store = PartitionedEventStore(blob_service_client.get_container_client(CONTAINER_NAME), HISTORY_PREFIX, PARQUET_BLOB_PATH)
+        df = store.read()
+        if df.empty:
+             print("No history data found in the event store.")
              return
         
-        # Download and read into DataFrame
-        stream = io.BytesIO(blob_client.download_blob().readall())
-        df = pd.read_parquet(stream)
-        
         print("\n--- Data Loaded Successfully ---")
         print(f"Shape: {df.shape}")
         print(f"Columns: {list(df.columns)}")
@@ -0,0 +1,403 @@
+import io
+import logging
+
+import pandas as pd
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+
+from performanceV2.common import MANUAL_STATUSES, SENDING_STATUSES, SYSTEM_USERS
+from performanceV2.event_store import cluster_frame, concat_frames
+from performanceV2.preprocessing import EXCLUDED_COMPANIES, normalize_history
+from performanceV2.rollup import Rollup, build_rollup
+
+# --- Summary Layout ---
+# logs/summary/activity/month=YYYY-MM.parquet -> hourly activity per (declaration, user), one blob per month
+# logs/summary/runs/month=YYYY-MM.parquet     -> MODIFIED/WRT_ENT run starts of that month, enough to rebuild every
+#                                               session (written for every activity month, possibly empty)
+# logs/summary/rollup/month=YYYY-MM.parquet   -> rollup cube of that activity month (see rollup.py); its blob
+#                                               metadata records the ETag of the activity blob it was built from
+SUMMARY_PREFIX = "logs/summary/"
+ACTIVITY_DIR = "activity/"
+ROLLUP_DIR = "rollup/"
+RUNS_DIR = "runs/"
+ROLLUP_SOURCE_KEY = "activity_etag"
+LEGACY_RUNS_NAME = "session_runs.parquet"  # All-history runs blob of the previous layout, removed by `rebuild`
+
+DEDUP_COLUMNS = ['DECLARATIONID', 'USERCODE', 'HISTORY_STATUS', 'HISTORYDATETIME']
+ACTIVITY_KEYS = ["DECLARATIONID", "USERCODE", "HISTORYHOUR", "ACTIVECOMPANY", "TYPEDECLARATIONSSW"]
+SESSION_STATUSES = ["MODIFIED", "WRT_ENT"]
+SUMMARY_RETRIES = 5
+
+
+def build_activity(history_df):
+    """
+    Collapses (normalised) history rows into one row per declaration, user, hour, company and type.
+    Duplicated actions are dropped first, exactly as the reports do.
+
+    Columns: ACTIVITY_KEYS + actions, first_at, last_at, manual_actions, sending_count,
+    modification_count, interface_actions, first_modified_at.
+    """
+    df = history_df.dropna(subset=["DECLARATIONID", "HISTORYDATETIME"]).drop_duplicates(subset=DEDUP_COLUMNS)
+    for col in ["ACTIVECOMPANY", "TYPEDECLARATIONSSW"]:
+        if col not in df.columns:
+            df = df.assign(**{col: pd.Categorical([""] * len(df))})
+
+    status = df["HISTORY_STATUS"]
+    is_modified = status.eq("MODIFIED")
+    df = df.assign(
+        HISTORYHOUR=df["HISTORYDATETIME"].dt.floor("h"),
+        _manual=status.isin(MANUAL_STATUSES),
+        _sending=status.isin(SENDING_STATUSES),
+        _modified=is_modified,
+        _interface=status.eq("INTERFACE"),
+        _modified_at=df["HISTORYDATETIME"].where(is_modified),
+    )
+    activity = df.groupby(ACTIVITY_KEYS, observed=True, sort=False).agg(
+        actions=("HISTORY_STATUS", "size"),
+        first_at=("HISTORYDATETIME", "min"),
+        last_at=("HISTORYDATETIME", "max"),
+        manual_actions=("_manual", "sum"),
+        sending_count=("_sending", "sum"),
+        modification_count=("_modified", "sum"),
+        interface_actions=("_interface", "sum"),
+        first_modified_at=("_modified_at", "min"),
+    ).reset_index()
+
+    counts = ["actions", "manual_actions", "sending_count", "modification_count", "interface_actions"]
+    activity[counts] = activity[counts].astype("int32")
+    return activity.sort_values(["DECLARATIONID", "first_at"], kind="mergesort", ignore_index=True)
+
+
+def collapse_session_runs(rows):
+    """
+    Keeps only the first row of each run of identical MODIFIED/WRT_ENT statuses per (user, declaration).
+    Sessions open on a run of MODIFIED and close on the next run of WRT_ENT, so run starts are all
+    that is needed to rebuild them. Runs are stored per month, so a run spanning a month boundary
+    keeps one start per month; _session_durations collapses runs again and ignores the repeat.
+    """
+    keys = ["USERCODE", "DECLARATIONID"]
+    mw = rows[rows["HISTORY_STATUS"].isin(SESSION_STATUSES)][DEDUP_COLUMNS]
+    mw = cluster_frame(mw.drop_duplicates())
+    runs = mw[mw["HISTORY_STATUS"] != mw.groupby(keys, sort=False, observed=True)["HISTORY_STATUS"].shift()]
+    return runs.reset_index(drop=True)
+
+
+def classify_activity(activity):
+    """
+    Frame-level counterpart of classify_file_activity: the declaration-wide facts it looks at,
+    computed for every declaration in `activity` at once (the only place these rules are defined).
+
+    Returns a DataFrame indexed by DECLARATIONID with:
+    - first_user / first_is_system: who performed the earliest action and whether it is a SYSTEM_USER
+    - has_human: any non-system user touched the file
+    - responsible_human: human with most MODIFIED actions (ties go to whoever modified first),
+      falling back to the first human to touch the file
+    - has_interface / has_manual_status: 'INTERFACE' / any MANUAL_STATUSES in the history
+    """
+    activity = activity.sort_values(["DECLARATIONID", "first_at"], kind="mergesort")
+    decl = activity["DECLARATIONID"]
+    is_human = ~activity["USERCODE"].isin(SYSTEM_USERS)
+
+    classes = pd.DataFrame({
+        "first_user": activity.groupby(decl, sort=False)["USERCODE"].first(),
+        "has_human": is_human.groupby(decl, sort=False).any(),
+        "has_interface": activity["interface_actions"].gt(0).groupby(decl, sort=False).any(),
+        "has_manual_status": activity["manual_actions"].gt(0).groupby(decl, sort=False).any(),
+    })
+    classes["first_is_system"] = classes["first_user"].isin(SYSTEM_USERS)
+
+    humans = activity[is_human].groupby(["DECLARATIONID", "USERCODE"], sort=False, observed=True).agg(
+        mods=("modification_count", "sum"),
+        first_mod=("first_modified_at", "min"),
+        first_at=("first_at", "min"),
+    ).reset_index()
+    top_modifier = (
+        humans[humans["mods"] > 0]
+        .sort_values(["mods", "first_mod"], ascending=[False, True], kind="mergesort")
+        .drop_duplicates("DECLARATIONID")
+        .set_index("DECLARATIONID")["USERCODE"]
+    )
+    first_human = humans.sort_values("first_at", kind="mergesort").drop_duplicates("DECLARATIONID").set_index("DECLARATIONID")["USERCODE"]
+    classes["responsible_human"] = top_modifier.reindex(classes.index).fillna(first_human.reindex(classes.index))
+    return classes
+
+
+class DeclarationSummary:
+    """
+    Compact, per-declaration view of the history the performance reports are computed from.
+
+    - activity: hourly activity per (declaration, user, company, type), see build_activity
+    - runs: MODIFIED/WRT_ENT run starts (without EXCLUDED_COMPANIES activity), see collapse_session_runs
+    """
+
+    def __init__(self, activity, runs):
+        self.activity = activity
+        self.runs = runs
+
+    @classmethod
+    def from_history(cls, df_all):
+        history = normalize_history(df_all).dropna(subset=["HISTORYDATETIME"])
+        report_rows = history[~history["ACTIVECOMPANY"].isin(EXCLUDED_COMPANIES)] if "ACTIVECOMPANY" in history.columns else history
+        return cls(build_activity(history), collapse_session_runs(report_rows))
+
+    @classmethod
+    def from_chunks(cls, chunks):
+        """
+        Summary of a history streamed as declaration chunks (see iter_declaration_chunks): every
+        declaration is entirely inside one chunk, so the per-chunk summaries only need concatenating.
+        """
+        parts = [cls.from_history(chunk) for chunk in chunks]
+        if not parts:
+            return cls.from_history(pd.DataFrame(columns=DEDUP_COLUMNS))
+        return cls(concat_frames([p.activity for p in parts]), concat_frames([p.runs for p in parts]))
+
+    @property
+    def empty(self):
+        return self.activity.empty
+
+    def report_activity(self):
+        """Activity the reports look at (EXCLUDED_COMPANIES removed)."""
+        return self.activity[~self.activity["ACTIVECOMPANY"].isin(EXCLUDED_COMPANIES)]
+
+
+def as_summary(data):
+    """Accepts a DeclarationSummary or a raw history DataFrame (summarised on the fly)."""
+    return data if isinstance(data, DeclarationSummary) else DeclarationSummary.from_history(data)
+
+
+class DeclarationSummaryStore:
+    """
+    Persists a DeclarationSummary in blob storage and keeps it current at ingest.
+
+    New rows only touch recent hours of a few declarations: `apply` re-summarises the history of
+    those declarations from the earliest new day onwards and swaps it into the affected activity
+    and session-run month blobs, leaving older months untouched. Writes are ETag-conditional and retried.
+
+    Every activity month written also gets its rollup cube rewritten. A cube whose recorded source
+    ETag no longer matches its activity blob (a writer died in between) is rebuilt by `load_rollup`.
+
+    `cache`, an optional BlobCache, serves `load` from memory, revalidating each blob by ETag.
+    """
+
+    def __init__(self, container_client, prefix=SUMMARY_PREFIX, cache=None):
+        self.container_client = container_client
+        self.cache = cache
+        self.activity_prefix = f"{prefix}{ACTIVITY_DIR}"
+        self.rollup_prefix = f"{prefix}{ROLLUP_DIR}"
+        self.runs_prefix = f"{prefix}{RUNS_DIR}"
+        self.legacy_runs_path = f"{prefix}{LEGACY_RUNS_NAME}"
+
+    # --- Blob helpers ---
+
+    def _month_path(self, month):
+        return f"{self.activity_prefix}month={month}.parquet"
+
+    def _rollup_path(self, month):
+        return f"{self.rollup_prefix}month={month}.parquet"
+
+    def _runs_path(self, month):
+        return f"{self.runs_prefix}month={month}.parquet"
+
+    def _list_months(self, prefix, include=None):
+        """{month: BlobProperties} of the month blobs under `prefix`."""
+        blobs = self.container_client.list_blobs(name_starts_with=prefix, include=include)
+        return {b.name[len(prefix) + len("month="):-len(".parquet")]: b for b in blobs if b.name.endswith(".parquet")}
+
+    def _months(self):
+        return sorted(self._list_months(self.activity_prefix))
+
+    def _read(self, path, cached=False):
+        """Returns (frame, etag), or (None, None) when the blob does not exist."""
+        blob_client = self.container_client.get_blob_client(path)
+        try:
+            if cached and self.cache is not None:
+                return self.cache.fetch(blob_client, lambda data: pd.read_parquet(io.BytesIO(data)))
+            downloader = blob_client.download_blob()
+            return pd.read_parquet(io.BytesIO(downloader.readall())), downloader.properties.etag
+        except ResourceNotFoundError:
+            return None, None
+
+    def _write(self, path, df, etag):
+        """Writes `df` if the blob is still at `etag` (create-only when None). Returns the new ETag."""
+        buffer = io.BytesIO()
+        df.to_parquet(buffer, index=False)
+        blob_client = self.container_client.get_blob_client(path)
+        if etag is None:
+            result = blob_client.upload_blob(buffer.getvalue(), overwrite=False)
+        else:
+            result = blob_client.upload_blob(buffer.getvalue(), overwrite=True, etag=etag, match_condition=MatchConditions.IfNotModified)
+        if self.cache is not None:
+            self.cache.discard(path)
+        return result["etag"]
+
+    def _replace(self, path, merge):
+        """Read-merge-write of one blob, retried when another writer changed it in between. Returns (frame, etag) written."""
+        for attempt in range(SUMMARY_RETRIES):
+            current, etag = self._read(path)
+            try:
+                merged = merge(current)
+                return merged, self._write(path, merged, etag)
+            except (ResourceModifiedError, ResourceExistsError):
+                logging.warning(f"{path} changed concurrently, retrying ({attempt + 1}/{SUMMARY_RETRIES}).")
+        raise RuntimeError(f"Could not update {path} after several attempts.")
+
+    def _replace_month(self, month, merge):
+        """Updates one activity month and rewrites its rollup cube from the result."""
+        activity, etag = self._replace(self._month_path(month), merge)
+        return self._write_rollup(month, build_rollup(activity), etag)
+
+    def _write_rollup(self, month, cube, activity_etag):
+        buffer = io.BytesIO()
+        cube.to_parquet(buffer, index=False)
+        path = self._rollup_path(month)
+        self.container_client.get_blob_client(path).upload_blob(buffer.getvalue(), overwrite=True, metadata={ROLLUP_SOURCE_KEY: activity_etag.strip('"')})
+        if self.cache is not None:
+            self.cache.discard(path)
+        return cube
+
+    def _delete_month(self, month):
+        for path in (self._month_path(month), self._rollup_path(month), self._runs_path(month)):
+            try:
+                self.container_client.get_blob_client(path).delete_blob()
+            except ResourceNotFoundError:
+                pass
+            if self.cache is not None:
+                self.cache.discard(path)
+
+    # --- Public API ---
+
+    def exists(self):
+        """True once the summary was built in the current layout (a store with only the legacy runs blob is rebuilt)."""
+        return next(iter(self.container_client.list_blobs(name_starts_with=self.runs_prefix)), None) is not None
+
+    def load(self, since=None, declaration_months=None):
+        """
+        Loads the summary; `since` limits activity to the months overlapping [since, now]. Given
+        `declaration_months(ids)` (the months holding rows of those declarations, e.g. from the history
+        store's declaration index), the earlier activity of every declaration active in the window is
+        loaded too, so reports classify them on their full history. Session runs are always loaded in
+        full, month after month, so each declaration's runs stay in time order.
+        """
+        months = self._months()
+        window = months
+        if since is not None:
+            first_month = pd.Timestamp(since).strftime("%Y-%m")
+            window = [m for m in months if m >= first_month]
+        frames = [self._read(self._month_path(m), cached=True)[0] for m in window]
+        frames = [f for f in frames if f is not None and not f.empty]
+        if since is not None and declaration_months is not None and frames:
+            touched = pd.unique(pd.concat([f["DECLARATIONID"] for f in frames], ignore_index=True))
+            earlier = [m for m in declaration_months(touched) if m < first_month and m in months]
+            older = [self._read(self._month_path(m), cached=True)[0] for m in earlier]
+            frames = [f[f["DECLARATIONID"].isin(touched)] for f in older if f is not None] + frames
+            frames = [f for f in frames if not f.empty]
+        run_frames = [self._read(self._runs_path(m), cached=True)[0] for m in sorted(self._list_months(self.runs_prefix))]
+        run_frames = [f for f in run_frames if f is not None and not f.empty]
+        activity = concat_frames(frames) if frames else build_activity(normalize_history(pd.DataFrame(columns=DEDUP_COLUMNS)))
+        runs = concat_frames(run_frames) if run_frames else pd.DataFrame(columns=DEDUP_COLUMNS)
+        return DeclarationSummary(activity, runs)
+
+    def rebuild(self, history):
+        """Writes the summary of a complete history (a raw frame or a DeclarationSummary) from scratch."""
+        summary = as_summary(history)
+        months = summary.activity["HISTORYHOUR"].dt.strftime("%Y-%m")
+        run_months = summary.runs["HISTORYDATETIME"].dt.strftime("%Y-%m")
+        for month, part in summary.activity.groupby(months, sort=True):
+            self._replace_month(month, lambda current, part=part: part)
+            runs = summary.runs[run_months == month].reset_index(drop=True)
+            self._replace(self._runs_path(month), lambda current, runs=runs: runs)
+        for month in (set(self._months()) | set(self._list_months(self.runs_prefix))) - set(months.unique()):
+            self._delete_month(month)
+        try:
+            self.container_client.get_blob_client(self.legacy_runs_path).delete_blob()
+        except ResourceNotFoundError:
+            pass
+        logging.info(f"Rebuilt declaration summary: {len(summary.activity)} activity rows, {len(summary.runs)} session runs.")
+        return summary
+
+    def apply(self, new_df, read_history):
+        """
+        Brings the summary up to date after `new_df` was appended to the history.
+        `read_history(since, where)` must return the stored history from `since` onwards (new rows
+        included), restricted to the rows matching `where` ({column: values}) when given.
+        """
+        new_rows = normalize_history(new_df).dropna(subset=["DECLARATIONID", "HISTORYDATETIME"])
+        if new_rows.empty:
+            return
+        if not self.exists():
+            self.rebuild(read_history(None))
+            return
+
+        window_start = new_rows["HISTORYDATETIME"].min().floor("D")
+        touched = new_rows["DECLARATIONID"].unique()
+
+        history = normalize_history(read_history(window_start, {"DECLARATIONID": [int(d) for d in touched]}))
+        history = history[history["DECLARATIONID"].isin(touched) & (history["HISTORYDATETIME"] >= window_start)]
+        fresh = DeclarationSummary.from_history(history)
+
+        # Replace the touched declarations' activity hours and session runs from window_start on, month by month
+        fresh_months = fresh.activity["HISTORYHOUR"].dt.strftime("%Y-%m")
+        fresh_run_months = fresh.runs["HISTORYDATETIME"].dt.strftime("%Y-%m")
+        for month in sorted(set(fresh_months.unique()) | {m for m in self._months() if m >= window_start.strftime("%Y-%m")}):
+            month_rows = fresh.activity[fresh_months == month]
+            month_runs = fresh.runs[fresh_run_months == month]
+
+            def merge(current, month_rows=month_rows):
+                if current is None:
+                    return month_rows
+                stale = current["DECLARATIONID"].isin(touched) & (current["HISTORYHOUR"] >= window_start)
+                return concat_frames([current[~stale], month_rows]).sort_values(["DECLARATIONID", "first_at"], kind="mergesort", ignore_index=True)
+
+            def merge_runs(current, month_runs=month_runs):
+                # Re-collapse the touched declarations from their earlier runs of the month plus the new ones
+                if current is None:
+                    return month_runs.reset_index(drop=True)
+                is_touched = current["DECLARATIONID"].isin(touched)
+                earlier = current[is_touched & (current["HISTORYDATETIME"] < window_start)]
+                rebuilt = collapse_session_runs(concat_frames([earlier, month_runs]))
+                return cluster_frame(concat_frames([current[~is_touched], rebuilt])).reset_index(drop=True)
+
+            self._replace_month(month, merge)
+            self._replace(self._runs_path(month), merge_runs)
+        logging.info(f"Declaration summary updated for {len(touched)} declaration(s) from {window_start.date()}.")
+
+    def _window_months(self, months, start=None, end=None):
+        """The months among `months` that overlap [start, end)."""
+        months = sorted(months)
+        if start is not None:
+            months = [m for m in months if m >= pd.Timestamp(start).strftime("%Y-%m")]
+        if end is not None:
+            months = [m for m in months if m <= (pd.Timestamp(end) - pd.Timedelta(microseconds=1)).strftime("%Y-%m")]
+        return months
+
+    def rollup_version(self, start=None, end=None):
+        """(month, activity ETag) of the months overlapping [start, end): changes whenever their data does."""
+        activity = self._list_months(self.activity_prefix)
+        return tuple((month, activity[month].etag) for month in self._window_months(activity, start, end))
+
+    def load_rollup(self, start=None, end=None):
+        """
+        Rollup cube of the months overlapping [start, end). Cube months that are missing or were built
+        from an older version of their activity month are rebuilt (and stored) on the way.
+        """
+        activity = self._list_months(self.activity_prefix)
+        cubes = self._list_months(self.rollup_prefix, include=["metadata"])
+        months = self._window_months(activity, start, end)
+
+        frames = []
+        for month in months:
+            source_etag = activity[month].etag.strip('"')
+            cube = cubes.get(month)
+            if cube is not None and (cube.metadata or {}).get(ROLLUP_SOURCE_KEY) == source_etag:
+                frames.append(self._read(self._rollup_path(month), cached=True)[0])
+                continue
+            month_activity, etag = self._read(self._month_path(month), cached=True)
+            if month_activity is None:
+                continue
+            rebuilt = build_rollup(month_activity)
+            try:
+                self._write_rollup(month, rebuilt, etag)
+            except Exception as e:
+                logging.warning(f"Could not store the rollup cube of {month}: {e}")
+            frames.append(rebuilt)
+        return Rollup.concat(frames)
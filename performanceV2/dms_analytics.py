@@ -0,0 +1,209 @@
+import threading
+import pandas as pd
+from cachetools import LRUCache
+from performanceV2.common import MANUAL_STATUSES, window_start
+from performanceV2.event_store import cluster_frame, concat_frames
+from performanceV2.preprocessing import prepare_report_frame
+
+DMS_IMPORT_TYPE = "DMS_IMPORT"
+ROLLUP_COLUMNS = ["USERCODE", "HISTORYDATETIME", "ACTIVECOMPANY", "has_manual_status", "has_interface"]
+MAX_CACHED_WINDOWS = 8
+
+
+def build_hourly_rollup(df_all):
+    """
+    One row per (DMS_IMPORT declaration, hour) with the first action of that hour (user, time, company)
+    and whether the hour had a manual creation status or an INTERFACE action.
+
+    Every window answer is an aggregation over the hours >= its start (see window_start), so any `days` value is a slice.
+    """
+    df = prepare_report_frame(df_all, exclude_companies=False)
+    if "TYPEDECLARATIONSSW" not in df.columns:
+        df = df.iloc[0:0]
+    df = df[(df["TYPEDECLARATIONSSW"] == DMS_IMPORT_TYPE) & df["DECLARATIONID"].notna()]
+    df = cluster_frame(df)
+
+    status = df["HISTORY_STATUS"]
+    df = df.assign(
+        hour=df["HISTORYDATETIME"].dt.floor("h"),
+        has_manual_status=status.isin(MANUAL_STATUSES),
+        has_interface=status.eq("INTERFACE"),
+    )
+    if "ACTIVECOMPANY" not in df.columns:
+        df["ACTIVECOMPANY"] = "N/A"
+
+    keys = ["DECLARATIONID", "hour"]
+    first = df.drop_duplicates(keys).set_index(keys)[["USERCODE", "HISTORYDATETIME", "ACTIVECOMPANY"]]
+    flags = df.groupby(keys, sort=False)[["has_manual_status", "has_interface"]].any()
+    return first.join(flags).reset_index()
+
+
+class DmsAnalytics:
+    """
+    DMS_IMPORT analysis over one version of the history.
+
+    The hourly rollup is built once; each window's per-declaration classification is computed once
+    and shared by the detailed breakdown and the summary. Instances are shared by concurrent
+    requests (frame_cache), so the window cache is an LRU guarded by a lock.
+    """
+
+    def __init__(self, rollup):
+        self.rollup = rollup
+        self._files = LRUCache(maxsize=MAX_CACHED_WINDOWS)
+        self._files_lock = threading.Lock()
+
+    @classmethod
+    def from_history(cls, df_all):
+        return cls(build_hourly_rollup(df_all))
+
+    @classmethod
+    def from_chunks(cls, chunks):
+        """Analytics of a history streamed as declaration chunks: each chunk's rollup is final."""
+        rollups = [build_hourly_rollup(chunk) for chunk in chunks]
+        rollups = [r for r in rollups if not r.empty]
+        return cls(concat_frames(rollups) if rollups else build_hourly_rollup(pd.DataFrame(columns=["DECLARATIONID", "USERCODE", "HISTORY_STATUS", "HISTORYDATETIME", "ACTIVECOMPANY", "TYPEDECLARATIONSSW"])))
+
+    @property
+    def empty(self):
+        return self.rollup.empty
+
+    @property
+    def nbytes(self):
+        # The rollup only: frame_cache sizes an entry once, when it is stored, and the lazily built
+        # windows (at most MAX_CACHED_WINDOWS, each far smaller than the rollup) come later.
+        return int(self.rollup.memory_usage(deep=True).sum())
+
+    def files(self, days_back=30):
+        """
+        Files of the window, indexed by DECLARATIONID: creator, creation time/date and company from the
+        first action inside the window, and the manual/automatic classification of the window's actions.
+        """
+        start = window_start(days_back)
+        with self._files_lock:
+            files = self._files.get(start)
+        if files is not None:
+            return files
+
+        # Built outside the lock: two requests may build the same window once, neither blocks the other
+        rows = self.rollup[self.rollup["hour"] >= start]
+        first = rows.drop_duplicates("DECLARATIONID").set_index("DECLARATIONID")
+        flags = rows.groupby("DECLARATIONID", sort=False)[["has_manual_status", "has_interface"]].any()
+        is_manual = flags["has_manual_status"] & ~flags["has_interface"]
+        files = pd.DataFrame({
+            "creator": first["USERCODE"],
+            "creation_datetime": first["HISTORYDATETIME"],
+            "creation_date": first["HISTORYDATETIME"].dt.strftime("%Y-%m-%d"),
+            "company": first["ACTIVECOMPANY"],
+            "is_manual": is_manual.reindex(first.index),
+            "is_automatic": (flags["has_interface"] & ~is_manual).reindex(first.index),
+        })
+        with self._files_lock:
+            self._files[start] = files
+        return files
+
+    def breakdown(self, days_back=30):
+        """
+        Count all files created with file type 'DMS_IMPORT' and track which users created them.
+        Returns a dictionary with total count, user breakdown, and daily breakdown.
+        """
+        files = self.files(days_back)
+        if files.empty:
+            return {
+                "total_dms_import_files": 0,
+                "users_breakdown": {},
+                "daily_breakdown": {},
+                "period_days": days_back,
+                "file_details": []
+            }
+
+        # Count the file for the creator
+        users_breakdown = {}
+        for user, data in files.groupby("creator", sort=False, observed=True):
+            total = len(data)
+            manual = int(data["is_manual"].sum())
+            users_breakdown[user] = {
+                "total_files": total,
+                "manual_files": manual,
+                "automatic_files": int(data["is_automatic"].sum()),
+                "manual_percentage": round((manual / total) * 100, 2) if total > 0 else 0,
+                "file_ids": data.index.tolist()
+            }
+
+        daily_breakdown_clean = {}
+        for date, data in files.groupby("creation_date", sort=False):
+            users = data["creator"].unique().tolist()
+            daily_breakdown_clean[date] = {
+                "total_files": len(data),
+                "manual_files": int(data["is_manual"].sum()),
+                "automatic_files": int(data["is_automatic"].sum()),
+                "unique_users": len(users),
+                "users": users,
+                "file_ids": data.index.tolist()
+            }
+
+        # Store file details
+        file_details = [
+            {
+                "declaration_id": decl_id,
+                "creator": row.creator,
+                "creation_date": row.creation_date,
+                "creation_datetime": row.creation_datetime.isoformat(),
+                "file_type": "manual" if row.is_manual else "automatic",
+                "company": row.company
+            }
+            for decl_id, row in zip(files.index.tolist(), files.itertuples(index=False))
+        ]
+
+        total_files = sum(data["total_files"] for data in users_breakdown.values())
+        total_manual = sum(data["manual_files"] for data in users_breakdown.values())
+        total_automatic = sum(data["automatic_files"] for data in users_breakdown.values())
+
+        return {
+            "total_dms_import_files": total_files,
+            "total_manual_files": total_manual,
+            "total_automatic_files": total_automatic,
+            "manual_vs_auto_ratio": {
+                "manual_percent": round((total_manual / total_files) * 100, 2) if total_files > 0 else 0,
+                "automatic_percent": round((total_automatic / total_files) * 100, 2) if total_files > 0 else 0
+            },
+            "users_breakdown": users_breakdown,
+            "daily_breakdown": daily_breakdown_clean,
+            "period_days": days_back,
+            "unique_users_count": len(users_breakdown),
+            "file_details": sorted(file_details, key=lambda x: x["creation_datetime"], reverse=True)
+        }
+
+    def summary(self, days_back=30):
+        """Quick summary of DMS_IMPORT file creation statistics, from the same per-file classification."""
+        files = self.files(days_back)
+        total_files = len(files)
+        total_manual = int(files["is_manual"].sum())
+        total_automatic = int(files["is_automatic"].sum())
+
+        per_user = files.groupby("creator", sort=False, observed=True).agg(
+            files_created=("is_manual", "size"),
+            manual_files=("is_manual", "sum"),
+            automatic_files=("is_automatic", "sum"),
+        )
+        # Get top users by file count
+        top_users = per_user.sort_values("files_created", ascending=False, kind="mergesort").head(5)
+
+        return {
+            "period": f"Last {days_back} days",
+            "total_dms_import_files": total_files,
+            "total_users_involved": len(per_user),
+            "manual_vs_automatic": {
+                "manual_percent": round((total_manual / total_files) * 100, 2) if total_files > 0 else 0,
+                "automatic_percent": round((total_automatic / total_files) * 100, 2) if total_files > 0 else 0
+            },
+            "top_5_users": [
+                {
+                    "user": user,
+                    "files_created": int(row.files_created),
+                    "manual_files": int(row.manual_files),
+                    "automatic_files": int(row.automatic_files)
+                }
+                for user, row in top_users.iterrows()
+            ],
+            "daily_average": round(total_files / days_back, 2) if days_back > 0 else 0
+        }
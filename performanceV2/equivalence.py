@@ -0,0 +1,202 @@
+"""
+Golden-output comparison of report engines on the same history snapshot.
+
+    python -m performanceV2.equivalence --synthetic 100k
+    python -m performanceV2.equivalence --snapshot history.parquet --engines performance performanceV2 --output diff.json
+
+Every engine runs every case (10-day summary, monthly report, each user's metrics, DMS breakdown
+and summary per window) on its own copy of the snapshot. Outputs are diffed field by field: records
+are matched by user/team/date/declaration, ID lists are compared as sets. The report lists the
+differences per case next to each engine's time and peak memory; the exit status is 1 when any
+output differs from the first (reference) engine.
+"""
+import argparse
+import importlib
+import json
+import sys
+
+import pandas as pd
+
+from performanceV2.benchmark import measure, parse_size
+from performanceV2.common import TARGET_USERS
+from performanceV2.synthetic_history import generate_history_rows
+
+# Engine name -> modules providing the report functions (same names and signatures in each engine)
+ENGINES = {
+    "performance": {"reports": "performance.functions.functions", "dms": "performance.dms_functions"},
+    "performanceV2": {"reports": "performanceV2.functions.functions", "dms": "performanceV2.dms_functions"},
+}
+DMS_WINDOWS = [7, 30]
+RECORD_KEYS = ["user", "team", "date", "declaration_id"]  # Fields identifying a record inside a list
+MAX_DIFFS_PER_CASE = 50
+
+
+def load_engine(name):
+    """{function name: function} of an engine from ENGINES, or of a 'reports_module:dms_module' spec."""
+    spec = ENGINES.get(name)
+    if spec is None:
+        reports, _, dms = name.partition(":")
+        spec = {"reports": reports, "dms": dms or reports}
+    reports, dms = importlib.import_module(spec["reports"]), importlib.import_module(spec["dms"])
+    return {
+        "count_user_file_creations_last_10_days": reports.count_user_file_creations_last_10_days,
+        "calculate_single_user_metrics_fast": reports.calculate_single_user_metrics_fast,
+        "calculate_all_users_monthly_metrics": reports.calculate_all_users_monthly_metrics,
+        "count_dms_import_files_created": dms.count_dms_import_files_created,
+        "get_dms_import_summary": dms.get_dms_import_summary,
+    }
+
+
+def cases(users, dms_windows):
+    """(case name, call(engine functions, snapshot)) pairs."""
+    yield "10_day_summary", lambda f, df: f["count_user_file_creations_last_10_days"](df)
+    yield "monthly_report", lambda f, df: f["calculate_all_users_monthly_metrics"](df)
+    for user in users:
+        yield f"user/{user}", lambda f, df, user=user: f["calculate_single_user_metrics_fast"](df, user)
+    for days in dms_windows:
+        yield f"dms_breakdown/{days}d", lambda f, df, days=days: f["count_dms_import_files_created"](df, days)
+        yield f"dms_summary/{days}d", lambda f, df, days=days: f["get_dms_import_summary"](df, days)
+
+
+# --- Diffing ---
+
+def _record_key(record):
+    return tuple((k, record[k]) for k in RECORD_KEYS if k in record)
+
+
+def _is_record_list(values):
+    return bool(values) and all(isinstance(v, dict) and _record_key(v) for v in values)
+
+
+def diff(a, b, path="", ordered=False):
+    """
+    Differences between two JSON-like values as [(path, a value, b value)].
+    Lists of records are matched by their RECORD_KEYS; other lists are compared as multisets
+    unless `ordered`.
+    """
+    if isinstance(a, dict) and isinstance(b, dict):
+        out = []
+        for key in list(a) + [k for k in b if k not in a]:
+            if key not in a or key not in b:
+                out.append((f"{path}/{key}", a.get(key, "<missing>"), b.get(key, "<missing>")))
+            else:
+                out += diff(a[key], b[key], f"{path}/{key}", ordered)
+        return out
+    if isinstance(a, list) and isinstance(b, list):
+        if _is_record_list(a) and _is_record_list(b):
+            a_by_key = {_record_key(r): r for r in a}
+            b_by_key = {_record_key(r): r for r in b}
+            return diff(
+                {"|".join(f"{k}={v}" for k, v in key): r for key, r in a_by_key.items()},
+                {"|".join(f"{k}={v}" for k, v in key): r for key, r in b_by_key.items()},
+                path, ordered,
+            )
+        if not ordered:
+            key = lambda v: json.dumps(v, sort_keys=True, default=str)
+            a, b = sorted(a, key=key), sorted(b, key=key)
+        if len(a) != len(b) or any(not isinstance(v, (dict, list)) for v in a + b):
+            return [] if a == b else [(path, a, b)]
+        return [d for i, (x, y) in enumerate(zip(a, b)) for d in diff(x, y, f"{path}[{i}]", ordered)]
+    if isinstance(a, float) and isinstance(b, float) and abs(a - b) <= 1e-9:
+        return []
+    return [] if a == b else [(path, a, b)]
+
+
+def _jsonable(value):
+    return json.loads(json.dumps(value, default=str))
+
+
+# --- Runner ---
+
+def compare_engines(snapshot, engine_names, users=None, dms_windows=DMS_WINDOWS, ordered=False):
+    """Runs every case on every engine. Returns the report document (reference: the first engine)."""
+    engines = {name: load_engine(name) for name in engine_names}
+    reference = engine_names[0]
+    report = {"rows": len(snapshot), "engines": list(engine_names), "reference": reference, "cases": []}
+
+    for case, call in cases(users or TARGET_USERS, dms_windows):
+        outputs, runs = {}, {}
+        for name, functions in engines.items():
+            result = {}
+
+            def run_once():
+                result["value"] = call(functions, snapshot.copy())
+            try:
+                seconds, peak = measure(run_once, repeat=1)
+                outputs[name] = _jsonable(result["value"])
+                runs[name] = {"seconds": round(seconds, 4), "peak_bytes": int(peak)}
+            except Exception as e:
+                outputs[name] = None
+                runs[name] = {"error": f"{type(e).__name__}: {e}"}
+
+        entry = {"case": case, "runs": runs, "differences": {}}
+        for name in engine_names[1:]:
+            if outputs[reference] is None or outputs[name] is None:
+                continue
+            diffs = diff(outputs[reference], outputs[name], ordered=ordered)
+            entry["differences"][name] = {
+                "count": len(diffs),
+                "first": [{"path": p or "/", reference: x, name: y} for p, x, y in diffs[:MAX_DIFFS_PER_CASE]],
+            }
+        report["cases"].append(entry)
+        _print_case(entry, engine_names)
+    return report
+
+
+def _print_case(entry, engine_names):
+    reference = engine_names[0]
+    parts = []
+    for name in engine_names:
+        run = entry["runs"][name]
+        if "error" in run:
+            parts.append(f"{name}: ERROR {run['error']}")
+            continue
+        text = f"{name}: {run['seconds']:.3f}s {run['peak_bytes'] / 2**20:.1f}MiB"
+        ref = entry["runs"][reference]
+        if name != reference and "seconds" in ref and run["seconds"]:
+            text += f" (x{ref['seconds'] / run['seconds']:.1f})"
+        if name in entry["differences"]:
+            count = entry["differences"][name]["count"]
+            text += " identical" if count == 0 else f" {count} difference(s)"
+        parts.append(text)
+    print(f"{entry['case']:<32} " + " | ".join(parts))
+
+
+def load_snapshot(path):
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    if path.endswith(".csv"):
+        return pd.read_csv(path)
+    raise ValueError("Snapshots must be .parquet or .csv files.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare report engines output by output on one snapshot.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--snapshot", help="History snapshot (.parquet or .csv, columns as posted to the ingest endpoint)")
+    source.add_argument("--synthetic", help="Generate a synthetic snapshot of this many rows, e.g. 100k")
+    parser.add_argument("--engines", nargs="+", default=list(ENGINES), help="Engine names from ENGINES or 'reports_module:dms_module'; the first is the reference")
+    parser.add_argument("--users", nargs="*", help="Users to compare per-user metrics for (default: TARGET_USERS)")
+    parser.add_argument("--dms-windows", nargs="*", type=int, default=DMS_WINDOWS)
+    parser.add_argument("--ordered", action="store_true", help="Compare lists in order (default: ID lists compared as sets)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the full report (with the first differences per case) to this JSON file")
+    args = parser.parse_args(argv)
+
+    snapshot = load_snapshot(args.snapshot) if args.snapshot else generate_history_rows(parse_size(args.synthetic), seed=args.seed)
+    print(f"Snapshot: {len(snapshot):,} rows. Reference engine: {args.engines[0]}")
+    report = compare_engines(snapshot, args.engines, users=args.users, dms_windows=args.dms_windows, ordered=args.ordered)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+        print(f"Report written to {args.output}")
+
+    differing = [c["case"] for c in report["cases"] if any(d["count"] for d in c["differences"].values())]
+    failed = [c["case"] for c in report["cases"] if any("error" in r for r in c["runs"].values())]
+    print(f"\n{len(report['cases']) - len(differing)}/{len(report['cases'])} cases identical." + (f" Errors in: {', '.join(failed)}" if failed else ""))
+    return 1 if differing or failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
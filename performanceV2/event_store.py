@@ -0,0 +1,661 @@
+import io
+import json
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pandas.api.types import union_categoricals
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+
+# --- Store Layout ---
+# logs/history/_manifest.json               -> list of every data file + its row count and time range
+# logs/history/month=YYYY-MM/part-*.parquet -> append-only delta files, one per ingest per month touched,
+#                                              rows clustered by (DECLARATIONID, HISTORYDATETIME)
+# logs/history/_index/declarations.parquet  -> DECLARATIONID -> (file, row range) for point lookups
+HISTORY_PREFIX = "logs/history/"
+MANIFEST_NAME = "_manifest.json"
+INDEX_NAME = "_index/declarations.parquet"
+LEGACY_PARQUET_BLOB_PATH = "logs/all_data.parquet"
+UNDATED_PARTITION = "undated"  # Rows whose HISTORYDATETIME cannot be parsed
+
+MAX_FILES_PER_PARTITION = 48  # Above this a partition is compacted into a single file
+MANIFEST_RETRIES = 5
+DOWNLOAD_WORKERS = 8
+ROW_GROUP_SIZE = 8192  # Small row groups let point lookups decode only the rows they need
+CHUNK_ROWS = 500_000  # Target size of the declaration chunks iter_declaration_chunks yields
+INDEX_COLUMNS = ["DECLARATIONID", "path", "start", "rows"]
+# Row order inside every data file, recorded as "order" in its manifest entry and as the file's Parquet sorting columns
+CLUSTER_ORDER = ["DECLARATIONID", "HISTORYDATETIME"]
+
+
+def parse_history_datetime(series):
+    """Parses HISTORYDATETIME the same way the reports do (coerce errors, drop the timezone)."""
+    parsed = pd.to_datetime(series, errors="coerce")
+    if getattr(parsed.dt, "tz", None) is not None:
+        parsed = parsed.dt.tz_localize(None)
+    return parsed
+
+
+def concat_frames(frames):
+    """pd.concat that keeps categorical columns categorical when files carry different categories."""
+    if len(frames) > 1:
+        categorical = {c for f in frames for c, dtype in f.dtypes.items() if isinstance(dtype, pd.CategoricalDtype)}
+        for col in categorical:
+            parts = [f[col] if isinstance(f[col].dtype, pd.CategoricalDtype) else f[col].astype("category") for f in frames if col in f.columns]
+            categories = union_categoricals(parts, ignore_order=True).categories
+            frames = [f.assign(**{col: pd.Categorical(f[col], categories=categories)}) if col in f.columns else f for f in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+def _cluster_keys(ids, times):
+    """Float IDs and int64 times with nulls mapped past every value, so nulls sort last."""
+    ids = pd.to_numeric(pd.Series(ids), errors="coerce").to_numpy("float64", na_value=np.inf)
+    times = pd.Series(times).to_numpy("datetime64[ns]").view("int64")
+    times = np.where(times == np.iinfo("int64").min, np.iinfo("int64").max, times)  # NaT
+    return ids, times
+
+
+def _in_cluster_order(ids, times):
+    return bool(np.all((ids[1:] > ids[:-1]) | ((ids[1:] == ids[:-1]) & (times[1:] >= times[:-1]))))
+
+
+def cluster_order(ids, times):
+    """
+    Positions that put rows in CLUSTER_ORDER (stable, nulls last: what sort_values(kind="mergesort")
+    returns), or None when they already are. Clustered files read one after the other are sorted runs
+    that a stable sort on the ID alone merges; a single vectorised pass checks the result, and only
+    unclustered input (legacy files) pays for a full two-key sort.
+    """
+    ids, times = _cluster_keys(ids, times)
+    if _in_cluster_order(ids, times):
+        return None
+    by_id = np.argsort(ids, kind="stable")
+    if _in_cluster_order(ids[by_id], times[by_id]):
+        return by_id
+    return np.lexsort((times, ids))
+
+
+def cluster_frame(df):
+    """
+    `df` in CLUSTER_ORDER; the frame itself when it already is, so grouping by runs of DECLARATIONID
+    needs no sort. Frames without both columns are returned unchanged.
+    """
+    if len(df) < 2 or not set(CLUSTER_ORDER) <= set(df.columns):
+        return df
+    order = cluster_order(df["DECLARATIONID"], df["HISTORYDATETIME"])
+    return df if order is None else df.iloc[order]
+
+
+def partition_keys(timestamps):
+    """Month partition ('YYYY-MM') of each timestamp; unparseable ones go to UNDATED_PARTITION."""
+    return timestamps.dt.strftime("%Y-%m").fillna(UNDATED_PARTITION)
+
+
+def declaration_ranges(path, ids):
+    """
+    Index rows for one data file: one (DECLARATIONID, path, start, rows) per run of identical IDs.
+    Files are written clustered by DECLARATIONID, so each declaration is normally a single run.
+    """
+    ids = pd.to_numeric(pd.Series(ids), errors="coerce").round().astype("Int64").fillna(-1).to_numpy("int64")
+    if len(ids) == 0:
+        return pd.DataFrame(columns=INDEX_COLUMNS)
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+    rows = np.diff(np.r_[starts, len(ids)])
+    keep = ids[starts] >= 0  # Rows without an ID are never looked up
+    return pd.DataFrame({
+        "DECLARATIONID": ids[starts][keep],
+        "path": path,
+        "start": starts[keep].astype("int64"),
+        "rows": rows[keep].astype("int64"),
+    })
+
+
+class BlobRangeFile(io.RawIOBase):
+    """
+    Read-only, seekable file over a blob where every read is a ranged download, so Parquet readers
+    fetch only the footer and the column chunks they decode instead of the whole blob.
+    """
+
+    def __init__(self, blob_client, size=None):
+        self.blob_client = blob_client
+        self._size = size if size is not None else blob_client.get_blob_properties().size
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def size(self):
+        return self._size
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: self._size}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def readinto(self, buffer):
+        length = min(len(buffer), self._size - self._pos)
+        if length <= 0:
+            return 0
+        data = self.blob_client.download_blob(offset=self._pos, length=length).readall()
+        buffer[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+
+def row_filter(schema, since=None, where=None):
+    """
+    Dataset filter for one file: HISTORYDATETIME >= since and column == value (or isin, for lists)
+    for each `where` item. Returns (expression or None, satisfiable). A filter on a column the file
+    does not have can never match, so the file can be skipped.
+    """
+    conditions = []
+    if since is not None:
+        if "HISTORYDATETIME" not in schema.names:
+            return None, False
+        field_type = schema.field("HISTORYDATETIME").type
+        conditions.append(ds.field("HISTORYDATETIME") >= pa.scalar(pd.Timestamp(since).to_pydatetime(), type=field_type))
+    for column, value in (where or {}).items():
+        if column not in schema.names:
+            return None, False
+        values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+        conditions.append(ds.field(column).isin(values) if len(values) > 1 else ds.field(column) == values[0])
+    if not conditions:
+        return None, True
+    expression = conditions[0]
+    for condition in conditions[1:]:
+        expression = expression & condition
+    return expression, True
+
+
+class PartitionedEventStore:
+    """
+    Append-only DMS history store, partitioned by month of HISTORYDATETIME.
+
+    Ingest writes one small Parquet file per month present in the batch and registers it in a
+    manifest; readers use the manifest to download only the files overlapping their window.
+    The manifest is updated with ETag-conditional writes so concurrent ingests never lose files.
+
+    `normalize`, when given, is applied to every batch before it is written (ingest, compaction and
+    legacy migration), so files are stored in their final typed form.
+
+    `cache`, an optional BlobCache, serves reads from memory: data files never change once written,
+    so they are cached by path; the manifest and the index are revalidated by ETag. Write paths
+    always go to blob storage.
+    """
+
+    def __init__(self, container_client, prefix=HISTORY_PREFIX, legacy_blob_path=LEGACY_PARQUET_BLOB_PATH, normalize=None, cache=None):
+        self.container_client = container_client
+        self.normalize = normalize
+        self.cache = cache
+        self.prefix = prefix
+        self.manifest_path = f"{prefix}{MANIFEST_NAME}"
+        self.legacy_blob_path = legacy_blob_path
+
+    # --- Manifest ---
+
+    def load_manifest(self):
+        """Returns (manifest, etag). A missing manifest is returned as None with etag None."""
+        blob_client = self.container_client.get_blob_client(self.manifest_path)
+        try:
+            downloader = blob_client.download_blob()
+            return json.loads(downloader.readall()), downloader.properties.etag
+        except ResourceNotFoundError:
+            return None, None
+
+    def _read_manifest(self):
+        """load_manifest for read paths: served from the cache when there is one. Do not modify the result."""
+        if self.cache is None:
+            return self.load_manifest()
+        try:
+            return self.cache.fetch(self.container_client.get_blob_client(self.manifest_path), json.loads)
+        except ResourceNotFoundError:
+            return None, None
+
+    def _current_manifest(self):
+        """Manifest for readers, importing the legacy blob first if the store is still empty."""
+        manifest, etag = self._read_manifest()
+        if manifest is None:
+            self.migrate_legacy()
+            manifest, etag = self._read_manifest()
+        return manifest, etag
+
+    def _save_manifest(self, manifest, etag):
+        """Writes the manifest only if nobody changed it since `etag` was read (create-only when etag is None)."""
+        manifest["updated_at"] = datetime.now(timezone.utc).isoformat()
+        blob_client = self.container_client.get_blob_client(self.manifest_path)
+        payload = json.dumps(manifest, indent=2)
+        if etag is None:
+            blob_client.upload_blob(payload, overwrite=False)
+        else:
+            blob_client.upload_blob(payload, overwrite=True, etag=etag, match_condition=MatchConditions.IfNotModified)
+        if self.cache is not None:
+            self.cache.discard(self.manifest_path)
+
+    def _update_manifest(self, mutate):
+        """
+        Applies `mutate(manifest)` and saves it, re-reading and retrying when another writer got there first.
+        `mutate` returns False to abandon the update.
+        """
+        for attempt in range(MANIFEST_RETRIES):
+            manifest, etag = self.load_manifest()
+            if manifest is None:
+                manifest = {"version": 1, "partitions": {}}
+            if mutate(manifest) is False:
+                return False
+            try:
+                self._save_manifest(manifest, etag)
+                return True
+            except (ResourceModifiedError, ResourceExistsError):
+                logging.warning(f"Manifest changed concurrently, retrying ({attempt + 1}/{MANIFEST_RETRIES}).")
+        raise RuntimeError("Could not update the history manifest after several attempts.")
+
+    # --- Writing ---
+
+    def _write_partition_files(self, df):
+        """
+        Uploads one Parquet file per month partition present in `df`, clustered by (DECLARATIONID,
+        HISTORYDATETIME). Returns their manifest entries and the matching declaration index rows.
+        """
+        if self.normalize is not None:
+            df = self.normalize(df)
+        timestamps = parse_history_datetime(df["HISTORYDATETIME"]) if "HISTORYDATETIME" in df.columns else pd.Series(pd.NaT, index=df.index)
+        keys = partition_keys(timestamps)
+        batch_id = f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+        entries, index_rows = [], []
+        for key, part_df in df.groupby(keys, sort=True):
+            part_times = timestamps.loc[part_df.index]
+            path = f"{self.prefix}month={key}/part-{batch_id}.parquet"
+            entry = {"path": path}
+            sorting = None
+            if "DECLARATIONID" in part_df.columns:
+                order = cluster_order(part_df["DECLARATIONID"], part_times)
+                if order is not None:
+                    part_df, part_times = part_df.iloc[order], part_times.iloc[order]
+                index_rows.append(declaration_ranges(path, part_df["DECLARATIONID"]))
+                if "HISTORYDATETIME" in part_df.columns:
+                    entry["order"] = CLUSTER_ORDER
+                    sorting = [pq.SortingColumn(part_df.columns.get_loc(c)) for c in CLUSTER_ORDER]
+            buffer = io.BytesIO()
+            part_df.to_parquet(buffer, index=False, row_group_size=ROW_GROUP_SIZE, sorting_columns=sorting)
+            self.container_client.get_blob_client(path).upload_blob(buffer.getvalue(), overwrite=False)
+            entries.append((key, {
+                **entry,
+                "rows": int(len(part_df)),
+                "bytes": buffer.getbuffer().nbytes,
+                "min": part_times.min().isoformat() if part_times.notna().any() else None,
+                "max": part_times.max().isoformat() if part_times.notna().any() else None,
+            }))
+        return entries, index_rows
+
+    def _delete_files(self, paths):
+        for path in paths:
+            try:
+                self.container_client.get_blob_client(path).delete_blob()
+            except ResourceNotFoundError:
+                pass
+
+    def append(self, new_df):
+        """Stores a batch of new history rows as delta files. Returns the number of rows written."""
+        if new_df.empty:
+            return 0
+        self.migrate_legacy()
+
+        entries, index_rows = self._write_partition_files(new_df)
+
+        def register(manifest):
+            for key, entry in entries:
+                manifest["partitions"].setdefault(key, {"files": []})["files"].append(entry)
+
+        try:
+            self._update_manifest(register)
+        except Exception:
+            # Unregistered files are invisible to readers; remove them so they don't linger
+            self._delete_files([entry["path"] for _, entry in entries])
+            raise
+
+        logging.info(f"Appended {len(new_df)} rows to {len(entries)} history partition(s).")
+        self._index_files(index_rows)
+
+        manifest, _ = self.load_manifest()
+        for key in {key for key, _ in entries}:
+            if len(manifest["partitions"].get(key, {}).get("files", [])) > MAX_FILES_PER_PARTITION:
+                self.compact(key)
+        return len(new_df)
+
+    def compact(self, key):
+        """Rewrites all delta files of one partition as a single file."""
+        manifest, _ = self.load_manifest()
+        old_entries = (manifest or {}).get("partitions", {}).get(key, {}).get("files", [])
+        if len(old_entries) < 2:
+            return False
+
+        merged = concat_frames(self._download_frames([e["path"] for e in old_entries]))
+        new_entries, index_rows = self._write_partition_files(merged)
+        old_paths = {e["path"] for e in old_entries}
+
+        def swap(manifest):
+            current = manifest["partitions"].get(key, {}).get("files", [])
+            if not old_paths.issubset({e["path"] for e in current}):
+                return False  # Another compaction already ran
+            kept = [e for e in current if e["path"] not in old_paths]  # Files appended while we were merging
+            manifest["partitions"][key] = {"files": kept + [entry for _, entry in new_entries]}
+
+        if self._update_manifest(swap):
+            self._delete_files(old_paths)
+            self._index_files(index_rows)
+            logging.info(f"Compacted partition {key}: {len(old_entries)} files -> 1.")
+            return True
+        self._delete_files([entry["path"] for _, entry in new_entries])
+        return False
+
+    def migrate_legacy(self):
+        """One-time import of the old single-blob history into the partitioned layout. The legacy blob is kept."""
+        manifest, _ = self.load_manifest()
+        if manifest is not None:
+            return False
+
+        legacy_client = self.container_client.get_blob_client(self.legacy_blob_path)
+        if not legacy_client.exists():
+            return False
+
+        logging.info(f"Migrating {self.legacy_blob_path} into partitioned history store.")
+        legacy_df = pd.read_parquet(io.BytesIO(legacy_client.download_blob().readall()))
+        entries, index_rows = self._write_partition_files(legacy_df) if not legacy_df.empty else ([], [])
+        manifest = {"version": 1, "partitions": {}, "migrated_from": self.legacy_blob_path}
+        for key, entry in entries:
+            manifest["partitions"].setdefault(key, {"files": []})["files"].append(entry)
+        try:
+            self._save_manifest(manifest, None)
+        except ResourceExistsError:
+            # Another worker finished the migration first
+            self._delete_files([entry["path"] for _, entry in entries])
+            return False
+        self._index_files(index_rows)
+        return True
+
+    # --- Declaration index ---
+
+    @property
+    def index_path(self):
+        return f"{self.prefix}{INDEX_NAME}"
+
+    def _load_index_blob(self, cached=False):
+        """Returns (index, etag); a missing index is an empty frame with etag None."""
+        blob_client = self.container_client.get_blob_client(self.index_path)
+        try:
+            if cached and self.cache is not None:
+                return self.cache.fetch(blob_client, lambda data: pd.read_parquet(io.BytesIO(data)))
+            downloader = blob_client.download_blob()
+            return pd.read_parquet(io.BytesIO(downloader.readall())), downloader.properties.etag
+        except ResourceNotFoundError:
+            return pd.DataFrame(columns=INDEX_COLUMNS), None
+
+    def _index_files(self, index_rows):
+        """
+        Adds the index rows of newly written files and drops those of files no longer in the manifest.
+        Best effort: lookups index any file the index is missing, so a failed update only costs speed.
+        """
+        index_rows = [rows for rows in index_rows if not rows.empty]
+        if not index_rows:
+            return
+        try:
+            for attempt in range(MANIFEST_RETRIES):
+                manifest, _ = self.load_manifest()
+                live = {e["path"] for part in (manifest or {}).get("partitions", {}).values() for e in part["files"]}
+                index, etag = self._load_index_blob()
+                merged = pd.concat([index[index["path"].isin(live)]] + [rows[rows["path"].isin(live)] for rows in index_rows], ignore_index=True)
+                try:
+                    self._save_index(merged, etag)
+                    return
+                except (ResourceModifiedError, ResourceExistsError):
+                    logging.warning(f"Declaration index changed concurrently, retrying ({attempt + 1}/{MANIFEST_RETRIES}).")
+        except Exception as e:
+            logging.warning(f"Could not update the declaration index: {e}")
+
+    def _save_index(self, index, etag):
+        index = index.astype({"DECLARATIONID": "int64", "path": "category", "start": "int64", "rows": "int64"})
+        buffer = io.BytesIO()
+        index.sort_values(["DECLARATIONID", "path", "start"], kind="mergesort").to_parquet(buffer, index=False)
+        blob_client = self.container_client.get_blob_client(self.index_path)
+        if etag is None:
+            blob_client.upload_blob(buffer.getvalue(), overwrite=False)
+        else:
+            blob_client.upload_blob(buffer.getvalue(), overwrite=True, etag=etag, match_condition=MatchConditions.IfNotModified)
+        if self.cache is not None:
+            self.cache.discard(self.index_path)
+
+    def load_index(self):
+        """
+        The declaration index, restricted to files currently in the manifest. Files the index does not
+        cover yet (legacy migration, failed updates) are indexed from their DECLARATIONID column and saved.
+        """
+        manifest, _ = self._current_manifest()
+        if not manifest:
+            return pd.DataFrame(columns=INDEX_COLUMNS)
+
+        live = [e["path"] for part in manifest["partitions"].values() for e in part["files"]]
+        index, etag = self._load_index_blob(cached=True)
+        index = index[index["path"].isin(live)]
+        missing = sorted(set(live) - set(map(str, index["path"].unique())))
+        if missing:
+            frames = self._download_frames(missing, columns=["DECLARATIONID"])
+            fresh = [declaration_ranges(path, frame["DECLARATIONID"]) for path, frame in zip(missing, frames) if "DECLARATIONID" in frame.columns]
+            index = pd.concat([index] + fresh, ignore_index=True)
+            try:
+                self._save_index(index, etag)
+                logging.info(f"Indexed {len(missing)} history file(s).")
+            except (ResourceModifiedError, ResourceExistsError):
+                pass  # Someone else updated it; ours is still valid for this lookup
+        return index
+
+    def _download_ranges(self, path, ranges, columns=None, size=None):
+        """Reads the (start, rows) ranges of one file, downloading only the row groups that contain them."""
+        return self._read_ranges(pq.ParquetFile(self._open(path, size), pre_buffer=True), ranges, columns).to_pandas()
+
+    @staticmethod
+    def _read_ranges(parquet_file, ranges, columns=None):
+        """Arrow table of the (start, rows) ranges of an open Parquet file, reading only the row groups that contain them."""
+        if columns is not None:
+            columns = [c for c in columns if c in parquet_file.schema_arrow.names]
+
+        group_starts = np.cumsum([0] + [parquet_file.metadata.row_group(g).num_rows for g in range(parquet_file.num_row_groups)])
+        wanted = sorted({
+            g for start, rows in ranges
+            for g in range(np.searchsorted(group_starts, start, "right") - 1, np.searchsorted(group_starts, start + rows - 1, "right"))
+        })
+        table = parquet_file.read_row_groups(wanted, columns=columns)
+        # Position of each wanted group inside `table`
+        offsets = dict(zip(wanted, np.cumsum([0] + [group_starts[g + 1] - group_starts[g] for g in wanted])))
+        slices = []
+        for start, rows in ranges:
+            first_group = np.searchsorted(group_starts, start, "right") - 1
+            slices.append(table.slice(offsets[first_group] + start - group_starts[first_group], rows))
+        return pa.concat_tables(slices)
+
+    def version(self):
+        """ETag of the current manifest: changes whenever rows are appended, so it can key derived results."""
+        return self._current_manifest()[1]
+
+    def lookup(self, declaration_id, columns=None, index=None):
+        """All history rows of one declaration, reading only the files and row groups the index points to."""
+        if self.cache is not None:
+            # Any new row for this declaration comes with a new manifest version
+            _, version = self._current_manifest()
+            key = ("lookup", self.prefix, int(declaration_id), tuple(columns) if columns else None)
+            return self.cache.memoize(key, version, lambda: self._lookup(declaration_id, columns, index))
+        return self._lookup(declaration_id, columns, index)
+
+    def _lookup(self, declaration_id, columns=None, index=None):
+        index = self.load_index() if index is None else index
+        hits = index[index["DECLARATIONID"] == int(declaration_id)]
+        if hits.empty:
+            return pd.DataFrame()
+        manifest, _ = self._current_manifest()
+        sizes = self._file_sizes(manifest)
+        by_file = [(str(path), list(zip(group["start"], group["rows"]))) for path, group in hits.groupby("path", observed=True, sort=True)]
+        with ThreadPoolExecutor(max_workers=min(DOWNLOAD_WORKERS, len(by_file))) as pool:
+            frames = [f for f in pool.map(lambda item: self._download_ranges(item[0], item[1], columns, sizes.get(item[0])), by_file) if not f.empty]
+        return cluster_frame(concat_frames(frames)) if frames else pd.DataFrame()
+
+    def declaration_ids(self, index=None):
+        """Sorted array of every DECLARATIONID in the store (the prefix index used for suggestions)."""
+        index = self.load_index() if index is None else index
+        return np.unique(index["DECLARATIONID"].to_numpy("int64"))
+
+    def declaration_months(self, declaration_ids, index=None):
+        """Sorted partition keys (months) holding rows of any of `declaration_ids`, according to the declaration index."""
+        index = self.load_index() if index is None else index
+        ids = np.asarray(pd.Series(declaration_ids).dropna(), dtype="int64")
+        paths = set(map(str, index.loc[index["DECLARATIONID"].isin(ids), "path"].unique()))
+        manifest, _ = self._current_manifest()
+        keys = {e["path"]: key for key, part in (manifest or {}).get("partitions", {}).items() for e in part["files"]}
+        return sorted({keys[p] for p in paths if p in keys} - {UNDATED_PARTITION})
+
+    # --- Reading ---
+
+    def files_for_window(self, manifest, since=None):
+        """Manifest entries whose time range overlaps [since, now]. Undated rows are only returned for full reads."""
+        selected = []
+        for key in sorted(manifest.get("partitions", {})):
+            for entry in manifest["partitions"][key]["files"]:
+                if since is None:
+                    selected.append(entry)
+                elif key != UNDATED_PARTITION and entry["max"] and pd.Timestamp(entry["max"]) >= since:
+                    selected.append(entry)
+        return selected
+
+    @staticmethod
+    def _file_sizes(manifest):
+        """Byte size of each data file, as recorded at write time (older entries have none)."""
+        return {e["path"]: e["bytes"] for part in (manifest or {}).get("partitions", {}).values() for e in part["files"] if e.get("bytes")}
+
+    def _open(self, path, size=None):
+        return pa.PythonFile(BlobRangeFile(self.container_client.get_blob_client(path), size), mode="r")
+
+    def _download_frame(self, path, columns=None, since=None, where=None, size=None):
+        if self.cache is not None:
+            # Data files are written once (create-only) and never modified, so the path is the version
+            where_key = tuple(sorted((k, tuple(v) if isinstance(v, (list, tuple, set)) else v) for k, v in (where or {}).items()))
+            key = ("file", path, tuple(columns) if columns else None, since, where_key)
+            return self.cache.get_or_load(key, lambda: self._fetch_frame(path, columns, since, where, size))
+        return self._fetch_frame(path, columns, since, where, size)
+
+    def _fetch_frame(self, path, columns=None, since=None, where=None, size=None):
+        """
+        Reads one data file through ranged requests. Filters are pushed down to the Parquet reader,
+        which skips row groups whose statistics rule them out and never downloads their column chunks.
+        """
+        fragment = ds.ParquetFileFormat().make_fragment(self._open(path, size))
+        schema = fragment.physical_schema
+        expression, satisfiable = row_filter(schema, since, where)
+        if not satisfiable:
+            return pd.DataFrame()
+        if columns is not None:
+            columns = [c for c in columns if c in schema.names]
+        return fragment.to_table(columns=columns, filter=expression).to_pandas()
+
+    def _download_frames(self, paths, columns=None, since=None, where=None, sizes=None):
+        if not paths:
+            return []
+        sizes = sizes or {}
+        with ThreadPoolExecutor(max_workers=min(DOWNLOAD_WORKERS, len(paths))) as pool:
+            return list(pool.map(lambda path: self._download_frame(path, columns, since, where, sizes.get(path)), paths))
+
+    def declaration_chunks(self, chunk_rows=CHUNK_ROWS, index=None):
+        """
+        Splits the declarations into consecutive DECLARATIONID ranges [(first, last)] of about
+        `chunk_rows` history rows each, using the row counts of the declaration index.
+        """
+        index = self.load_index() if index is None else index
+        if index.empty:
+            return []
+        totals = index.groupby("DECLARATIONID", sort=True)["rows"].sum()
+        chunk_of = (totals.cumsum().to_numpy() - 1) // max(int(chunk_rows), 1)
+        ids = totals.index.to_numpy("int64")
+        starts = np.flatnonzero(np.r_[True, chunk_of[1:] != chunk_of[:-1]])
+        ends = np.r_[starts[1:], len(ids)] - 1
+        return [(int(ids[a]), int(ids[b])) for a, b in zip(starts, ends)]
+
+    def iter_declaration_chunks(self, columns=None, where=None, chunk_rows=CHUNK_ROWS):
+        """
+        Streams the history one DECLARATIONID range at a time: each frame holds every row (matching
+        `where`) of its declarations and nothing else, in CLUSTER_ORDER, so per-declaration work done on
+        a chunk is final and only one chunk is in memory at once. Rows without a DECLARATIONID are not
+        returned.
+
+        Files are clustered by DECLARATIONID, so a range is one contiguous slice of each file and only
+        the row groups covering it are downloaded.
+        """
+        manifest, _ = self._current_manifest()
+        if not manifest:
+            return
+        index = self.load_index()
+        order = {e["path"]: i for i, e in enumerate(self.files_for_window(manifest))}
+        sizes = self._file_sizes(manifest)
+        read_columns = None if columns is None else list(dict.fromkeys(list(columns) + ["DECLARATIONID"] + list(where or {})))
+
+        # Files stay open across chunks so their footers are only downloaded once
+        files = {}
+
+        def read_span(path, start, rows):
+            if path not in files:
+                files[path] = pq.ParquetFile(self._open(path, sizes.get(path)), pre_buffer=True)
+            return self._read_ranges(files[path], [(start, rows)], read_columns)
+
+        for first, last in self.declaration_chunks(chunk_rows, index):
+            hits = index[(index["DECLARATIONID"] >= first) & (index["DECLARATIONID"] <= last)]
+            spans = hits.assign(end=hits["start"] + hits["rows"]).groupby("path", observed=True).agg(start=("start", "min"), end=("end", "max"))
+            spans = spans.set_axis(spans.index.astype(str)).loc[sorted(spans.index.astype(str), key=lambda p: order.get(p, len(order)))]
+
+            with ThreadPoolExecutor(max_workers=min(DOWNLOAD_WORKERS, len(spans))) as pool:
+                tables = list(pool.map(lambda item: read_span(item[0], int(item[1]), int(item[2] - item[1])), spans.itertuples()))
+            # Concatenated as Arrow and converted once: the dictionary columns of all files are unified in one pass
+            table = pa.concat_tables(tables, promote_options="permissive")
+            expression, satisfiable = row_filter(table.schema, where=where)
+            if not satisfiable:
+                continue
+            if expression is not None:
+                table = table.filter(expression)
+            chunk = table.to_pandas()
+            if chunk.empty:
+                continue
+            # A span can include rows of neighbouring declarations when a file is not fully clustered
+            ids = pd.to_numeric(chunk["DECLARATIONID"], errors="coerce")
+            chunk = cluster_frame(chunk[(ids >= first) & (ids <= last)])
+            if columns is not None:
+                chunk = chunk[[c for c in columns if c in chunk.columns]]
+            if not chunk.empty:
+                yield chunk.reset_index(drop=True)
+
+    def read(self, columns=None, since=None, where=None):
+        """
+        Loads the history rows with HISTORYDATETIME >= `since` (all history if None) that match `where`,
+        a {column: value or list of values} equality filter. Files outside the window are never opened;
+        inside them, only the row groups that can match are downloaded.
+        """
+        manifest, _ = self._current_manifest()
+        if not manifest:
+            return pd.DataFrame()
+
+        since = pd.Timestamp(since) if since is not None else None
+        entries = self.files_for_window(manifest, since)
+        frames = self._download_frames([e["path"] for e in entries], columns, since, where, self._file_sizes(manifest))
+        frames = [frame for frame in frames if not frame.empty]
+        if not frames:
+            return pd.DataFrame()
+        logging.info(f"Loaded {sum(len(f) for f in frames)} history rows from {len(frames)} file(s).")
+        return concat_frames(frames)
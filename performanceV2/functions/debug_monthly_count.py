@@ -1,6 +1,8 @@
 from datetime import datetime
 import pandas as pd
 from performanceV2.common import MANUAL_STATUSES
+from performanceV2.event_store import cluster_frame
+from performanceV2.preprocessing import normalize_history, prepare_report_frame
 
 def debug_count_files_by_month(df_all, username: str, month: int, year: int):
     """
@@ -18,14 +20,7 @@ def debug_count_files_by_month(df_all, username: str, month: int, year: int):
     """
     
     # Clean data
-    df = df_all.copy()
-    for col in ["USERCODE", "HISTORY_STATUS"]:
-        if col in df.columns:
-            df[col] = df[col].astype(str).str.strip().str.upper()
-    
-    df["HISTORYDATETIME"] = pd.to_datetime(df["HISTORYDATETIME"], errors="coerce", format="mixed")
-    df = df.dropna(subset=["HISTORYDATETIME"])
-    df["HISTORYDATETIME"] = df["HISTORYDATETIME"].dt.tz_localize(None)
+    df = prepare_report_frame(df_all, exclude_companies=False)
     
     username = username.upper()
     
@@ -57,22 +52,22 @@ def debug_count_files_by_month(df_all, username: str, month: int, year: int):
     unique_manual_files = manual_creates["DECLARATIONID"].unique().tolist()
     
     # Also check for any files where the user's FIRST action globally was in this month
+    # (rows in cluster order: a file's first action is the first row of its DECLARATIONID run)
     all_user_files = df[df["USERCODE"] == username]
-    grouped = all_user_files.groupby("DECLARATIONID")
-    
-    files_first_created_this_month = []
-    for decl_id, group in grouped:
-        first_action = group.sort_values("HISTORYDATETIME").iloc[0]
-        if start_date <= first_action["HISTORYDATETIME"] < end_date:
-            if first_action["HISTORY_STATUS"] in MANUAL_STATUSES:
-                files_first_created_this_month.append({
-                    "id": decl_id,
-                    "first_action_date": first_action["HISTORYDATETIME"].isoformat(),
-                    "status": first_action["HISTORY_STATUS"]
-                })
+    first_actions = cluster_frame(all_user_files.dropna(subset=["DECLARATIONID"])).drop_duplicates("DECLARATIONID")
+    first_actions = first_actions[
+        (first_actions["HISTORYDATETIME"] >= start_date) & (first_actions["HISTORYDATETIME"] < end_date)
+        & first_actions["HISTORY_STATUS"].isin(MANUAL_STATUSES)
+    ]
+    
+    files_first_created_this_month = [
+        {"id": decl_id, "first_action_date": first_at.isoformat(), "status": status}
+        for decl_id, first_at, status in zip(first_actions["DECLARATIONID"].tolist(), first_actions["HISTORYDATETIME"], first_actions["HISTORY_STATUS"].astype(object))
+    ]
     
     # Status breakdown for this month
-    status_counts = user_actions["HISTORY_STATUS"].value_counts().to_dict()
+    status_counts = user_actions["HISTORY_STATUS"].value_counts()
+    status_counts = status_counts[status_counts > 0].to_dict()
     
     # Count total unique files touched
     total_files_touched = user_actions["DECLARATIONID"].nunique()
@@ -95,10 +90,7 @@ def debug_total_files_for_user(df_all, username: str):
     """
     Count ALL files ever created by a user (no date filter).
     """
-    df = df_all.copy()
-    for col in ["USERCODE", "HISTORY_STATUS"]:
-        if col in df.columns:
-            df[col] = df[col].astype(str).str.strip().str.upper()
+    df = normalize_history(df_all)
     
     username = username.upper()
     
@@ -116,14 +108,11 @@ def debug_total_files_for_user(df_all, username: str):
     manual_creates = user_actions[user_actions["HISTORY_STATUS"].isin(MANUAL_STATUSES)]
     unique_manual_files = manual_creates["DECLARATIONID"].unique()
     
-    # Find files where user's FIRST action was manual
-    grouped = user_actions.groupby("DECLARATIONID")
-    files_created_by_user = []
+    status_counts = user_actions["HISTORY_STATUS"].value_counts()
     
-    for decl_id, group in grouped:
-        first_action = group.sort_values("HISTORYDATETIME").iloc[0]
-        if first_action["HISTORY_STATUS"] in MANUAL_STATUSES:
-            files_created_by_user.append(decl_id)
+    # Find files where user's FIRST action was manual (the first row of each DECLARATIONID run in cluster order)
+    first_actions = cluster_frame(user_actions.dropna(subset=["DECLARATIONID"])).drop_duplicates("DECLARATIONID")
+    files_created_by_user = first_actions.loc[first_actions["HISTORY_STATUS"].isin(MANUAL_STATUSES), "DECLARATIONID"].tolist()
     
     return {
         "user": username,
@@ -131,7 +120,7 @@ def debug_total_files_for_user(df_all, username: str):
         "total_files_touched": user_actions["DECLARATIONID"].nunique(),
         "files_with_manual_status": len(unique_manual_files),
         "files_first_created_by_user": len(files_created_by_user),
-        "status_breakdown": user_actions["HISTORY_STATUS"].value_counts().to_dict(),
+        "status_breakdown": status_counts[status_counts > 0].to_dict(),
         "unique_declaration_ids": sorted(user_actions["DECLARATIONID"].unique().tolist())[:50]  # First 50
     }
 
@@ -1,6 +1,62 @@
 from datetime import datetime
+import logging
+import numpy as np
 import pandas as pd
 
+SIMILAR_IDS_LIMIT = 5
+
+def _clean_declaration_id(declaration_id):
+    """Search term as a string, without any trailing .0"""
+    try:
+        return str(int(float(declaration_id))).strip()
+    except (ValueError, TypeError):
+        return str(declaration_id).strip()
+
+def similar_declaration_ids(sorted_ids, declaration_id, limit=SIMILAR_IDS_LIMIT):
+    """
+    IDs sharing the first 3 digits of `declaration_id`, closest first.
+    `sorted_ids` is the sorted integer ID array; every ID starting with a prefix p lies in one of the
+    ranges [p * 10^k, (p + 1) * 10^k), so each range is two binary searches instead of a string scan.
+    """
+    prefix = declaration_id[:3]
+    if not prefix.isdigit() or len(sorted_ids) == 0:
+        return []
+    p = int(prefix)
+    candidates = []
+    for k in range(len(str(int(sorted_ids[-1]))) - len(prefix) + 1):
+        lo, hi = np.searchsorted(sorted_ids, [p * 10 ** k, (p + 1) * 10 ** k])
+        candidates.append(sorted_ids[lo:hi])
+    candidates = np.concatenate(candidates)
+    if len(candidates) == 0:
+        return []
+    target = int(declaration_id) if declaration_id.isdigit() else p
+    closest = candidates[np.argsort(np.abs(candidates - target), kind="mergesort")[:limit]]
+    return [str(i) for i in closest]
+
+def get_file_lifecycle_from_store(history_store, declaration_id: str, columns=None):
+    """
+    Lifecycle of one declaration read through the store's declaration index:
+    only the row ranges of that declaration are downloaded and decoded.
+    """
+    declaration_id = _clean_declaration_id(declaration_id)
+    logging.info(f"🔎 Index lookup for declaration_id: '{declaration_id}'")
+
+    index = history_store.load_index()
+    file_data = history_store.lookup(declaration_id, columns=columns, index=index) if declaration_id.isdigit() else pd.DataFrame()
+    logging.info(f"✅ Found {len(file_data)} rows for ID '{declaration_id}'")
+
+    if file_data.empty:
+        all_ids = history_store.declaration_ids(index)
+        return {
+            "found": False,
+            "declaration_id": declaration_id,
+            "message": "No data found for this declaration ID",
+            "similar_ids": similar_declaration_ids(all_ids, declaration_id),
+            "total_ids_in_system": int(len(all_ids))
+        }
+
+    return _build_lifecycle(file_data, declaration_id)
+
 def get_file_lifecycle(df_all, declaration_id: str):
     """
     Get complete lifecycle data for a specific declaration ID.
@@ -12,14 +68,8 @@ def get_file_lifecycle(df_all, declaration_id: str):
     Returns:
         Dictionary with lifecycle information
     """
-    import logging
-    
-    # Convert DECLARATIONID to string for consistent comparison
-    df_all = df_all.copy()
-    
     logging.info(f"🔍 Searching for declaration_id: '{declaration_id}'")
     logging.info(f"📊 DataFrame shape: {df_all.shape}")
-    logging.info(f"📋 DataFrame columns: {list(df_all.columns)}")
     
     # Check if DECLARATIONID column exists
     if 'DECLARATIONID' not in df_all.columns:
@@ -31,43 +81,33 @@ def get_file_lifecycle(df_all, declaration_id: str):
             "available_columns": list(df_all.columns)
         }
     
-    # Show sample of IDs
-    sample_ids = df_all["DECLARATIONID"].head(10).tolist()
-    logging.info(f"📝 Sample IDs from data: {sample_ids}")
-    logging.info(f"🔢 ID data type in DataFrame: {df_all['DECLARATIONID'].dtype}")
+    declaration_id = _clean_declaration_id(declaration_id)
     
-    # Convert to int first (to remove .0), then to string
-    df_all["DECLARATIONID"] = df_all["DECLARATIONID"].fillna(0).astype(int).astype(str)
-    
-    # Also ensure search term is string (and remove any .0 if present)
-    try:
-        declaration_id = str(int(float(declaration_id))).strip()
-    except (ValueError, TypeError):
-        declaration_id = str(declaration_id).strip()
-    
-    logging.info(f"🔎 After conversion - searching for: '{declaration_id}'")
-    logging.info(f"📊 Total unique IDs in data: {df_all['DECLARATIONID'].nunique()}")
-    
-    # Filter to only this declaration
-    file_data = df_all[df_all["DECLARATIONID"] == declaration_id].copy()
+    # Compare numerically instead of casting every ID to a string
+    ids = pd.to_numeric(df_all["DECLARATIONID"], errors="coerce")
+    file_data = df_all[ids == int(declaration_id)] if declaration_id.isdigit() else df_all.iloc[0:0]
     
     logging.info(f"✅ Found {len(file_data)} rows for ID '{declaration_id}'")
     
     if file_data.empty:
-        # Check if similar IDs exist
-        similar = df_all[df_all["DECLARATIONID"].str.contains(declaration_id[:3], na=False)].head(5)
-        similar_ids = similar["DECLARATIONID"].tolist() if not similar.empty else []
-        
+        all_ids = np.unique(ids.dropna().round().astype("int64").to_numpy())
         return {
             "found": False,
             "declaration_id": declaration_id,
             "message": "No data found for this declaration ID",
-            "similar_ids": similar_ids,
-            "total_ids_in_system": int(df_all["DECLARATIONID"].nunique())
+            "similar_ids": similar_declaration_ids(all_ids, declaration_id),
+            "total_ids_in_system": int(len(all_ids))
         }
     
+    return _build_lifecycle(file_data, declaration_id)
+
+def _build_lifecycle(file_data, declaration_id):
+    """Lifecycle document from the history rows of one declaration."""
+    # Plain values for the few rows of one file (the store keeps code columns categorical)
+    file_data = file_data.astype({col: object for col in file_data.select_dtypes("category").columns})
+
     # Sort by time to get chronological order
-    file_data = file_data.sort_values("HISTORYDATETIME")
+    file_data = file_data.sort_values("HISTORYDATETIME", kind="mergesort")
     
     # Build timeline
     timeline = []
@@ -1,94 +1,107 @@
 #-----------------------------------------------------------------------------
-from collections import defaultdict, Counter
-from datetime import datetime, timedelta
+from datetime import datetime
 import pandas as pd
-from performanceV2.common import IMPORT_USERS, EXPORT_USERS, TARGET_USERS, classify_file_activity, SENDING_STATUSES
+from performanceV2.common import IMPORT_USERS, EXPORT_USERS, TARGET_USERS, classify_user_declarations, window_start
+from performanceV2.declaration_summary import as_summary, classify_activity
+from performanceV2.working_days import DEFAULT_CALENDAR
 
-def count_user_file_creations_last_10_days(df_all):
-    # Use consolidated lists from common
-    df = df_all.copy()
-    users = TARGET_USERS
+# The report functions accept either a raw history DataFrame or a DeclarationSummary
+# (what the endpoints load); raw frames are summarised on the fly. Working days come from a
+# WorkingDayCalendar (Monday to Friday without holidays unless one is passed in).
+
+BATCHPROC_IMPORT_TYPES = ['IDMS_IMPORT', 'DMS_IMPORT']
+
+def _weighted_counts(activity, key):
+    """Number of actions per value of `key` (a column or Series), largest first."""
+    counts = activity.groupby(key, observed=True)["actions"].sum()
+    return counts[counts > 0].sort_values(ascending=False, kind="mergesort").to_dict()
+
+def _session_durations(user_rows):
+    """
+    Hours between a MODIFIED and the following WRT_ENT, per (user, declaration).
+    A session opens on the first MODIFIED of a run and closes on the next WRT_ENT, so collapsing
+    consecutive identical statuses into runs leaves MODIFIED/WRT_ENT pairs next to each other.
+    `user_rows` must be sorted by HISTORYDATETIME within each declaration.
+    """
+    keys = ["USERCODE", "DECLARATIONID"]
+    mw = user_rows[user_rows["HISTORY_STATUS"].isin(["MODIFIED", "WRT_ENT"])]
+    runs = mw[mw["HISTORY_STATUS"] != mw.groupby(keys, sort=False, observed=True)["HISTORY_STATUS"].shift()]
+
+    next_time = runs.groupby(keys, sort=False, observed=True)["HISTORYDATETIME"].shift(-1)
+    closed = (runs["HISTORY_STATUS"] == "MODIFIED") & next_time.notna()
+    hours = (next_time - runs["HISTORYDATETIME"])[closed].dt.total_seconds() / 3600
+    return pd.DataFrame({
+        "USERCODE": runs.loc[closed, "USERCODE"],
+        "DECLARATIONID": runs.loc[closed, "DECLARATIONID"],
+        "duration": hours
+    })
 
+def _user_declaration_facts(activity, classes, usernames):
+    """
+    One row per (user, declaration) touched by `usernames`: first action, manual/automatic credit,
+    sending and modification counts.
+    """
+    user_activity = activity[activity["USERCODE"].isin(usernames)]
+    pairs = user_activity.groupby(["USERCODE", "DECLARATIONID"], observed=True).agg(
+        first_action=("first_at", "min"),
+        user_manual=("manual_actions", "any"),
+        sending_count=("sending_count", "sum"),
+        modification_count=("modification_count", "sum"),
+    )
+    facts = classify_user_declarations(classes, pairs)
+    facts["date"] = facts["first_action"].dt.date
+    return facts, user_activity
+
+def _report_users(users):
+    """Team members a team report covers: all of TARGET_USERS, or those of them in `users`."""
+    if users is None:
+        return TARGET_USERS
+    wanted = set(users)
+    return [u for u in TARGET_USERS if u in wanted]
+
+def _touched_declarations(recent_df, username, team_name):
+    """Declarations `username` acted on in `recent_df`; BATCHPROC is split by declaration type per team."""
+    if username == 'BATCHPROC':
+        is_import = recent_df['TYPEDECLARATIONSSW'].isin(BATCHPROC_IMPORT_TYPES)
+        recent_df = recent_df[is_import] if team_name == 'import' else recent_df[~is_import]
+    return recent_df[recent_df["USERCODE"] == username]["DECLARATIONID"].unique()
+
+def count_user_file_creations_last_10_days(df_all, calendar=None, users=None):
+    # Use consolidated lists from common
+    # `users` restricts the report to some of the team members (a parallel worker's share)
     # --- CHANGE 1: "INTERFACE" is no longer considered a manual status (Handled in common) ---
+    activity = as_summary(df_all).report_activity()
+    calendar = calendar or DEFAULT_CALENDAR
 
-    # Clean columns like in calculate_single_user_metrics_fast
-    for col in ["USERCREATE", "USERCODE", "HISTORY_STATUS", "ACTIVECOMPANY"]:
-        if col in df.columns:
-            df[col] = df[col].astype(str).str.strip().str.upper()
-
-    # Filter out DKM_VP activity
-    if 'ACTIVECOMPANY' in df.columns:
-        df = df[df['ACTIVECOMPANY'] != 'DKM_VP']
-
-    # Convert to datetime without 'mixed' format for broader compatibility
-    df["HISTORYDATETIME"] = pd.to_datetime(df["HISTORYDATETIME"], errors="coerce")
-    df = df.dropna(subset=["HISTORYDATETIME"])
-    df["HISTORYDATETIME"] = df["HISTORYDATETIME"].dt.tz_localize(None)
-
-    # Last 10 working days (Mon-Fri)
-    today = datetime.now().date()
-    working_days = []
-    curr = today
-    while len(working_days) < 10:
-        if curr.weekday() < 5:
-            working_days.insert(0, curr)
-        curr -= timedelta(days=1)
+    # Last 10 working days
+    working_days = calendar.last_working_days(10)
+
+    cutoff = window_start(90)
+    recent_df = activity[activity["HISTORYHOUR"] >= cutoff]
+
+    # Classify every (user, declaration) pair once; each team/user below is a lookup
+    report_users = _report_users(users)
+    recent_decls = recent_df[recent_df["USERCODE"].isin(report_users)]["DECLARATIONID"].unique()
+    scope = activity[activity["DECLARATIONID"].isin(recent_decls)]
+    facts, _ = _user_declaration_facts(scope, classify_activity(scope), report_users)
+    credited = facts[(facts["is_manual"] | facts["is_automatic"]) & calendar.in_working_window(facts["first_action"], 10)]
+    credited_users = set(credited.index.get_level_values("USERCODE"))
 
     results = []
 
     # Process each team separately so BATCHPROC can appear in both
     for team_name, team_users in [("import", IMPORT_USERS), ("export", EXPORT_USERS)]:
         for user in team_users:
+            if user not in report_users:
+                continue
             user_daily = {day.strftime("%d/%m"): 0 for day in working_days}
 
-            cutoff = datetime.now() - timedelta(days=90)
-            recent_df = df[df["HISTORYDATETIME"] >= cutoff]
-            
-            # Special handling for BATCHPROC: filter by team
-            if user == 'BATCHPROC':
-                import_types = ['IDMS_IMPORT', 'DMS_IMPORT']
-                if team_name == 'import':
-                    recent_df = recent_df[recent_df['TYPEDECLARATIONSSW'].isin(import_types)]
-                else:
-                    recent_df = recent_df[~recent_df['TYPEDECLARATIONSSW'].isin(import_types)]
-
-            user_decls = recent_df[recent_df["USERCODE"] == user]["DECLARATIONID"].unique()
-
-            # Work on all declarations this user touched
-            user_scope_df = df[df["DECLARATIONID"].isin(user_decls)].copy()
-            
-            # Deduplicate to prevent counting same action multiple times
-            user_scope_df = user_scope_df.drop_duplicates(
-                subset=['DECLARATIONID', 'USERCODE', 'HISTORY_STATUS', 'HISTORYDATETIME']
-            )
-
-            grouped = user_scope_df.groupby("DECLARATIONID")
-
-            for decl_id, group in grouped:
-                group = group.sort_values("HISTORYDATETIME")
-                if group.empty:
-                    continue
-
-                user_rows = group[group["USERCODE"] == user]
-                if user_rows.empty:
-                    continue
-
-                first_action_date = user_rows["HISTORYDATETIME"].min().date()
-                if first_action_date not in working_days:
-                    continue
-
-                # --- CHANGE 2: Simplified automatic/manual classification logic ---
-                is_manual, is_automatic = classify_file_activity(
-                    global_history=group["HISTORY_STATUS"].tolist(),
-                    user_history=user_rows["HISTORY_STATUS"].tolist(),
-                    group_df=group,
-                    target_user=user
-                )
-                # --- END OF CHANGES ---
-
-                if is_manual or is_automatic:
-                    key = first_action_date.strftime("%d/%m")
-                    user_daily[key] += 1
+            if user in credited_users:
+                user_decls = _touched_declarations(recent_df, user, team_name)
+                user_credited = credited.loc[user]
+                per_day = user_credited[user_credited.index.isin(user_decls)].groupby("date").size()
+                for day, count in per_day.items():
+                    user_daily[day.strftime("%d/%m")] += int(count)
 
             results.append({
                 "user": user,
@@ -98,139 +111,78 @@ def count_user_file_creations_last_10_days(df_all):
 
     return results
 
-def calculate_single_user_metrics_fast(df_all, username):
-    df = df_all.copy()
+def calculate_users_metrics_batch(df_all, usernames, calendar=None):
+    """
+    Computes the per-user cache document for every user in `usernames` in one sweep.
+    Declarations are classified once; only the final assembly runs per user.
+    Returns {USERNAME: metrics}.
+    """
+    summary = as_summary(df_all)
+    activity = summary.report_activity()
+    usernames = list(dict.fromkeys(u.upper() for u in usernames))
 
-    for col in ["USERCREATE", "USERCODE", "HISTORY_STATUS", "ACTIVECOMPANY"]:
-        if col in df.columns:
-            df[col] = df[col].astype(str).str.strip().str.upper()
+    # Includes ALL historical data (no 90-day cutoff) to prevent data fade
+    touched_decls = activity[activity["USERCODE"].isin(usernames)]["DECLARATIONID"].unique()
+    scope = activity[activity["DECLARATIONID"].isin(touched_decls)]
 
-    # Filter out DKM_VP activity
-    if 'ACTIVECOMPANY' in df.columns:
-        df = df[df['ACTIVECOMPANY'] != 'DKM_VP']
+    facts, user_activity = _user_declaration_facts(scope, classify_activity(scope), usernames)
+    sessions = _session_durations(summary.runs[summary.runs["USERCODE"].isin(usernames)])
 
-    df["HISTORYDATETIME"] = pd.to_datetime(df["HISTORYDATETIME"], errors="coerce")
-    df = df.dropna(subset=["HISTORYDATETIME"])
-    df["HISTORYDATETIME"] = df["HISTORYDATETIME"].dt.tz_localize(None)
+    facts_by_user = dict(tuple(facts.groupby(level="USERCODE", sort=False, observed=True)))
+    rows_by_user = dict(tuple(user_activity.groupby("USERCODE", sort=False, observed=True)))
+    sessions_by_user = dict(tuple(sessions.groupby("USERCODE", sort=False, observed=True)))
 
-    username = username.upper()
-    
-    # REMOVED 90-day cutoff - now includes ALL historical data to prevent data fade
-    # Get ALL declarations this user has ever touched (no time limit)
-    
-    # Special handling for BATCHPROC if we need to split it here too
-    # However, calculate_single_user_metrics_fast is usually called for ONE specific user view.
-    # To determine team correctly for BATCHPROC, we check if they have more import or export files generally,
-    # or we can allow the caller to specify. For now, let's keep it consistent.
-    
-    user_decls = df[df["USERCODE"] == username]["DECLARATIONID"].unique()
-    if len(user_decls) == 0:
-        return {
-            "user": username,
-            "daily_metrics": [],
-            "summary": {}
-        }
+    results = {}
+    for username in usernames:
+        if username not in facts_by_user:
+            results[username] = {
+                "user": username,
+                "daily_metrics": [],
+                "summary": {}
+            }
+            continue
+        results[username] = _build_user_metrics(
+            username,
+            facts_by_user[username].droplevel("USERCODE"),
+            rows_by_user[username],
+            sessions_by_user.get(username, sessions.iloc[0:0]),
+            calendar or DEFAULT_CALENDAR
+        )
+    return results
 
-    user_scope_df = df[df["DECLARATIONID"].isin(user_decls)].copy()
-    
-    # Deduplicate to prevent counting same action multiple times
-    user_scope_df = user_scope_df.drop_duplicates(
-        subset=['DECLARATIONID', 'USERCODE', 'HISTORY_STATUS', 'HISTORYDATETIME']
-    )
-    
-    # --- CHANGE 1: "INTERFACE" is no longer considered a manual status ---
-
-    daily_summary = defaultdict(lambda: {
-        "manual_files_created": 0,
-        "automatic_files_created": 0,
-        "sending_count": 0,
-        "modification_count": 0,
-        "modification_file_ids": set(),
-        "total_files_handled": set(),
-        "file_creation_times": [],
-        "manual_file_ids": [],
-        "automatic_file_ids": [],
-        "sending_file_ids": []
-    })
+def calculate_single_user_metrics_fast(df_all, username, calendar=None):
+    return calculate_users_metrics_batch(df_all, [username], calendar)[username.upper()]
 
-    grouped = user_scope_df.groupby("DECLARATIONID")
+def _build_user_metrics(username, facts, user_activity, sessions, calendar):
+    """Assembles the per-user cache document from per-declaration facts and the user's hourly activity."""
+    facts = facts.assign(
+        is_automatic=facts["is_automatic"] & ~facts["is_manual"],
+        is_sending=facts["sending_count"] > 0,
+        is_modified=facts["modification_count"] > 0,
+    )
+    facts["is_handled"] = facts["is_manual"] | facts["is_automatic"] | facts["is_sending"] | facts["is_modified"]
+    facts = facts[facts["is_handled"]]
 
-    for decl_id, group in grouped:
-        group = group.sort_values("HISTORYDATETIME")
-        if group.empty:
-            continue
-        
-        user_rows = group[group["USERCODE"] == username]
-        if user_rows.empty:
-            continue
+    sessions = sessions.join(facts["date"], on="DECLARATIONID", how="inner")
+    session_hours = sessions.groupby("date")["duration"].agg(list)
 
-        first_action_date = user_rows["HISTORYDATETIME"].min().date().isoformat()
-        
-        # --- CHANGE 2: Simplified automatic/manual classification logic ---
-        is_manual, is_automatic = classify_file_activity(
-            global_history=group["HISTORY_STATUS"].tolist(),
-            user_history=user_rows["HISTORY_STATUS"].tolist(),
-            group_df=group,
-            target_user=username
-        )
-        # --- END OF CHANGES ---
-
-        # Get user's actions for this file (needed for both classification and lifecycle)
-        mods = group[group["USERCODE"] == username]
-
-        if is_manual:
-            daily_summary[first_action_date]["manual_files_created"] += 1
-            daily_summary[first_action_date]["total_files_handled"].add(decl_id)
-            daily_summary[first_action_date]["manual_file_ids"].append(decl_id)
-        elif is_automatic:
-            # Credit for the automatic file is given if the user has interacted with it.
-            daily_summary[first_action_date]["automatic_files_created"] += 1
-            daily_summary[first_action_date]["total_files_handled"].add(decl_id)
-            daily_summary[first_action_date]["automatic_file_ids"].append(decl_id)
-        
-        # Check for DEC_DAT (Sending) and MODIFIED (Modifications)
-        # These can happen on any file, even if the user didn't create/auto-trigger it
-        user_sending_rows = mods[mods["HISTORY_STATUS"].isin(SENDING_STATUSES)]
-        if not user_sending_rows.empty:
-            daily_summary[first_action_date]["sending_count"] += len(user_sending_rows)
-            daily_summary[first_action_date]["total_files_handled"].add(decl_id)
-            daily_summary[first_action_date]["sending_file_ids"].append(decl_id)
-
-        # Count modifications (excluding the creation action if it was manual)
-        # Actually, let's just count all MODIFIED statuses
-        mod_rows = mods[mods["HISTORY_STATUS"] == "MODIFIED"]
-        if not mod_rows.empty:
-            daily_summary[first_action_date]["modification_count"] += len(mod_rows)
-            daily_summary[first_action_date]["total_files_handled"].add(decl_id)
-            daily_summary[first_action_date]["modification_file_ids"].add(decl_id)
-
-        # File lifecycle logic (calculate time between MODIFIED and WRT_ENT)
-        session_start = None
-        for _, row in mods.sort_values("HISTORYDATETIME").iterrows():
-            if row["HISTORY_STATUS"] == "MODIFIED" and session_start is None:
-                session_start = row["HISTORYDATETIME"]
-            elif row["HISTORY_STATUS"] == "WRT_ENT" and session_start:
-                duration = (row["HISTORYDATETIME"] - session_start).total_seconds() / 3600
-                daily_summary[first_action_date]["file_creation_times"].append(duration)
-                session_start = None
-
-    # Build daily metrics
     daily_metrics = []
-    for date in sorted(daily_summary.keys()):
-        data = daily_summary[date]
-        avg_creation_time = (sum(data["file_creation_times"]) / len(data["file_creation_times"])) if data["file_creation_times"] else None
+    for date, day in facts.groupby("date", sort=True):
+        ids = day.index
+        hours = session_hours.get(date, [])
+        avg_creation_time = (sum(hours) / len(hours)) if hours else None
         daily_metrics.append({
-            "date": date,
-            "manual_files_created": data["manual_files_created"],
-            "automatic_files_created": data["automatic_files_created"],
-            "sending_count": data["sending_count"],
-            "modification_count": data["modification_count"],
-            "modification_file_ids": list(data["modification_file_ids"]),
-            "total_files_handled": len(data["total_files_handled"]),
+            "date": date.isoformat(),
+            "manual_files_created": int(day["is_manual"].sum()),
+            "automatic_files_created": int(day["is_automatic"].sum()),
+            "sending_count": int(day["sending_count"].sum()),
+            "modification_count": int(day["modification_count"].sum()),
+            "modification_file_ids": ids[day["is_modified"]].tolist(),
+            "total_files_handled": int(day["is_handled"].sum()),
             "avg_creation_time": round(avg_creation_time, 2) if avg_creation_time else None,
-            "manual_file_ids": data["manual_file_ids"],
-            "automatic_file_ids": data["automatic_file_ids"],
-            "sending_file_ids": list(set(data["sending_file_ids"]))
+            "manual_file_ids": ids[day["is_manual"]].tolist(),
+            "automatic_file_ids": ids[day["is_automatic"]].tolist(),
+            "sending_file_ids": ids[day["is_sending"]].tolist()
         })
 
     total_manual = sum(d["manual_files_created"] for d in daily_metrics)
@@ -239,39 +191,37 @@ def calculate_single_user_metrics_fast(df_all, username):
     total_mods = sum(d["modification_count"] for d in daily_metrics)
     total_handled = sum(d["total_files_handled"] for d in daily_metrics)
 
-    all_creation_times = [t for d in daily_summary.values() for t in d["file_creation_times"]]
+    all_creation_times = sessions["duration"].tolist()
     avg_creation_time_total = (sum(all_creation_times) / len(all_creation_times)) if all_creation_times else None
 
-    df_user_summary = user_scope_df[user_scope_df["USERCODE"] == username]
-    file_type_counts = df_user_summary["TYPEDECLARATIONSSW"].value_counts().to_dict()
-    activity_by_hour = df_user_summary["HISTORYDATETIME"].dt.hour.value_counts().sort_index().to_dict()
-    company_specialization = df_user_summary["ACTIVECOMPANY"].value_counts().to_dict()
+    file_type_counts = _weighted_counts(user_activity, "TYPEDECLARATIONSSW")
+    activity_by_hour = dict(sorted(_weighted_counts(user_activity, user_activity["HISTORYHOUR"].dt.hour).items()))
+    company_specialization = _weighted_counts(user_activity, "ACTIVECOMPANY")
 
     most_productive_day = max(daily_metrics, key=lambda d: d["total_files_handled"], default={"date": None})["date"] if daily_metrics else None
 
-    # Smart avg per day (only weekdays + at least 1 file created)
+    # Smart avg per day (only working days + at least 1 file created)
+    is_working = calendar.is_working_day([d["date"] for d in daily_metrics])
     valid_days = [
-        d for d in daily_metrics
-        if (datetime.strptime(d["date"], "%Y-%m-%d").weekday() < 5) and
-        ((d["manual_files_created"] + d["automatic_files_created"]) > 0)
+        d for d, working in zip(daily_metrics, is_working)
+        if working and ((d["manual_files_created"] + d["automatic_files_created"]) > 0)
     ]
     total_created = sum(d["manual_files_created"] + d["automatic_files_created"] for d in valid_days)
     avg_files_per_day = round(total_created / len(valid_days), 2) if valid_days else 0
 
     days_active = len(valid_days)
-    modification_file_ids = set()
-    for d in daily_metrics:
-        modification_file_ids.update(d["modification_file_ids"])
-    modifications_per_file = round(total_mods / len(modification_file_ids), 2) if modification_file_ids else 0
+    modified_files = int(facts["is_modified"].sum())
+    modifications_per_file = round(total_mods / modified_files, 2) if modified_files else 0
 
     manual_vs_auto_ratio = {
         "manual_percent": round((total_manual / total_handled) * 100, 2) if total_handled else 0,
         "automatic_percent": round((total_auto / total_handled) * 100, 2) if total_handled else 0,
     }
 
-    activity_days = df_user_summary["HISTORYDATETIME"].dt.date.value_counts().to_dict()
-    all_days = set((datetime.now() - timedelta(days=i)).date() for i in range(90))
-    inactive_days = sorted([d.isoformat() for d in all_days if d not in activity_days])
+    activity_days = _weighted_counts(user_activity, user_activity["HISTORYHOUR"].dt.date)
+    # Days of the last 90 (calendar days) without any action
+    all_days = pd.date_range(end=datetime.now().date(), periods=90, freq="D")
+    inactive_days = all_days[~all_days.isin(pd.to_datetime(list(activity_days)))].strftime("%Y-%m-%d").tolist()
 
     hour_with_most_activity = max(activity_by_hour.items(), key=lambda x: x[1], default=(None, None))[0]
 
@@ -299,140 +249,77 @@ def calculate_single_user_metrics_fast(df_all, username):
         }
     }
 
-def calculate_all_users_monthly_metrics(df_all):
+def calculate_all_users_monthly_metrics(df_all, calendar=None, users=None):
     """
     Calculate file creation metrics for a specific list of users in the last month (30 days)
     Returns summary of files created and daily averages per user
+    `users` restricts the report to some of the team members (a parallel worker's share)
     """
-    df = df_all.copy()
-    
-    # --- NEW: Use consolidated list of users from common ---
-    target_users = TARGET_USERS
-
-    
-    # Data preprocessing
-    for col in ["USERCREATE", "USERCODE", "HISTORY_STATUS", "ACTIVECOMPANY"]:
-        if col in df.columns:
-            df[col] = df[col].astype(str).str.strip().str.upper()
-    
-    # Filter out DKM_VP activity
-    if 'ACTIVECOMPANY' in df.columns:
-        df = df[df['ACTIVECOMPANY'] != 'DKM_VP']
-    
-    # Convert to datetime without 'mixed' format for broader compatibility
-    df["HISTORYDATETIME"] = pd.to_datetime(df["HISTORYDATETIME"], errors="coerce")
-    df = df.dropna(subset=["HISTORYDATETIME"])
-    df["HISTORYDATETIME"] = df["HISTORYDATETIME"].dt.tz_localize(None)
+    activity = as_summary(df_all).report_activity()
+    calendar = calendar or DEFAULT_CALENDAR
     
     # Filter for last 30 days
-    cutoff = datetime.now() - timedelta(days=30)
-    recent_df = df[df["HISTORYDATETIME"] >= cutoff]
+    cutoff = window_start(30)
+    recent_df = activity[activity["HISTORYHOUR"] >= cutoff]
     
     if recent_df.empty:
         return []
     
-    if recent_df.empty:
-        return []
+    # Classification uses each file's full history; dates and sendings only count actions inside the period
+    report_users = _report_users(users)
+    recent_decls = recent_df[recent_df["USERCODE"].isin(report_users)]["DECLARATIONID"].unique()
+    scope = activity[activity["DECLARATIONID"].isin(recent_decls)]
+    facts, _ = _user_declaration_facts(scope, classify_activity(scope), report_users)
+
+    period_rows = scope[scope["USERCODE"].isin(report_users) & (scope["HISTORYHOUR"] >= cutoff)]
+    period = period_rows.groupby(["USERCODE", "DECLARATIONID"], observed=True).agg(
+        first_action_in_period=("first_at", "min"),
+        sent_files=("sending_count", "sum"),
+    )
+    facts = facts.join(period, how="inner")
+    facts["period_date"] = facts["first_action_in_period"].dt.date
+    facts["is_automatic"] = facts["is_automatic"] & ~facts["is_manual"]
     
     user_results = []
     
     # Process each team separately so BATCHPROC can appear in both
     for team_name, team_users in [("import", IMPORT_USERS), ("export", EXPORT_USERS)]:
         for username in team_users:
+            if username not in report_users:
+                continue
             # Get declarations this user worked on
-            current_recent_df = recent_df.copy()
-            
-            # Special handling for BATCHPROC: filter by team
-            if username == 'BATCHPROC':
-                import_types = ['IDMS_IMPORT', 'DMS_IMPORT']
-                if team_name == 'import':
-                    current_recent_df = current_recent_df[current_recent_df['TYPEDECLARATIONSSW'].isin(import_types)]
-                else:
-                    current_recent_df = current_recent_df[~current_recent_df['TYPEDECLARATIONSSW'].isin(import_types)]
-
-            user_decls = current_recent_df[current_recent_df["USERCODE"] == username]["DECLARATIONID"].unique()
+            user_decls = _touched_declarations(recent_df, username, team_name)
             if len(user_decls) == 0:
                 continue
             
-            # Get all activity for these declarations
-            user_scope_df = df[df["DECLARATIONID"].isin(user_decls)].copy()
-            
-            # Deduplicate to prevent counting same action multiple times
-            user_scope_df = user_scope_df.drop_duplicates(
-                subset=['DECLARATIONID', 'USERCODE', 'HISTORY_STATUS', 'HISTORYDATETIME']
+            user_facts = facts.loc[username]
+            user_facts = user_facts[user_facts.index.isin(user_decls)]
+
+            # Track daily file creation (days only exist once a file was created or sent)
+            daily_files = user_facts.groupby("period_date").agg(
+                manual_files=("is_manual", "sum"),
+                automatic_files=("is_automatic", "sum"),
+                sent_files=("sent_files", "sum"),
             )
-            
-            # Track daily file creation
-            daily_files = defaultdict(lambda: {
-                "manual_files": 0,
-                "automatic_files": 0,
-                "sent_files": 0,
-                "total_files": set()
-            })
-            
-            # Group by declaration to analyze file creation logic
-            grouped = user_scope_df.groupby("DECLARATIONID")
-            
-            for decl_id, group in grouped:
-                group = group.sort_values("HISTORYDATETIME")
-                if group.empty:
-                    continue
-                
-                user_rows = group[group["USERCODE"] == username]
-                if user_rows.empty:
-                    continue
-                
-                user_actions_in_period = user_rows[user_rows["HISTORYDATETIME"] >= cutoff]
-                if user_actions_in_period.empty:
-                    continue
-                    
-                first_action_date = user_actions_in_period["HISTORYDATETIME"].min().date().isoformat()
-                
-                # Check for Sending (DEC_DAT)
-                sent_count = len(user_actions_in_period[user_actions_in_period["HISTORY_STATUS"].isin(SENDING_STATUSES)])
-                if sent_count > 0:
-                    daily_files[first_action_date]["sent_files"] += sent_count
-                    daily_files[first_action_date]["total_files"].add(decl_id)
-
-                is_manual, is_automatic = classify_file_activity(
-                    global_history=group["HISTORY_STATUS"].tolist(),
-                    user_history=user_rows["HISTORY_STATUS"].tolist(),
-                    group_df=group,
-                    target_user=username
-                )
-                
-                if is_manual:
-                    daily_files[first_action_date]["manual_files"] += 1
-                    daily_files[first_action_date]["total_files"].add(decl_id)
-                elif is_automatic:
-                    daily_files[first_action_date]["automatic_files"] += 1
-                    daily_files[first_action_date]["total_files"].add(decl_id)
+            daily_files = daily_files[daily_files.sum(axis=1) > 0]
             
             # Calculate totals and averages
-            total_manual = sum(day_data["manual_files"] for day_data in daily_files.values())
-            total_automatic = sum(day_data["automatic_files"] for day_data in daily_files.values())
-            total_sent = sum(day_data["sent_files"] for day_data in daily_files.values())
+            total_manual = int(daily_files["manual_files"].sum())
+            total_automatic = int(daily_files["automatic_files"].sum())
+            total_sent = int(daily_files["sent_files"].sum())
             
             # total_files_handled should be based on unique creations (manual + automatic)
             total_creations = total_manual + total_automatic
             
-            # Identify valid days (weekdays where at least ONE creation or sending happened)
+            # Identify valid days (working days where at least ONE creation or sending happened)
             # But the average calculation below will only use creations as per your request.
-            valid_days_creations = []
-            valid_days_any = 0
-            for date_str, day_data in daily_files.items():
-                date_obj = datetime.strptime(date_str, "%Y-%m-%d")
-                creations_today = day_data["manual_files"] + day_data["automatic_files"]
-                activity_today = creations_today + day_data["sent_files"]
-                
-                if date_obj.weekday() < 5:
-                    if activity_today > 0:
-                        valid_days_any += 1
-                    if creations_today > 0:
-                        valid_days_creations.append(creations_today)
+            weekdays = daily_files[calendar.is_working_day(daily_files.index)]
+            creations_per_day = weekdays["manual_files"] + weekdays["automatic_files"]
+            valid_days_creations = creations_per_day[creations_per_day > 0]
+            valid_days_any = len(weekdays)
             
             # avg_activity_per_day now uses creations (384 / 22 style)
-            avg_creations_per_day = round(sum(valid_days_creations) / len(valid_days_creations), 2) if valid_days_creations else 0
+            avg_creations_per_day = round(int(valid_days_creations.sum()) / len(valid_days_creations), 2) if len(valid_days_creations) else 0
             
             user_results.append({
                 "user": username,
@@ -0,0 +1,63 @@
+import logging
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from performanceV2.declaration_summary import DeclarationSummary, DeclarationSummaryStore
+from performanceV2.event_store import CHUNK_ROWS, PartitionedEventStore
+from performanceV2.preprocessing import normalize_history
+
+# --- Shared DMS History ---
+# performance (V1) and performanceV2 ingest into and read from the same partitioned event store, and
+# every ingest keeps the declaration summary in step with it. Both function apps go through DmsHistory
+# so that V1 does not need V2's function app (and its clients, caches and job store) to do so.
+
+
+class DmsHistory:
+    """
+    The event store of a container (logs/history/) and the declaration summary kept from it (logs/summary/).
+    With `chunk_rows`, full-history summaries stream the history in DECLARATIONID chunks of about that
+    many rows; None reads it whole.
+    """
+
+    def __init__(self, container_client, cache=None, chunk_rows=CHUNK_ROWS):
+        self.events = PartitionedEventStore(container_client, normalize=normalize_history, cache=cache)
+        self.summary = DeclarationSummaryStore(container_client, cache=cache)
+        self.chunk_rows = chunk_rows
+
+    def read(self, columns=None, days_back=None, where=None):
+        """
+        The stored history. `days_back` keeps the rows since midnight `days_back` days ago (day-aligned so
+        repeated requests share cache entries); `where` ({column: value}) keeps matching rows only. Both
+        are pushed down to the Parquet reads. An unreadable store gives an empty DataFrame.
+        """
+        try:
+            since = datetime.combine(datetime.now().date() - timedelta(days=days_back), datetime.min.time()) if days_back is not None else None
+            return self.events.read(columns=columns, since=since, where=where)
+        except Exception as e:
+            logging.error(f"Could not load history data. Error: {e}")
+            return pd.DataFrame()
+
+    def append(self, new_df):
+        """Appends new raw history rows as a typed delta file and brings the declaration summary up to date."""
+        rows = self.events.append(new_df)
+        logging.info(f"Successfully stored {rows} new rows under {self.events.prefix}")
+        try:
+            self.summary.apply(new_df, read_history=lambda since, where=None: self.events.read(since=since, where=where) if since is not None else self.summarize())
+        except Exception as e:
+            # The rows are stored; the summary catches up on the next ingest or refresh-summary
+            logging.error(f"Could not update the declaration summary. Error: {e}")
+        return rows
+
+    def summarize(self, job=None):
+        """DeclarationSummary of the whole history. `job` (a JobContext) gets the chunk progress."""
+        if self.chunk_rows is None:
+            return DeclarationSummary.from_history(self.events.read())
+        return DeclarationSummary.from_chunks(_with_progress(self.events.iter_declaration_chunks(chunk_rows=self.chunk_rows), job))
+
+
+def _with_progress(chunks, job):
+    for done, chunk in enumerate(chunks, start=1):
+        yield chunk
+        if job is not None:
+            job.progress(done)
@@ -0,0 +1,288 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+
+# --- Job Layout ---
+# logs/jobs/<id>.json          -> job record: status, progress, stage timings, result or error
+# logs/jobs/active/<kind>.json -> id of the queued/running job of that kind (used to coalesce requests)
+JOBS_PREFIX = "logs/jobs/"
+ACTIVE_DIR = "active/"
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+FINISHED_STATUSES = {SUCCEEDED, FAILED}
+
+JOB_STALE_SECONDS = 15 * 60        # A running job without a heartbeat for this long is considered dead
+JOB_QUEUE_TIMEOUT_SECONDS = 6 * 3600  # A job still queued this long after submission was lost with its worker
+HEARTBEAT_SECONDS = 60             # A running job's record is rewritten at least this often
+PROGRESS_SAVE_SECONDS = 2          # Progress updates are written at most this often (stage changes always are)
+SUBMIT_RETRIES = 5
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+class JobSuperseded(Exception):
+    """The job's record was finalised by someone else (e.g. declared dead by `submit`) while it ran."""
+
+
+class JobContext:
+    """
+    Handed to a running job so it can report its stage and progress. Every write is conditional on
+    the record's ETag; once someone else has changed the record, the job stops writing to it and
+    the next stage or progress report raises JobSuperseded.
+    """
+
+    def __init__(self, store, job, etag):
+        self.store = store
+        self.job = job
+        self.etag = etag
+        self.superseded = False
+        self._lock = threading.RLock()  # The heartbeat thread writes the record too
+        self._stage_started = None
+        self._last_save = 0.0
+
+    def stage(self, name, total=None):
+        """Starts a new stage; the previous one is closed and its duration recorded."""
+        with self._lock:
+            self.close()
+            self._stage_started = time.monotonic()
+            self.job["stages"].append({"name": name, "started_at": _now().isoformat(), "seconds": None})
+            self.job["progress"] = {"stage": name, "done": 0, "total": total}
+            self._save(force=True)
+
+    def progress(self, done, total=None):
+        with self._lock:
+            self.job["progress"]["done"] = done
+            if total is not None:
+                self.job["progress"]["total"] = total
+            self._save()
+
+    def close(self):
+        """Closes the current stage."""
+        with self._lock:
+            if self._stage_started is not None and self.job["stages"]:
+                self.job["stages"][-1]["seconds"] = round(time.monotonic() - self._stage_started, 3)
+                self._stage_started = None
+
+    def save(self):
+        """Writes the record unless it was changed by someone else. Returns False once superseded."""
+        with self._lock:
+            if not self.superseded:
+                try:
+                    self.etag = self.store.save(self.job, self.etag)
+                    self._last_save = time.monotonic()
+                except ResourceModifiedError:
+                    self.superseded = True
+                    logging.warning(f"{self.job['kind']} job {self.job['id']} was finalised elsewhere, no longer updating it.")
+            return not self.superseded
+
+    def _save(self, force=False):
+        if (force or time.monotonic() - self._last_save >= PROGRESS_SAVE_SECONDS) and not self.save():
+            raise JobSuperseded(self.job["id"])
+
+
+class NullJobContext:
+    """JobContext stand-in for tasks run inline (synchronous requests)."""
+
+    def stage(self, name, total=None):
+        logging.info(f"Stage: {name}")
+
+    def progress(self, done, total=None):
+        pass
+
+    def close(self):
+        pass
+
+
+class LocalJobQueue:
+    """
+    In-process queue: jobs run on a background thread of the worker that accepted them. Suits local
+    runs and tests; a hosted worker can be frozen or recycled under a running job (see StorageQueueJobQueue).
+    Anything with `submit(job_id, run)` can replace it.
+    """
+
+    def __init__(self, max_workers=1):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="performance-job")
+
+    def submit(self, job_id, run):
+        return self._pool.submit(run)
+
+
+class StorageQueueJobQueue:
+    """
+    Hands jobs to a queue-triggered worker function through a storage queue output binding (a
+    func.Out of the current invocation). The message only carries the job id: the worker looks the
+    job's kind up in its record and runs it with JobStore.run, so `run` is not used here.
+    """
+
+    def __init__(self, out):
+        self.out = out
+
+    def submit(self, job_id, run):
+        self.out.set(json.dumps({"job_id": job_id}))
+
+
+class JobStore:
+    """
+    Job records in blob storage, so any worker can report on a job another worker runs.
+
+    `submit` coalesces duplicates: while a job of the same kind is queued or running (and still
+    sending heartbeats), requests get that job back instead of starting another. The active-job
+    pointer is created with a create-only write, so two workers can never both start one.
+    """
+
+    def __init__(self, container_client, queue, prefix=JOBS_PREFIX):
+        self.container_client = container_client
+        self.queue = queue
+        self.prefix = prefix
+
+    # --- Records ---
+
+    def _job_path(self, job_id):
+        return f"{self.prefix}{job_id}.json"
+
+    def _active_path(self, kind):
+        return f"{self.prefix}{ACTIVE_DIR}{kind}.json"
+
+    def _download(self, job_id):
+        """(record, etag) of a job, or (None, None)."""
+        try:
+            downloader = self.container_client.get_blob_client(self._job_path(job_id)).download_blob()
+            return json.loads(downloader.readall()), downloader.properties.etag
+        except ResourceNotFoundError:
+            return None, None
+
+    def get(self, job_id):
+        return self._download(job_id)[0]
+
+    def save(self, job, etag=None):
+        """Writes a job record (only over version `etag` when given) and returns the new etag."""
+        job["heartbeat_at"] = _now().isoformat()
+        conditions = {"etag": etag, "match_condition": MatchConditions.IfNotModified} if etag else {}
+        response = self.container_client.get_blob_client(self._job_path(job["id"])).upload_blob(
+            json.dumps(job, indent=2, default=str), overwrite=True, **conditions)
+        return response.get("etag")
+
+    def _is_alive(self, job):
+        """Running jobs live while they send heartbeats; queued ones wait (up to JOB_QUEUE_TIMEOUT_SECONDS) for a worker."""
+        if job is None or job["status"] in FINISHED_STATUSES:
+            return False
+        if job["status"] == QUEUED:
+            return (_now() - datetime.fromisoformat(job["created_at"])).total_seconds() < JOB_QUEUE_TIMEOUT_SECONDS
+        heartbeat = datetime.fromisoformat(job["heartbeat_at"])
+        return (_now() - heartbeat).total_seconds() < JOB_STALE_SECONDS
+
+    def _read_active(self, kind):
+        try:
+            downloader = self.container_client.get_blob_client(self._active_path(kind)).download_blob()
+            return json.loads(downloader.readall())["job_id"], downloader.properties.etag
+        except ResourceNotFoundError:
+            return None, None
+
+    def _release(self, kind, job_id):
+        """Removes the active-job pointer if it still points at `job_id`."""
+        active_id, etag = self._read_active(kind)
+        if active_id != job_id:
+            return
+        try:
+            self.container_client.get_blob_client(self._active_path(kind)).delete_blob(etag=etag, match_condition=MatchConditions.IfNotModified)
+        except (ResourceNotFoundError, ResourceModifiedError):
+            pass
+
+    # --- Public API ---
+
+    def submit(self, kind, task, params=None, queue=None):
+        """
+        Queues `task(context)` as a job of `kind` (on `queue` if given, else the store's queue), or
+        joins the live job of that kind. Returns (job, created).
+        """
+        for _ in range(SUBMIT_RETRIES):
+            active_id, _ = self._read_active(kind)
+            if active_id is not None:
+                active, etag = self._download(active_id)
+                if self._is_alive(active):
+                    return active, False
+                if active is not None and active["status"] not in FINISHED_STATUSES:
+                    active.update(status=FAILED, finished_at=_now().isoformat(), error="Worker stopped reporting progress.")
+                    try:
+                        self.save(active, etag)
+                    except ResourceModifiedError:
+                        continue  # The job wrote to its record meanwhile: look again
+                self._release(kind, active_id)
+                continue
+
+            job = {
+                "id": uuid.uuid4().hex,
+                "kind": kind,
+                "params": params or {},
+                "status": QUEUED,
+                "created_at": _now().isoformat(),
+                "started_at": None,
+                "finished_at": None,
+                "progress": {"stage": None, "done": 0, "total": None},
+                "stages": [],
+                "result": None,
+                "error": None,
+            }
+            self.save(job)
+            try:
+                self.container_client.get_blob_client(self._active_path(kind)).upload_blob(json.dumps({"job_id": job["id"]}), overwrite=False)
+            except ResourceExistsError:
+                # Another request queued the same kind in the meantime; join it instead
+                self.container_client.get_blob_client(self._job_path(job["id"])).delete_blob()
+                continue
+
+            (queue or self.queue).submit(job["id"], lambda: self.run(job["id"], task))
+            logging.info(f"Queued {kind} job {job['id']}.")
+            return job, True
+        raise RuntimeError(f"Could not queue a {kind} job after several attempts.")
+
+    def run(self, job_id, task):
+        """
+        Executes a queued job, recording status, stage timings and the result or error. A heartbeat
+        thread rewrites the record every HEARTBEAT_SECONDS while the task runs. A job finalised by
+        someone else (before or while it runs) is left alone, as is its kind's active-job pointer.
+        """
+        job, etag = self._download(job_id)
+        if job is None or job["status"] != QUEUED:
+            logging.warning(f"Job {job_id} is no longer queued ({job and job['status']}), not running it.")
+            return job
+        context = JobContext(self, job, etag)
+        job.update(status=RUNNING, started_at=_now().isoformat())
+        if not context.save():
+            return job
+
+        stopped = threading.Event()
+
+        def heartbeat():
+            while not stopped.wait(HEARTBEAT_SECONDS) and context.save():
+                pass
+
+        threading.Thread(target=heartbeat, name=f"job-heartbeat-{job_id}", daemon=True).start()
+        try:
+            result = task(context)
+            with context._lock:
+                job.update(result=result, status=SUCCEEDED)
+        except JobSuperseded:
+            pass
+        except Exception as e:
+            logging.error(f"{job['kind']} job {job['id']} failed: {e}")
+            with context._lock:
+                job.update(status=FAILED, error=str(e))
+        finally:
+            stopped.set()
+            with context._lock:
+                context.close()
+                job["finished_at"] = _now().isoformat()
+                finished = context.save()
+            if finished:
+                self._release(job["kind"], job["id"])
+        return job
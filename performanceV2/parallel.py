@@ -0,0 +1,136 @@
+import logging
+import multiprocessing
+import os
+import tempfile
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pyarrow as pa
+
+from performanceV2.common import TEAMS
+from performanceV2.declaration_summary import DeclarationSummary, as_summary
+from performanceV2.functions.functions import calculate_all_users_monthly_metrics, calculate_users_metrics_batch, count_user_file_creations_last_10_days
+
+# --- Parallel Report Sections ---
+# The reports' users are split into balanced shares, one per worker process. The summary is written
+# once as Arrow IPC files that every worker memory-maps read-only, so the frames are never pickled:
+# only user lists go in and result documents come out. Declarations are classified per worker, on
+# the declarations its users touched, so that work divides between workers too.
+#
+# The pool is started from a job thread of the multi-threaded Functions host, where a plain fork can
+# copy a lock some other thread holds and deadlock the child. Workers are therefore forked by a
+# forkserver, a fresh single-threaded process started on first use that preloads this module (the
+# host's working directory, the app root, is on its path), or spawned where forkserver is unavailable.
+# Importing this module does not load the function app (app.py), so workers start without its Azure setup.
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+FORKSERVER_PRELOAD = [__name__]
+
+
+class SharedSummary:
+    """A DeclarationSummary written to Arrow IPC files for worker processes to memory-map. Removed on close."""
+
+    def __init__(self, summary, directory=None):
+        base = os.path.join(directory or tempfile.gettempdir(), f"performance-summary-{uuid.uuid4().hex}")
+        self.paths = (f"{base}.activity.arrow", f"{base}.runs.arrow")
+        for frame, path in zip((summary.activity, summary.runs), self.paths):
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+    def close(self):
+        for path in self.paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_opened = {}  # Per worker process: the SharedSummary paths it has mapped -> DeclarationSummary
+
+
+def open_shared_summary(paths):
+    """The DeclarationSummary behind SharedSummary `paths`, mapped once per process."""
+    if paths not in _opened:
+        frames = [pa.ipc.open_file(pa.memory_map(path, "r")).read_all().to_pandas(split_blocks=True) for path in paths]
+        _opened.clear()
+        _opened[paths] = DeclarationSummary(*frames)
+    return _opened[paths]
+
+
+def partition_users(users, weights, parts):
+    """Splits `users` into at most `parts` shares of similar total weight (heaviest user first into the lightest share)."""
+    shares = [[] for _ in range(max(1, min(parts, len(users))))]
+    loads = [0] * len(shares)
+    for user in sorted(users, key=lambda u: -weights.get(u, 0)):
+        lightest = loads.index(min(loads))
+        shares[lightest].append(user)
+        loads[lightest] += weights.get(user, 0) + 1
+    return [share for share in shares if share]
+
+
+def _run_share(report, paths, argument, share, kwargs):
+    return report(open_shared_summary(paths), **{argument: share}, **kwargs)
+
+
+def _pool_context():
+    context = multiprocessing.get_context(START_METHOD)
+    if START_METHOD == "forkserver":
+        context.set_forkserver_preload(FORKSERVER_PRELOAD)
+    return context
+
+
+def run_by_user(report, data, users, workers, argument="users", **kwargs):
+    """
+    Runs report(summary, <argument>=share, **kwargs) for balanced shares of `users` in `workers`
+    processes and returns the per-share results. Users are weighted by their number of actions.
+    Runs in-process when there is nothing to split or the pool cannot start.
+    """
+    summary = as_summary(data)
+    if workers <= 1 or len(users) < 2:
+        return [report(summary, **{argument: list(users)}, **kwargs)]
+
+    weights = summary.activity[summary.activity["USERCODE"].isin(users)].groupby("USERCODE", observed=True)["actions"].sum().to_dict()
+    shares = partition_users(list(users), weights, workers)
+    try:
+        with SharedSummary(summary) as shared, ProcessPoolExecutor(len(shares), mp_context=_pool_context()) as pool:
+            futures = [pool.submit(_run_share, report, shared.paths, argument, share, kwargs) for share in shares]
+            return [future.result() for future in futures]
+    except (OSError, BrokenProcessPool) as e:
+        logging.warning(f"Report worker pool unavailable, running in-process. Error: {e}")
+        return [report(summary, **{argument: list(users)}, **kwargs)]
+
+
+def _in_team_order(results):
+    """Team report rows in the order the sequential report emits them (import team, then export)."""
+    position = {(team, user): i for i, (team, user) in enumerate((t, u) for t, members in TEAMS.items() for u in members)}
+    return sorted(results, key=lambda row: position[(row["team"], row["user"])])
+
+
+def parallel_users_metrics_batch(data, usernames, calendar=None, workers=1):
+    """calculate_users_metrics_batch split by user across `workers` processes."""
+    usernames = list(dict.fromkeys(u.upper() for u in usernames))
+    results = {}
+    for part in run_by_user(calculate_users_metrics_batch, data, usernames, workers, argument="usernames", calendar=calendar):
+        results.update(part)
+    return {u: results[u] for u in usernames}
+
+
+def parallel_file_creations_last_10_days(data, calendar=None, workers=1):
+    """count_user_file_creations_last_10_days split by user across `workers` processes."""
+    users = list(dict.fromkeys(u for members in TEAMS.values() for u in members))
+    parts = run_by_user(count_user_file_creations_last_10_days, data, users, workers, calendar=calendar)
+    return _in_team_order([row for part in parts for row in part])
+
+
+def parallel_monthly_metrics(data, calendar=None, workers=1):
+    """calculate_all_users_monthly_metrics split by user across `workers` processes."""
+    users = list(dict.fromkeys(u for members in TEAMS.values() for u in members))
+    parts = run_by_user(calculate_all_users_monthly_metrics, data, users, workers, calendar=calendar)
+    return _in_team_order([row for part in parts for row in part])
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+# --- Typed History Schema ---
+# Code columns are stored stripped, upper-cased and categorical; HISTORYDATETIME as a timezone-naive
+# timestamp; DECLARATIONID as a nullable integer. Rows are written in this form at ingest, so the
+# reports only need the (cheap, idempotent) normalize_history call to cover untyped legacy files.
+CODE_COLUMNS = ["USERCREATE", "USERCODE", "HISTORY_STATUS", "ACTIVECOMPANY", "TYPEDECLARATIONSSW"]
+EXCLUDED_COMPANIES = {"DKM_VP"}
+
+
+def normalize_codes(series):
+    """
+    Strips and upper-cases a code column through its categories, so each distinct value is cleaned
+    once instead of once per row. Missing values become the empty string.
+    """
+    cat = series if isinstance(series.dtype, pd.CategoricalDtype) else series.astype("category")
+    categories = cat.cat.categories
+    cleaned = categories.astype(str).str.strip().str.upper()
+
+    if cleaned.equals(categories) and not cat.isna().any():
+        return cat  # Already normalised
+
+    codes = cat.cat.codes.to_numpy()
+    labels = np.append(cleaned.to_numpy(dtype=object), "")  # Last slot is used by missing values (code -1)
+    new_categories, inverse = np.unique(labels, return_inverse=True)
+    return pd.Series(pd.Categorical.from_codes(inverse[codes], categories=new_categories), index=series.index, name=series.name)
+
+
+def normalize_history(df):
+    """
+    Returns `df` with the typed history schema. Columns already in that form are left untouched,
+    so calling this on data written by the ingest path costs next to nothing.
+    """
+    df = df.copy(deep=False)
+
+    for col in CODE_COLUMNS:
+        if col in df.columns:
+            df[col] = normalize_codes(df[col])
+
+    if "HISTORYDATETIME" in df.columns and not pd.api.types.is_datetime64_dtype(df["HISTORYDATETIME"]):
+        parsed = pd.to_datetime(df["HISTORYDATETIME"], errors="coerce", format="mixed")
+        if getattr(parsed.dt, "tz", None) is not None:
+            parsed = parsed.dt.tz_localize(None)
+        df["HISTORYDATETIME"] = parsed
+
+    if "DECLARATIONID" in df.columns and not pd.api.types.is_integer_dtype(df["DECLARATIONID"]):
+        df["DECLARATIONID"] = pd.to_numeric(df["DECLARATIONID"], errors="coerce").round().astype("Int64")
+
+    return df
+
+
+def prepare_report_frame(df_all, exclude_companies=True):
+    """
+    Normalised history ready for the reports: typed columns, no rows without a timestamp and,
+    unless disabled, no activity of EXCLUDED_COMPANIES.
+    """
+    df = normalize_history(df_all)
+
+    if exclude_companies and "ACTIVECOMPANY" in df.columns:
+        df = df[~df["ACTIVECOMPANY"].isin(EXCLUDED_COMPANIES)]
+
+    return df.dropna(subset=["HISTORYDATETIME"])
@@ -0,0 +1,111 @@
+import pandas as pd
+
+from performanceV2.common import TEAMS
+from performanceV2.event_store import concat_frames
+from performanceV2.preprocessing import EXCLUDED_COMPANIES
+
+# --- Rollup Cube ---
+# One row per (hour, user, company, declaration type) with additive counters. It is the hourly
+# activity summary with the declaration dimension summed out, so it is a fraction of its size.
+ROLLUP_KEYS = ["HISTORYHOUR", "USERCODE", "ACTIVECOMPANY", "TYPEDECLARATIONSSW"]
+ROLLUP_COUNTS = ["actions", "manual_actions", "sending_count", "modification_count", "interface_actions"]
+ROLLUP_METRICS = ROLLUP_COUNTS + ["declarations"]
+
+# Dimensions a query can group by, as names the API exposes
+DIMENSIONS = {
+    "user": "USERCODE",
+    "team": "TEAM",
+    "day": "DAY",
+    "hour": "HOUR",
+    "company": "ACTIVECOMPANY",
+    "type": "TYPEDECLARATIONSSW",
+}
+
+
+def build_rollup(activity):
+    """
+    Sums activity rows (see build_activity) over declarations.
+    `declarations` is the number of distinct declarations a user touched in that hour, company and type:
+    summed over several hours it counts a declaration once per hour it was worked on.
+    """
+    rollup = activity.groupby(ROLLUP_KEYS, observed=True, sort=False).agg(
+        **{col: (col, "sum") for col in ROLLUP_COUNTS},
+        declarations=("DECLARATIONID", "nunique"),
+    ).reset_index()
+    rollup[ROLLUP_METRICS] = rollup[ROLLUP_METRICS].astype("int32")
+    return rollup.sort_values(ROLLUP_KEYS[:2], kind="mergesort", ignore_index=True)
+
+
+class Rollup:
+    """Query API over the rollup cube: filter by window, users, team, company and type, then group."""
+
+    def __init__(self, cube):
+        self.cube = cube
+
+    @classmethod
+    def from_activity(cls, activity):
+        return cls(build_rollup(activity))
+
+    @classmethod
+    def concat(cls, cubes):
+        cubes = [c for c in cubes if c is not None and not c.empty]
+        return cls(concat_frames(cubes) if cubes else pd.DataFrame(columns=ROLLUP_KEYS + ROLLUP_METRICS))
+
+    @property
+    def empty(self):
+        return self.cube.empty
+
+    @property
+    def nbytes(self):
+        return int(self.cube.memory_usage(deep=True).sum())
+
+    def select(self, start=None, end=None, users=None, team=None, companies=None, types=None, exclude_companies=True):
+        """
+        Cube rows in [start, end) matching every given filter. Like the reports, activity of
+        EXCLUDED_COMPANIES is left out unless `exclude_companies` is False.
+        """
+        cube = self.cube
+        mask = pd.Series(True, index=cube.index)
+        if start is not None:
+            mask &= cube["HISTORYHOUR"] >= pd.Timestamp(start)
+        if end is not None:
+            mask &= cube["HISTORYHOUR"] < pd.Timestamp(end)
+        if users is not None:
+            mask &= cube["USERCODE"].isin([u.strip().upper() for u in users])
+        if team is not None:
+            if team not in TEAMS:
+                raise ValueError(f"Unknown team '{team}'. Expected one of: {', '.join(TEAMS)}.")
+            mask &= cube["USERCODE"].isin(TEAMS[team])
+        if companies is not None:
+            mask &= cube["ACTIVECOMPANY"].isin([c.strip().upper() for c in companies])
+        if types is not None:
+            mask &= cube["TYPEDECLARATIONSSW"].isin([t.strip().upper() for t in types])
+        if exclude_companies:
+            mask &= ~cube["ACTIVECOMPANY"].isin(EXCLUDED_COMPANIES)
+        return cube[mask]
+
+    def query(self, group_by=("user",), metrics=None, **filters):
+        """
+        Sums `metrics` (default: all of ROLLUP_METRICS) over the rows `select(**filters)` keeps,
+        grouped by the DIMENSIONS named in `group_by`. Returns one row per group, largest `actions` first.
+
+        A user in several teams is counted in each of them when grouping by team.
+        """
+        unknown = [d for d in group_by if d not in DIMENSIONS]
+        if unknown:
+            raise ValueError(f"Unknown dimension(s) {unknown}. Expected any of: {', '.join(DIMENSIONS)}.")
+        metrics = list(metrics or ROLLUP_METRICS)
+        rows = self.select(**filters)
+
+        keys = [DIMENSIONS[d] for d in group_by]
+        if "DAY" in keys or "HOUR" in keys:
+            rows = rows.assign(DAY=rows["HISTORYHOUR"].dt.strftime("%Y-%m-%d"), HOUR=rows["HISTORYHOUR"].dt.hour)
+        if "TEAM" in keys:
+            rows = pd.concat([rows[rows["USERCODE"].isin(users)].assign(TEAM=team) for team, users in TEAMS.items()], ignore_index=True)
+
+        if not keys:
+            return pd.DataFrame([rows[metrics].sum().astype("int64")])
+        result = rows.groupby(keys, observed=True, sort=True)[metrics].sum().astype("int64").reset_index()
+        result = result.rename(columns={col: name for name, col in DIMENSIONS.items()})
+        order = "actions" if "actions" in metrics else metrics[0]
+        return result.sort_values(order, ascending=False, kind="mergesort", ignore_index=True)
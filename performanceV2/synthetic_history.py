@@ -0,0 +1,115 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from performanceV2.common import IMPORT_USERS, EXPORT_USERS, SYSTEM_USERS
+
+# --- Synthetic DMS History ---
+# Rows shaped like the SQL export posted to the ingest endpoint (Table1), for benchmarks and
+# equivalence checks without production data. Everything is drawn with numpy in one pass per
+# column, so 10M rows take seconds rather than minutes.
+HISTORY_COLUMNS = ['DECLARATIONID', 'USERCODE', 'HISTORY_STATUS', 'HISTORYDATETIME', 'USERCREATE', 'ACTIVECOMPANY', 'TYPEDECLARATIONSSW']
+FIRST_DECLARATION_ID = 1_000_000
+
+DEFAULT_COMPANIES = {"DKM": 0.6, "ACME": 0.25, "GLOBEX": 0.1, "DKM_VP": 0.05}
+DEFAULT_TYPES = {"DMS_IMPORT": 0.35, "IDMS_IMPORT": 0.15, "DMS_EXPORT": 0.3, "EXPORT": 0.2}
+# Statuses of the actions after the first one
+DEFAULT_FOLLOW_UP_STATUSES = {"MODIFIED": 0.4, "WRT_ENT": 0.2, "DEC_DAT": 0.15, "PRINT": 0.1, "VALIDATED": 0.1, "INTERFACE": 0.05}
+MANUAL_FIRST_STATUSES = ["NEW", "COPY", "COPIED"]
+
+
+def _choice(rng, options, size):
+    """Draws `size` values from {value: weight}."""
+    values = np.array(list(options), dtype=object)
+    weights = np.array(list(options.values()), dtype=float)
+    return values[rng.choice(len(values), size=size, p=weights / weights.sum())]
+
+
+def generate_history(
+    n_declarations=10_000,
+    actions_per_declaration=6.0,
+    days=365,
+    end=None,
+    users=None,
+    other_users=20,
+    batchproc_share=0.2,
+    interface_share=0.15,
+    human_follow_up_share=0.7,
+    companies=DEFAULT_COMPANIES,
+    types=DEFAULT_TYPES,
+    follow_up_statuses=DEFAULT_FOLLOW_UP_STATUSES,
+    mean_gap_minutes=90,
+    noise=True,
+    as_strings=True,
+    seed=0,
+):
+    """
+    Random DMS history of `n_declarations` files over the `days` days before `end` (default: now).
+
+    - Each file has 1 + Poisson(actions_per_declaration - 1) actions, spaced by exponential gaps.
+    - The creator is BATCHPROC for `batchproc_share` of the files, otherwise a random user
+      (the report users plus `other_users` generic ones). `interface_share` of the files open with an
+      INTERFACE action, the rest with a manual creation status.
+    - Follow-up actions are done by the creator (or, for BATCHPROC files, a random human) with
+      probability `human_follow_up_share`, otherwise by any user.
+    - With `noise`, a few user codes are lower-cased and padded like the real export.
+
+    HISTORYDATETIME is an ISO string like the ingest payload unless `as_strings` is False.
+    """
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp(end or datetime.now()).floor("s")
+    humans = [u for u in dict.fromkeys((users or IMPORT_USERS + EXPORT_USERS)) if u not in SYSTEM_USERS]
+    humans += [f"USER.{i:03d}" for i in range(other_users)]
+    humans = np.array(humans, dtype=object)
+
+    # Per-declaration attributes
+    n = n_declarations
+    decl_ids = FIRST_DECLARATION_ID + np.arange(n, dtype=np.int64)
+    counts = 1 + rng.poisson(max(actions_per_declaration - 1, 0), size=n)
+    starts = end - pd.to_timedelta(rng.uniform(0, days * 86400, size=n), unit="s")
+    is_batch = rng.random(n) < batchproc_share
+    creators = np.where(is_batch, "BATCHPROC", humans[rng.integers(0, len(humans), size=n)])
+    first_status = np.where(rng.random(n) < interface_share, "INTERFACE", np.array(MANUAL_FIRST_STATUSES, dtype=object)[rng.integers(0, len(MANUAL_FIRST_STATUSES), size=n)])
+    decl_companies = _choice(rng, companies, n)
+    decl_types = _choice(rng, types, n)
+
+    # Per-action rows: repeat the declaration attributes, then draw the follow-ups
+    total = int(counts.sum())
+    owner = np.repeat(np.arange(n), counts)
+    position = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    is_first = position == 0
+
+    gaps = rng.exponential(mean_gap_minutes * 60, size=total)
+    gaps[is_first] = 0
+    offsets = np.cumsum(gaps)
+    offsets -= np.repeat(offsets[np.cumsum(counts) - counts], counts)
+
+    follow_user = np.where(is_batch[owner], humans[rng.integers(0, len(humans), size=total)], creators[owner])
+    any_user = np.where(rng.random(total) < 0.05, "BATCHPROC", humans[rng.integers(0, len(humans), size=total)])
+    user_codes = np.where(is_first, creators[owner], np.where(rng.random(total) < human_follow_up_share, follow_user, any_user))
+    statuses = np.where(is_first, first_status[owner], _choice(rng, follow_up_statuses, total))
+
+    df = pd.DataFrame({
+        "DECLARATIONID": decl_ids[owner],
+        "USERCODE": user_codes,
+        "HISTORY_STATUS": statuses,
+        "HISTORYDATETIME": starts[owner] + pd.to_timedelta(offsets, unit="s"),
+        "USERCREATE": creators[owner],
+        "ACTIVECOMPANY": decl_companies[owner],
+        "TYPEDECLARATIONSSW": decl_types[owner],
+    })
+    df = df[df["HISTORYDATETIME"] <= end]
+    df = df.sample(frac=1, random_state=seed, ignore_index=True)  # The export is not ordered
+
+    if noise:
+        noisy = rng.random(len(df)) < 0.02
+        df.loc[noisy, "USERCODE"] = df.loc[noisy, "USERCODE"].str.lower() + " "
+    if as_strings:
+        df["HISTORYDATETIME"] = df["HISTORYDATETIME"].dt.strftime("%Y-%m-%dT%H:%M:%S")
+    return df
+
+
+def generate_history_rows(rows, actions_per_declaration=6.0, **kwargs):
+    """generate_history sized to roughly `rows` rows."""
+    return generate_history(n_declarations=max(1, round(rows / actions_per_declaration)), actions_per_declaration=actions_per_declaration, **kwargs)
@@ -0,0 +1,109 @@
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# --- Public Holidays ---
+# Fixed-date holidays per country as (month, day), plus movable Christian holidays as days after
+# Easter Sunday. Islamic holidays (Eid al-Fitr, Eid al-Adha, Islamic New Year, Mawlid) follow moon
+# sightings and cannot be computed ahead: pass their announced dates as `extra_holidays`.
+FIXED_HOLIDAYS = {
+    "BE": [(1, 1), (5, 1), (7, 21), (8, 15), (11, 1), (11, 11), (12, 25)],
+    "MA": [(1, 1), (1, 11), (1, 14), (5, 1), (7, 30), (8, 14), (8, 20), (8, 21), (11, 6), (11, 18)],
+}
+EASTER_HOLIDAYS = {
+    "BE": [1, 39, 50],  # Easter Monday, Ascension Day, Whit Monday
+    "MA": [],
+}
+HOLIDAY_YEARS = range(2000, 2101)
+WORKING_WEEKMASK = "1111100"  # Monday to Friday
+ORDINAL_EPOCH = np.datetime64("2000-01-03", "D")  # A Monday
+
+
+def easter_sunday(year):
+    """Gregorian Easter Sunday (anonymous Gregorian algorithm)."""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = divmod(b, 4)
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def public_holidays(countries, years=HOLIDAY_YEARS):
+    """Sorted public holidays of `countries` (e.g. ["BE", "MA"]) over `years`."""
+    days = set()
+    for country in countries:
+        if country not in FIXED_HOLIDAYS:
+            raise ValueError(f"No holidays known for '{country}'. Expected any of: {', '.join(FIXED_HOLIDAYS)}.")
+        for year in years:
+            days.update(date(year, month, day) for month, day in FIXED_HOLIDAYS[country])
+            easter = easter_sunday(year)
+            days.update(easter + timedelta(days=offset) for offset in EASTER_HOLIDAYS[country])
+    return sorted(days)
+
+
+def _to_days(values):
+    """datetime64[D] array of dates, timestamps or a Series/Index of either."""
+    if isinstance(values, (date, datetime, pd.Timestamp, str)):
+        values = [values]
+    return pd.to_datetime(pd.Series(values)).dt.normalize().to_numpy(dtype="datetime64[D]")
+
+
+class WorkingDayCalendar:
+    """
+    Working days (Monday to Friday minus public holidays) and their ordinals.
+
+    A working-day ordinal numbers working days consecutively, so "the last N working days",
+    "working days between two dates" and "is this a working day" become integer comparisons over
+    a whole column instead of per-row date arithmetic. A non-working day gets the ordinal of the
+    next working day.
+    """
+
+    def __init__(self, countries=(), extra_holidays=(), weekmask=WORKING_WEEKMASK):
+        holidays = public_holidays(countries) + [pd.Timestamp(d).date() for d in extra_holidays]
+        self.countries = tuple(countries)
+        self.extra_holidays = tuple(extra_holidays)
+        self.weekmask = weekmask
+        self._busdays = np.busdaycalendar(weekmask=weekmask, holidays=np.array(holidays, dtype="datetime64[D]"))
+
+    def __reduce__(self):
+        # np.busdaycalendar cannot be pickled: worker processes rebuild the calendar from its arguments
+        return type(self), (self.countries, self.extra_holidays, self.weekmask)
+
+    def is_working_day(self, values):
+        """Boolean array: which of `values` (dates or timestamps) fall on a working day."""
+        return np.is_busday(_to_days(values), busdaycal=self._busdays)
+
+    def ordinals(self, values):
+        """Working-day ordinal of each of `values`, computed in one vectorised pass."""
+        return np.busday_count(ORDINAL_EPOCH, _to_days(values), busdaycal=self._busdays)
+
+    def last_working_days(self, n, today=None):
+        """The last `n` working days up to and including `today`, oldest first."""
+        today = np.datetime64(today or datetime.now().date(), "D")
+        last = np.busday_offset(today, 0, roll="backward", busdaycal=self._busdays)
+        days = np.busday_offset(last, np.arange(-(n - 1), 1), busdaycal=self._busdays)
+        return [pd.Timestamp(d).date() for d in days]
+
+    def working_window(self, n, today=None):
+        """
+        Ordinal range [first, last] of the last `n` working days: a date is inside the window when it
+        is a working day and its ordinal lies in the range.
+        """
+        days = self.last_working_days(n, today)
+        first, last = self.ordinals([days[0], days[-1]])
+        return int(first), int(last)
+
+    def in_working_window(self, values, n, today=None):
+        """Boolean array: which of `values` fall on one of the last `n` working days."""
+        first, last = self.working_window(n, today)
+        ordinals = self.ordinals(values)
+        return self.is_working_day(values) & (ordinals >= first) & (ordinals <= last)
+
+
+# Monday to Friday, no holidays: what the reports use unless given another calendar
+DEFAULT_CALENDAR = WorkingDayCalendar()
@@ -0,0 +1,28 @@
+import json
+import logging
+
+import azure.functions as func
+
+from performanceV2.app import REFRESH_TASKS, job_store
+
+
+# --- Queue Worker ---
+# Runs the refresh jobs performanceV2 queues on "performance-jobs" (see QUEUE_JOBS_TO_WORKER there).
+# The message carries the job id only; JobStore.run skips jobs that are no longer queued, so a
+# redelivered message never runs a job twice.
+def main(msg: func.QueueMessage) -> None:
+    if not job_store: raise ConnectionError("Blob service not initialized.")
+
+    job_id = json.loads(msg.get_body().decode("utf-8"))["job_id"]
+    job = job_store.get(job_id)
+    if job is None:
+        logging.warning(f"Job {job_id} not found, nothing to run.")
+        return
+
+    task = REFRESH_TASKS.get(job["kind"])
+    if task is None:
+        logging.error(f"Job {job_id} has unknown kind '{job['kind']}', not running it.")
+        return
+
+    logging.info(f"Running {job['kind']} job {job_id}.")
+    job_store.run(job_id, task)
@@ -59,9 +59,7 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
             #switch the address country to abbr
             address = result.get("Address", "")[0]
             parser = AddressParser()
-            address = parser.format_address_to_line_old_addresses(address)
-            parsed_result = parser.parse_address(address)
-            result["Address"] = parsed_result
+            result["Address"] = parser.format_address_to_line_old_addresses(address)  # parsed below, for all invoices at once
             #address["Country"] = get_abbreviation_by_country(address["Country"])
 
             #clean and split the total value
@@ -86,6 +84,10 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
 
             invs.append(result)
 
+        parsed_addresses = AddressParser().parse_addresses([inv["Address"] for inv in invs])
+        for inv, parsed_result in zip(invs, parsed_addresses):
+            inv["Address"] = parsed_result
+
         cmrs = []
 
         for file in files["cmrs"] :
@@ -0,0 +1,214 @@
+import json
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import pytest
+
+from blob_storage_fake import FakeContainerClient
+from performanceV2.declaration_summary import DeclarationSummary, collapse_session_runs
+from performanceV2.functions import functions as reports
+from performanceV2.history import DmsHistory
+from performanceV2.jobs import FAILED, QUEUED, SUCCEEDED, JobStore, StorageQueueJobQueue
+from performanceV2.preprocessing import normalize_history
+from performanceV2.synthetic_history import generate_history
+
+# Event store, declaration summary and job store of performanceV2 against an in-memory container.
+# Run with pytest, or directly: python test_performance_history.py
+
+
+def _history(seed=0, n_declarations=300, days=120):
+    return generate_history(n_declarations=n_declarations, days=days, seed=seed)
+
+
+def _batches(raw, count):
+    """`raw` in `count` ingests, in time order like the SQL export sends it."""
+    ordered = raw.sort_values("HISTORYDATETIME")
+    size = -(-len(ordered) // count)
+    return [ordered.iloc[i:i + size] for i in range(0, len(ordered), size)]
+
+
+def _activity(summary):
+    keys = ["DECLARATIONID", "USERCODE", "HISTORYHOUR", "ACTIVECOMPANY", "TYPEDECLARATIONSSW"]
+    return summary.activity.sort_values(keys).reset_index(drop=True).astype(str)
+
+
+def _runs(summary):
+    keys = ["DECLARATIONID", "HISTORYDATETIME", "USERCODE"]
+    return collapse_session_runs(summary.runs).sort_values(keys).reset_index(drop=True).astype(str)
+
+
+def _report(result):
+    """A report as JSON, with the file ID lists in a stable order."""
+    result = json.loads(json.dumps(result, sort_keys=True, default=str))
+    for day in result.get("daily_metrics", []) if isinstance(result, dict) else []:
+        for key in day:
+            if key.endswith("_ids"):
+                day[key] = sorted(day[key])
+    return result
+
+
+# --- Event store ---
+
+def test_event_store_reads_back_appended_rows():
+    raw = _history(seed=1)
+    history = DmsHistory(FakeContainerClient())
+    for batch in _batches(raw, 3):
+        history.append(batch)
+
+    stored = history.read()
+    expected = normalize_history(raw)
+    assert len(stored) == len(raw)
+    key = ["DECLARATIONID", "HISTORYDATETIME", "USERCODE", "HISTORY_STATUS"]
+    left = stored[key].astype(str).sort_values(key).reset_index(drop=True)
+    right = expected[key].astype(str).sort_values(key).reset_index(drop=True)
+    pd.testing.assert_frame_equal(left, right)
+
+
+def test_event_store_pushes_down_since_and_where():
+    raw = _history(seed=2)
+    history = DmsHistory(FakeContainerClient())
+    history.append(raw)
+    typed = normalize_history(raw)
+
+    recent = history.read(days_back=30)
+    since = datetime.combine(datetime.now().date() - timedelta(days=30), datetime.min.time())
+    assert len(recent) == (typed["HISTORYDATETIME"] >= since).sum()
+
+    imports = history.read(where={"TYPEDECLARATIONSSW": "DMS_IMPORT"})
+    assert len(imports) == (typed["TYPEDECLARATIONSSW"] == "DMS_IMPORT").sum()
+    assert set(imports["TYPEDECLARATIONSSW"].astype(str)) == {"DMS_IMPORT"}
+
+
+def test_event_store_imports_the_legacy_blob_once():
+    raw = _history(seed=3, n_declarations=50)
+    container = FakeContainerClient()
+    container.get_blob_client("logs/all_data.parquet").upload_blob(raw.to_parquet(index=False))
+
+    history = DmsHistory(container)
+    assert len(history.read()) == len(raw)
+    history.append(_history(seed=4, n_declarations=10))
+    assert len(DmsHistory(container).read()) == len(raw) + len(_history(seed=4, n_declarations=10))
+
+
+# --- Declaration summary ---
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_incremental_summary_matches_rebuild(seed):
+    raw = _history(seed=seed)
+    history = DmsHistory(FakeContainerClient(), chunk_rows=400)
+    for batch in _batches(raw, 4):
+        history.append(batch)
+
+    applied = history.summary.load()
+    rebuilt = DeclarationSummary.from_history(history.read())
+    pd.testing.assert_frame_equal(_activity(applied), _activity(rebuilt))
+    pd.testing.assert_frame_equal(_runs(applied), _runs(rebuilt))
+
+    assert _report(reports.count_user_file_creations_last_10_days(applied)) == _report(reports.count_user_file_creations_last_10_days(rebuilt))
+    assert _report(reports.calculate_all_users_monthly_metrics(applied)) == _report(reports.calculate_all_users_monthly_metrics(rebuilt))
+    for user in ("FADWA.ERRAZIKI", "BATCHPROC"):
+        assert _report(reports.calculate_single_user_metrics_fast(applied, user)) == _report(reports.calculate_single_user_metrics_fast(rebuilt, user))
+
+
+def test_chunked_summary_matches_whole_history():
+    raw = _history(seed=5)
+    history = DmsHistory(FakeContainerClient(), chunk_rows=300)
+    history.append(raw)
+
+    chunked = history.summarize()
+    whole = DeclarationSummary.from_history(history.read())
+    pd.testing.assert_frame_equal(_activity(chunked), _activity(whole))
+    pd.testing.assert_frame_equal(_runs(chunked), _runs(whole))
+
+
+# --- Jobs ---
+
+class RecordingQueue:
+    """Job queue that only records what was submitted; tests run the jobs themselves."""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, job_id, run):
+        self.submitted.append((job_id, run))
+
+
+class Out:
+    """func.Out stand-in."""
+
+    def __init__(self):
+        self.value = None
+
+    def set(self, value):
+        self.value = value
+
+
+def _task(context):
+    context.stage("work", total=1)
+    context.progress(1)
+    return {"status": "success"}
+
+
+def test_jobs_of_a_kind_are_coalesced_while_live():
+    queue = RecordingQueue()
+    store = JobStore(FakeContainerClient(), queue)
+
+    first, created = store.submit("refresh", _task)
+    again, created_again = store.submit("refresh", _task)
+    other, created_other = store.submit("refresh-monthly", _task)
+    assert created and not created_again and created_other
+    assert again["id"] == first["id"] and other["id"] != first["id"]
+    assert [job_id for job_id, _ in queue.submitted] == [first["id"], other["id"]]
+    assert store.get(first["id"])["status"] == QUEUED
+
+    queue.submitted[0][1]()
+    finished = store.get(first["id"])
+    assert finished["status"] == SUCCEEDED and finished["result"] == {"status": "success"}
+    assert [stage["name"] for stage in finished["stages"]] == ["work"]
+
+    following, created = store.submit("refresh", _task)
+    assert created and following["id"] != first["id"]
+
+
+def test_a_finished_job_is_not_run_again():
+    queue = RecordingQueue()
+    store = JobStore(FakeContainerClient(), queue)
+    job, _ = store.submit("refresh", _task)
+
+    store.run(job["id"], _task)
+    calls = []
+    store.run(job["id"], lambda context: calls.append(context))  # e.g. a redelivered queue message
+    assert calls == [] and store.get(job["id"])["status"] == SUCCEEDED
+
+
+def test_a_job_without_heartbeat_is_replaced():
+    container = FakeContainerClient()
+    store = JobStore(container, RecordingQueue())
+    job, _ = store.submit("refresh", _task)
+
+    stale = store.get(job["id"])
+    stale.update(status="running", started_at=stale["created_at"])
+    store.save(stale)
+    record = json.loads(container.blobs[store._job_path(job["id"])].data)
+    record["heartbeat_at"] = (datetime.now(timezone.utc) - timedelta(hours=1)).isoformat()
+    container.get_blob_client(store._job_path(job["id"])).upload_blob(json.dumps(record), overwrite=True)
+
+    replacement, created = store.submit("refresh", _task)
+    assert created and replacement["id"] != job["id"]
+    assert store.get(job["id"])["status"] == FAILED
+
+
+def test_storage_queue_sends_the_job_id():
+    store = JobStore(FakeContainerClient(), RecordingQueue())
+    out = Out()
+    job, _ = store.submit("refresh", _task, queue=StorageQueueJobQueue(out))
+    assert json.loads(out.value) == {"job_id": job["id"]}
+    assert store.queue.submitted == []
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,267 @@
+import json
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from blob_storage_fake import FakeContainerClient
+from AI_agents import response_cache as rc
+from AI_agents.response_cache import BlobBackend, ResponseCache, SQLiteBackend, cache_key
+from global_db.functions.key_vault import SecretProvider
+from performanceV2 import blob_cache
+from performanceV2.blob_cache import BlobCache
+
+# TTL, refresh and eviction behaviour of the shared caches: SecretProvider (global_db), the LLM
+# ResponseCache backends (AI_agents) and performanceV2's in-process BlobCache.
+# Run with pytest, or directly: python test_shared_caches.py
+DAY = 24 * 3600
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Drives time.time() (the response cache backends and the blob fake's last_modified)."""
+    clock = Clock()
+    monkeypatch.setattr(rc.time, "time", clock)
+    return clock
+
+
+# --- SecretProvider ---
+
+class CountingBackend:
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            self.calls += 1
+            calls = self.calls
+        if self.fail:
+            raise RuntimeError("vault unavailable")
+        return f"{name}-v{calls}"
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.01)
+
+
+def test_secret_is_served_from_memory_within_ttl():
+    backend, clock = CountingBackend(), Clock()
+    provider = SecretProvider(backend, ttl_seconds=3600, refresh_margin_seconds=300, clock=clock)
+    assert provider.get("key") == "key-v1"
+    clock.advance(3000)
+    assert provider.get("key") == "key-v1"
+    assert backend.calls == 1
+
+
+def test_secret_is_refreshed_in_background_near_expiry():
+    backend, clock = CountingBackend(), Clock()
+    provider = SecretProvider(backend, ttl_seconds=3600, refresh_margin_seconds=300, clock=clock)
+    provider.get("key")
+    clock.advance(3400)
+    assert provider.get("key") == "key-v1"  # Still the cached value while the refresh runs
+    _wait_for(lambda: provider.get("key") == "key-v2")
+    assert backend.calls == 2
+
+
+def test_expired_secret_is_fetched_before_returning():
+    backend, clock = CountingBackend(), Clock()
+    provider = SecretProvider(backend, ttl_seconds=3600, refresh_margin_seconds=300, clock=clock)
+    provider.get("key")
+    clock.advance(3600)
+    assert provider.get("key") == "key-v2"
+
+
+def test_failed_refresh_serves_the_cached_secret():
+    backend, clock = CountingBackend(), Clock()
+    provider = SecretProvider(backend, ttl_seconds=3600, refresh_margin_seconds=300, clock=clock)
+    provider.get("key")
+    backend.fail = True
+    clock.advance(4000)
+    assert provider.get("key") == "key-v1"
+    with pytest.raises(RuntimeError):
+        provider.get("other")
+
+
+def test_concurrent_cold_reads_fetch_once():
+    backend = CountingBackend()
+    provider = SecretProvider(backend)
+    threads = [threading.Thread(target=provider.get, args=("key",)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert backend.calls == 1
+
+
+def test_invalidated_secret_is_fetched_again():
+    backend = CountingBackend()
+    provider = SecretProvider(backend)
+    provider.get("key")
+    provider.invalidate("key")
+    assert provider.get("key") == "key-v2"
+
+
+# --- ResponseCache ---
+
+@pytest.fixture(params=["sqlite", "blob"])
+def backend(request, tmp_path, clock):
+    if request.param == "sqlite":
+        backend = SQLiteBackend(str(tmp_path / "cache.sqlite"))
+        yield backend
+        backend._connection.close()
+    else:
+        yield BlobBackend(FakeContainerClient())
+
+
+def _prune(backend):
+    """Runs the expiry pass: BlobBackend prunes every BLOB_PRUNE_EVERY_PUTS writes, SQLiteBackend on every write."""
+    if isinstance(backend, BlobBackend):
+        backend.prune()
+
+
+def test_entry_expires_after_ttl(backend, clock):
+    cache = ResponseCache(backend, ttl_seconds=DAY)
+    key = cache_key("test", "model", "prompt")
+    assert cache.get_or_call(key, lambda: ["answer"]) == ["answer"]
+    clock.advance(DAY - 1)
+    assert cache.lookup(key) == ["answer"]
+    clock.advance(2)
+    assert cache.lookup(key) is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_failed_calls_are_not_cached(backend, clock):
+    cache = ResponseCache(backend, ttl_seconds=DAY)
+    key = cache_key("test", "model", "prompt")
+    assert cache.get_or_call(key, lambda: None) is None
+    assert cache.get_or_call(key, lambda: "answer") == "answer"
+    assert cache.lookup(key) == "answer"
+
+
+def test_short_ttl_writes_keep_long_ttl_entries(backend, clock):
+    short = ResponseCache(backend, ttl_seconds=7 * DAY)
+    long = ResponseCache(backend, ttl_seconds=90 * DAY)
+    address = cache_key("address", "model", "acme nv antwerp")
+    long.store(address, ["ACME NV", "", "ANTWERP", "", "BE"])
+    clock.advance(10 * DAY)
+    short.store(cache_key("test", "model", "prompt"), "answer")
+    _prune(backend)
+    assert long.lookup(address) == ["ACME NV", "", "ANTWERP", "", "BE"]
+    clock.advance(81 * DAY)
+    short.store(cache_key("test", "model", "later"), "answer")
+    _prune(backend)
+    assert long.lookup(address) is None
+
+
+def test_expired_entries_are_deleted(backend, clock):
+    cache = ResponseCache(backend, ttl_seconds=DAY)
+    cache.store(cache_key("test", "model", "old"), "old")
+    clock.advance(2 * DAY)
+    cache.store(cache_key("test", "model", "new"), "new")
+    _prune(backend)
+    if isinstance(backend, SQLiteBackend):
+        count = backend._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+    else:
+        count = len(backend.container.blobs)
+    assert count == 1
+
+
+def test_sqlite_evicts_least_recently_used_beyond_max_bytes(tmp_path, clock):
+    backend = SQLiteBackend(str(tmp_path / "cache.sqlite"), max_bytes=600)
+    cache = ResponseCache(backend, ttl_seconds=DAY)
+    keys = [cache_key("test", "model", str(i)) for i in range(4)]
+    for key in keys[:3]:
+        cache.store(key, "x" * 150)
+        clock.advance(1)
+    cache.lookup(keys[0])  # Recently used: kept
+    clock.advance(1)
+    cache.store(keys[3], "x" * 150)
+    assert [cache.lookup(key) is not None for key in keys] == [True, False, True, True]
+    backend._connection.close()
+
+
+def test_blob_prune_evicts_oldest_beyond_max_bytes(clock):
+    container = FakeContainerClient()
+    backend = BlobBackend(container, max_bytes=600)
+    cache = ResponseCache(backend, ttl_seconds=DAY)
+    keys = [cache_key("test", "model", str(i)) for i in range(4)]
+    for key in keys:
+        cache.store(key, "x" * 150)
+        clock.advance(1)
+    backend.prune()
+    assert [cache.lookup(key) is not None for key in keys] == [False, True, True, True]
+
+
+def test_legacy_blob_entries_are_kept_until_evicted_for_size(clock):
+    container = FakeContainerClient()
+    key = cache_key("test", "model", "prompt")
+    backend = BlobBackend(container)
+    container.get_blob_client(backend._blob_name(key)).upload_blob(json.dumps({"value": "old", "seconds": 0}))
+    backend.prune()
+    assert ResponseCache(backend, ttl_seconds=DAY).lookup(key) == "old"
+
+
+# --- BlobCache ---
+
+def test_blob_cache_revalidates_after_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(blob_cache.time, "monotonic", clock)
+    container = FakeContainerClient()
+    blob = container.get_blob_client("summary.json")
+    blob.upload_blob(json.dumps({"v": 1}))
+    cache = BlobCache(ttl_seconds=300)
+
+    assert cache.fetch(blob, json.loads)[0] == {"v": 1}
+    blob.upload_blob(json.dumps({"v": 2}), overwrite=True)
+    assert cache.fetch(blob, json.loads)[0] == {"v": 1}  # Within the TTL: not checked
+    clock.advance(301)
+    assert cache.fetch(blob, json.loads)[0] == {"v": 2}
+    clock.advance(301)
+    assert cache.fetch(blob, json.loads)[0] == {"v": 2}
+    assert cache.stats()["revalidations"] == 1
+
+
+def test_blob_cache_memoises_documents_within_max_bytes():
+    cache = BlobCache(max_bytes=10_000)
+    calls = []
+
+    def build(size):
+        calls.append(size)
+        return {"rows": ["x" * 100] * size}
+
+    cache.memoize(("small",), "v1", lambda: build(10))
+    cache.memoize(("small",), "v1", lambda: build(10))
+    cache.memoize(("large",), "v1", lambda: build(200))  # About 20 kB of JSON: over max_bytes, not kept
+    cache.memoize(("large",), "v1", lambda: build(200))
+    assert calls == [10, 200, 200]
+    assert 0 < cache.stats()["bytes"] <= 10_000
+
+    frame = pd.DataFrame({"a": range(100)})
+    cache.memoize(("frame",), "v1", lambda: frame)
+    assert cache.memoize(("frame",), "v1", lambda: None) is frame
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
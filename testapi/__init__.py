@@ -5,21 +5,14 @@ import json
 import io
 import os
 from azure.storage.blob import BlobServiceClient
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
+from global_db.functions.key_vault import get_secret
 
 # Key Vault URL
 key_vault_url = "https://kv-functions-python.vault.azure.net"
 secret_name = "azure-storage-account-access-key2"  # The name of the secret you created
 
-# Use DefaultAzureCredential for authentication
-credential = DefaultAzureCredential()
-
-# Create a SecretClient to interact with the Key Vault
-client = SecretClient(vault_url=key_vault_url, credential=credential)
-# Retrieve the secret value
-
-api_key = client.get_secret(secret_name).value
+# Retrieve the secret value (cached per process)
+api_key = get_secret(secret_name, key_vault_url)
 
 # 🔗 Azure Blob Storage Connection
 CONNECTION_STRING = api_key
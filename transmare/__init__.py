@@ -67,9 +67,7 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
             #switch the address country to abbr
             address = result.get("Address", "")[0]
             parser = AddressParser()
-            address = parser.format_address_to_line_old_addresses(address)
-            parsed_result = parser.parse_address(address)
-            result["Address"] = parsed_result
+            result["Address"] = parser.format_address_to_line_old_addresses(address)  # parsed below, for all invoices at once
 
             #clean and split the total value
             total = result.get("Total", "")
@@ -131,6 +129,10 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
             result["Total net"] = totalNet
             
             resutls.append(result)
+
+        parsed_addresses = AddressParser().parse_addresses([inv["Address"] for inv in resutls])
+        for inv, parsed_result in zip(resutls, parsed_addresses):
+            inv["Address"] = parsed_result
             
         # Merge JSON objects
         merged_result = merge_json_objects(resutls)